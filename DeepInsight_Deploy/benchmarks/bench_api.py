@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+import statistics
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# 报表缓存放到临时目录 (子进程继承), 不污染本地缓存
+os.environ.setdefault("DEEPINSIGHT_CACHE_PATH", os.path.join(tempfile.mkdtemp(), "statements.sqlite"))
+
+from benchmarks.stand_in import StandInClient
+from services import api
+from services.model_engine import create_model, fetch_data
+
+# ==========================================
+# 建模接口: 单代码耗时 (只算数值 vs 生成 xlsx) + HTTP 吞吐随进程数的变化
+# ==========================================
+# 数据来自 akshare 替身, 报表缓存预热后测量 (接口的常态: 同一批代码被反复取数)。
+#   单代码: create_model(save=False) (抓取 + 内存中生成整本 xlsx) 对比 api.compute (JSON 字节),
+#           后者分首次 (读报表缓存 + 标准化) 与复用进程内数据池两种
+#   吞吐:   --clients 个并发客户端逐个请求 /v1/projection/<代码>, 进程数取 --workers 中的每个值
+#   批量:   一次 POST /v1/batch 取全部代码, JSON (NDJSON) 与 Arrow 的耗时和响应大小
+# python -m benchmarks.bench_api [--symbols 40] [--workers 1 2 4] [--clients 8]
+
+
+def _get(url, data=None, headers=None):
+    req = urllib.request.Request(url, data=json.dumps(data).encode() if data is not None else None, headers=headers or {})
+    with urllib.request.urlopen(req, timeout=300) as r: return r.read()
+
+
+def in_process(symbols, repeat=3):
+    api._client = StandInClient()
+    for s in symbols: fetch_data(s, client=api._client)  # 预热报表缓存
+    best = {"cold": float("inf"), "warm": float("inf"), "xlsx": float("inf")}
+    for _ in range(repeat):
+        api._pools.clear()
+        t0 = time.perf_counter()
+        for s in symbols: api.compute("projection", s)
+        best["cold"] = min(best["cold"], time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        for s in symbols: api.compute("projection", s)
+        best["warm"] = min(best["warm"], time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        for s in symbols: create_model(s, *fetch_data(s, client=api._client), save=False)
+        best["xlsx"] = min(best["xlsx"], time.perf_counter() - t0)
+    return {k: v / len(symbols) * 1000 for k, v in best.items()}
+
+
+def over_http(symbols, workers, clients):
+    server = api.start_background(workers=workers, client_factory=StandInClient)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        _get(base + "/v1/batch", {"symbols": symbols, "kind": "projection"})  # 预热各进程 (导入 / 缓存)
+        lat = []
+
+        def one(s):
+            t0 = time.perf_counter()
+            _get(f"{base}/v1/projection/{s}")
+            lat.append(time.perf_counter() - t0)
+        reqs = symbols * 3
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(clients) as pool: list(pool.map(one, reqs))
+        elapsed = time.perf_counter() - t0
+        res = {"workers": workers, "req_per_s": len(reqs) / elapsed, "p50_ms": statistics.median(lat) * 1000}
+        for fmt in ("json", "arrow"):
+            t0 = time.perf_counter()
+            body = _get(base + "/v1/batch", {"symbols": symbols, "kind": "projection", "format": fmt})
+            res[f"batch_{fmt}_ms"] = (time.perf_counter() - t0) * 1000
+            res[f"batch_{fmt}_kb"] = len(body) / 1024
+        return res
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="建模接口基准")
+    p.add_argument("--symbols", type=int, default=40)
+    p.add_argument("--workers", type=int, nargs="*", default=[1, 2, 4])
+    p.add_argument("--clients", type=int, default=8)
+    args = p.parse_args(argv)
+    symbols = [f"{600000 + i}" for i in range(args.symbols)]
+
+    t = in_process(symbols[:10])
+    print(f"单代码 (报表缓存命中): 生成 xlsx {t['xlsx']:.1f} ms; 接口只算数值 {t['cold']:.1f} ms, "
+          f"复用数据池 {t['warm']:.1f} ms")
+    print(f"\nHTTP: {len(symbols)} 个代码, {args.clients} 个并发客户端, CPU 核数 {os.cpu_count()}")
+    print(f"{'进程数':<8}{'请求/秒':>10}{'p50 ms':>10}{'批量 JSON ms':>14}{'KB':>8}{'批量 Arrow ms':>15}{'KB':>8}")
+    for w in args.workers:
+        r = over_http(symbols, w, args.clients)
+        print(f"{w:<8}{r['req_per_s']:>10.1f}{r['p50_ms']:>10.1f}{r['batch_json_ms']:>14.0f}{r['batch_json_kb']:>8.0f}"
+              f"{r['batch_arrow_ms']:>15.0f}{r['batch_arrow_kb']:>8.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import sys
+import gc
+import time
+import tracemalloc
+
+from benchmarks.stand_in import synthetic_statement
+from services.normalize import normalize_statements, target_periods
+from services.model_engine import build_pool
+from services.projection import prepare
+
+# ==========================================
+# 数据池内存与取数耗时: 嵌套字典 {期间: {科目: float}} vs DataPool (期间 x 科目 float64 矩阵)
+# 内存为持有 N 个代码的数据池时 tracemalloc 统计的常驻分配 (不含共用的科目索引)
+# python -m benchmarks.bench_datapool [代码数量]
+# ==========================================
+
+
+def held(make, items):
+    """构造并持有全部对象, 返回 (对象列表, 每个对象的平均常驻字节)。"""
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    objs = [make(x) for x in items]
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return objs, size / len(items)
+
+
+def per_call(fn, objs, years, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for o in objs: fn(o, years)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(objs) * 1e6
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    universe = [f"SH{600000 + i}" for i in range(n)]
+    frames = {c: {s: synthetic_statement(c, s) for s in ("IS", "BS", "CF")} for c in universe}
+    periods = target_periods("A")
+    mats = {c: normalize_statements(frames[c], periods) for c in universe}
+    years = list(mats[universe[0]].index)
+
+    dicts, b_dict = held(lambda c: mats[c].to_dict("index"), universe)
+    pools, b_pool = held(lambda c: build_pool(frames[c], "A")[0], universe)
+    pools_x, b_extra = held(lambda c: build_pool(frames[c], "A", keep_extra=True)[0], universe)
+    # 引擎取历史数据 (prepare: 全部历史科目按列取出), 每个代码一次
+    t_dict = per_call(prepare, dicts, years)
+    t_pool = per_call(prepare, pools, years)
+
+    print(f"{n} 个代码, {len(years)} 期, {pools[0].values.shape[1]} 个固定科目")
+    print(f"{'':<26}{'每代码常驻 KB':>14}{'prepare μs':>14}")
+    print(f"{'嵌套字典':<26}{b_dict / 1024:>14,.1f}{t_dict:>14,.0f}")
+    print(f"{'DataPool':<26}{b_pool / 1024:>14,.1f}{t_pool:>14,.0f}")
+    print(f"{'DataPool + extra 附表':<26}{b_extra / 1024:>14,.1f}{'':>14}")
+    print(f"\n内存: {b_dict / b_pool:,.1f}x 更小; 取数: {t_dict / t_pool:,.1f}x 更快 "
+          f"(extra 附表 {pools_x[0].extra.shape[1]} 列)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import sys
+import time
+
+from benchmarks.stand_in import StandInClient
+from services.fetcher import STATEMENT_APIS, fetch_statements
+
+# ==========================================
+# 抓取耗时对比: 串行 vs 并发 (本地替身注入延迟与错误)
+# python -m benchmarks.bench_fetch
+# ==========================================
+LATENCY = {"IS": 0.4, "BS": 0.6, "CF": 0.8}
+
+
+def run_serial(client, code):
+    t0 = time.perf_counter()
+    for s in ("IS", "BS", "CF"): getattr(client, STATEMENT_APIS[s])(symbol=code)
+    return time.perf_counter() - t0
+
+
+def main():
+    code = sys.argv[1] if len(sys.argv) > 1 else "SH600519"
+    client = StandInClient(latency=LATENCY)
+    serial = run_serial(client, code)
+    report = fetch_statements(code, use_cache=False, client=client)
+    print(f"串行: {serial:.2f}s | 并发: {report.elapsed:.2f}s | 最慢单表: {max(LATENCY.values()):.2f}s")
+
+    # 单表超时 + 另一张表持续报错: 其余报表照常返回
+    client = StandInClient(latency={"IS": 0.1, "BS": 2.0, "CF": 0.1}, fail={"CF"})
+    report = fetch_statements(code, use_cache=False, client=client, timeout=0.5, retries=1)
+    print(f"部分失败: 失败={report.failed} 耗时={report.elapsed:.2f}s")
+    for k, v in report.summary().items(): print(f"  {k}: {v}")
+
+
+if __name__ == "__main__":
+    main()
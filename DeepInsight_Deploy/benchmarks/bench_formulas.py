@@ -0,0 +1,116 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import datetime
+import tempfile
+import subprocess
+
+# ==========================================
+# 公式体量与重算耗时: 公式数 / 总长度 / 引用数 (依赖边) / 文件大小 / LibreOffice 无界面重算
+# --ref 指定 git 版本时, 在子进程中用该版本的 services 生成同样的工作簿做对比
+# python -m benchmarks.bench_formulas [--ref HEAD~1] [--companies 5]
+# ==========================================
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 单元格或区域引用 (区域 B4:B8 记一条依赖边)
+REF = re.compile(r"\$?[A-Z]{1,3}\$?\d+(?::\$?[A-Z]{1,3}\$?\d+)?")
+# 打开时总是重算 OOXML 文件 (默认设置下 LibreOffice 直接使用缓存值)
+LO_PROFILE = """<?xml version="1.0" encoding="UTF-8"?>
+<oor:items xmlns:oor="http://openoffice.org/2001/registry" xmlns:xs="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+<item oor:path="/org.openoffice.Office.Calc/Formula/Load"><prop oor:name="OOXMLRecalcMode" oor:op="fuse"><value>0</value></prop></item>
+</oor:items>
+"""
+
+
+def build(out_dir, n):
+    """生成 n 家公司的模型, 返回文件路径列表。"""
+    from benchmarks.stand_in import synthetic_statement
+    from services.normalize import normalize_statements
+    from services.model_engine import create_model
+    current_year = datetime.datetime.now().year
+    target_years = [str(y) for y in range(current_year - 7, current_year)]
+    paths = []
+    for k in range(n):
+        sym = f"60{k:04d}"
+        frames = {s: synthetic_statement("SH" + sym, s) for s in ("IS", "BS", "CF")}
+        mat = normalize_statements(frames, target_years)
+        res = create_model(sym, mat.to_dict('index'), list(mat.index), save=True, out_dir=out_dir)
+        paths.append(res.path)
+    return paths
+
+
+def formula_stats(path):
+    import openpyxl
+    wb = openpyxl.load_workbook(path)
+    count = length = refs = longest = 0
+    for ws in wb:
+        for row in ws.iter_rows():
+            for c in row:
+                if isinstance(c.value, str) and c.value.startswith("="):
+                    count += 1; length += len(c.value); longest = max(longest, len(c.value))
+                    refs += len(REF.findall(c.value))
+    return {"formulas": count, "chars": length, "longest": longest, "refs": refs, "bytes": os.path.getsize(path),
+            "names": len(wb.defined_names)}
+
+
+def lo_recalc(paths):
+    """LibreOffice 无界面打开 (强制重算) 并另存, 返回秒数; 未安装时返回 None。"""
+    soffice = shutil.which("soffice") or shutil.which("libreoffice")
+    if not soffice: return None
+    profile = tempfile.mkdtemp()
+    os.makedirs(os.path.join(profile, "user"))
+    with open(os.path.join(profile, "user", "registrymodifications.xcu"), "w") as f: f.write(LO_PROFILE)
+    out = tempfile.mkdtemp()
+    cmd = [soffice, f"-env:UserInstallation=file://{profile}", "--headless", "--convert-to", "xlsx", "--outdir", out]
+    subprocess.run(cmd + paths[:1], capture_output=True)  # 首次启动初始化配置目录, 不计时
+    t0 = time.perf_counter()
+    subprocess.run(cmd + paths, capture_output=True, check=True)
+    return time.perf_counter() - t0
+
+
+def measure(n):
+    out_dir = tempfile.mkdtemp()
+    paths = build(out_dir, n)
+    stats = formula_stats(paths[0])
+    stats["recalc_s"] = lo_recalc(paths)
+    return stats
+
+
+def _child(ref, n):
+    """把 ref 版本的 services 导出到临时目录并在该目录下运行 measure (benchmarks 仍取当前版本)。"""
+    tmp = tempfile.mkdtemp()
+    root = subprocess.run(["git", "rev-parse", "--show-toplevel"], cwd=HERE, capture_output=True, text=True, check=True).stdout.strip()
+    prefix = os.path.relpath(HERE, root)
+    archive = subprocess.run(["git", "archive", ref, f"{prefix}/services"], cwd=root, capture_output=True, check=True).stdout
+    subprocess.run(["tar", "-x", "-C", tmp], input=archive, check=True)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([HERE, os.environ.get("PYTHONPATH", "")]))
+    out = subprocess.run([sys.executable, "-m", "benchmarks.bench_formulas", "--measure", "--companies", str(n)],
+                         cwd=os.path.join(tmp, prefix), env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    p = argparse.ArgumentParser(description="工作簿公式体量 / 重算耗时")
+    p.add_argument("--ref", default=None, help="对比的 git 版本 (如 HEAD~1)")
+    p.add_argument("--companies", type=int, default=5, help="生成的公司数 (重算计时用)")
+    p.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    args = p.parse_args()
+    if args.measure:
+        print(json.dumps(measure(args.companies)))
+        return
+    runs = {"当前": measure(args.companies)}
+    if args.ref: runs[args.ref] = _child(args.ref, args.companies)
+    print(f"{'版本':<10}{'公式数':>8}{'总字符':>10}{'最长':>8}{'引用数':>8}{'名称':>6}{'文件 KB':>10}{'LO 重算 s':>12}")
+    for label, r in runs.items():
+        recalc = "未安装" if r["recalc_s"] is None else f"{r['recalc_s']:.2f}"
+        print(f"{label:<10}{r['formulas']:>8}{r['chars']:>10}{r['longest']:>8}{r['refs']:>8}{r['names']:>6}{r['bytes'] / 1024:>10.1f}{recalc:>12}")
+    if shutil.which("soffice") is None and shutil.which("libreoffice") is None:
+        print("未找到 LibreOffice (soffice), 重算耗时未计")
+
+
+if __name__ == "__main__":
+    main()
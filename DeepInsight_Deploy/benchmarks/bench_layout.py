@@ -0,0 +1,56 @@
+import sys
+import time
+import datetime
+from io import BytesIO
+
+import xlsxwriter
+
+from benchmarks.stand_in import synthetic_statement
+from services import layout
+from services.normalize import normalize_statements
+from services.projection import project, period_days
+
+# ==========================================
+# 工作簿生成耗时: 每个公司重新编译版式 vs 复用缓存的版式模板
+# python -m benchmarks.bench_layout [公司数]
+# ==========================================
+
+
+def _build(compile_fn, symbol, data_pool, years):
+    out = BytesIO()
+    wb = xlsxwriter.Workbook(out, {'in_memory': True})
+    proj = project(data_pool, years)
+    lay = compile_fn(len(years), len(proj.proj_years), period_days(years), frozenset())
+    lay.render(wb, symbol, years, proj.proj_years, data_pool, proj)
+    wb.close()
+    return out.getvalue()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    current_year = datetime.datetime.now().year
+    target_years = [str(y) for y in range(current_year - 7, current_year)]
+    pools = []
+    for k in range(n):
+        frames = {s: synthetic_statement(f"SH60{k:04d}", s) for s in ("IS", "BS", "CF")}
+        mat = normalize_statements(frames, target_years)
+        pools.append((f"60{k:04d}", mat.to_dict('index'), list(mat.index)))
+
+    cold = layout.compile_layout.__wrapped__
+    t0 = time.perf_counter()
+    for sym, dp, yrs in pools: _build(cold, sym, dp, yrs)
+    t_cold = (time.perf_counter() - t0) / n
+
+    layout.compile_layout.cache_clear()
+    t0 = time.perf_counter()
+    for sym, dp, yrs in pools: _build(layout.compile_layout, sym, dp, yrs)
+    t_warm = (time.perf_counter() - t0) / n
+
+    lay = layout.compile_layout(len(target_years), 5, 360, frozenset())
+    print(f"{n} 家公司, 每本 {lay.n_formulas:,} 个公式单元格")
+    print(f"每家重新编译版式:      {t_cold * 1000:.1f} ms/本")
+    print(f"复用模板:              {t_warm * 1000:.1f} ms/本  ({t_cold / t_warm:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
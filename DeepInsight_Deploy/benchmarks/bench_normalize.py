@@ -0,0 +1,68 @@
+import sys
+import time
+import datetime
+
+import numpy as np
+
+from benchmarks.stand_in import synthetic_statement
+from services.normalize import normalize_key, normalize_statements
+from services.schema import USED_KEYS, DERIVED_KEYS
+
+# ==========================================
+# 报表标准化耗时: 旧版 iterrows 逐格解析 vs 向量化
+# python -m benchmarks.bench_normalize [代码数量]
+# ==========================================
+
+
+def legacy_process(frames, target_years):
+    # 旧版 fetch_data.process 原样保留, 仅用于对比
+    data_pool = {}
+    def process(df):
+        if df is None or df.empty: return
+        col_map = {col: normalize_key(col) for col in df.columns}
+        for _, row in df.iterrows():
+            r_date = str(row.get('REPORT_DATE') or row.get('report_date', ''))
+            if "12-31" in r_date:
+                year = r_date[:4]
+                if year in target_years:
+                    if year not in data_pool: data_pool[year] = {}
+                    for col, val in row.items():
+                        std_key = col_map.get(col, col)
+                        try:
+                            if val and str(val).replace('.', '', 1).replace('-', '', 1).isdigit():
+                                data_pool[year][std_key] = float(val)
+                            else: data_pool[year][std_key] = 0.0
+                        except: data_pool[year][std_key] = 0.0
+    process(frames["IS"]); process(frames["BS"]); process(frames["CF"])
+    return data_pool
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    current_year = datetime.datetime.now().year
+    target_years = [str(y) for y in range(current_year - 7, current_year)]
+    universe = [f"SH{600000 + i}" for i in range(n)]
+    frames = {c: {s: synthetic_statement(c, s) for s in ("IS", "BS", "CF")} for c in universe}
+
+    t0 = time.perf_counter()
+    legacy = {c: legacy_process(frames[c], target_years) for c in universe}
+    t_legacy = (time.perf_counter() - t0) / n
+    t0 = time.perf_counter()
+    fast = {c: normalize_statements(frames[c], target_years) for c in universe}
+    t_fast = (time.perf_counter() - t0) / n
+
+    # 一致性: 旧版非 0 的接口科目应当完全一致 (旧版会把科学计数法清零, 这里不比较那类单元格)
+    diff = 0
+    for c in universe:
+        for y, row in legacy[c].items():
+            for k in USED_KEYS:
+                if k in row and k not in DERIVED_KEYS and row[k] != 0 and not np.isclose(row[k], fast[c].at[y, k]): diff += 1
+    cols = sum(len(f.columns) for f in frames[universe[0]].values())
+    print(f"{n} 个代码, 每个约 {cols} 列 x {len(frames[universe[0]]['IS'])} 期")
+    print(f"旧版 iterrows: {t_legacy * 1000:.1f} ms/代码")
+    print(f"向量化:        {t_fast * 1000:.1f} ms/代码  (x{t_legacy / t_fast:.0f})")
+    print(f"不一致单元格: {diff}")
+
+
+if __name__ == "__main__":
+    main()
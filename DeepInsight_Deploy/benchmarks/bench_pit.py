@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+from benchmarks.stand_in import synthetic_statement
+from services.datapool import DataPool
+from services.model_engine import build_pool
+from services.pit_store import PitStore
+from services.projection import project_batch
+
+# ==========================================
+# 时点报表库: 存储体积 / 写入 / as-of 查询速度
+# ==========================================
+# 每个代码模拟 6 年的年报披露 (每年 4/30 观测一次 7 年窗口), 每次披露时上一年度约 5% 的科目被重述;
+# 对比 "每次观测存整份 data_pool" 的体积, 并校验 as_of(观测日) 与当时写入的数值完全一致。
+# 回测场景: 任意一天取全部代码 (as_of_many) 并整批预测 (project_batch)。
+# python -m benchmarks.bench_pit [代码数量]
+
+N_YEARS = 6
+RESTATE_SHARE = 0.05
+
+
+def history(code, rng):
+    """-> [(观测日, DataPool)], 按时间顺序; 每次只含当时已披露的报告期。"""
+    truth, years = build_pool({s: synthetic_statement(code, s) for s in ("IS", "BS", "CF")}, "A", 12)
+    values = truth.values.copy()
+    last = int(years[-1])
+    out = []
+    for y in range(last - N_YEARS + 1, last + 1):
+        # 披露 y 年报时重述 y-1 年的部分科目
+        j = years.index(str(y - 1))
+        hit = rng.random(values.shape[1]) < RESTATE_SHARE
+        values[j, hit] *= 1 + rng.normal(0, 0.02, hit.sum())
+        rows = [i for i, p in enumerate(years) if y - 6 <= int(p) <= y]
+        out.append((f"{y + 1}-04-30", DataPool([years[i] for i in rows], values[rows].copy())))
+    return out
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rng = np.random.default_rng(0)
+    codes = [f"SH{600000 + i}" for i in range(n)]
+    t0 = time.perf_counter()
+    hist = {c: history(c, rng) for c in codes}
+    print(f"{n} 个代码 x {N_YEARS} 次观测 (准备数据 {time.perf_counter() - t0:.1f}s)")
+
+    store = PitStore(os.path.join(tempfile.mkdtemp(), "pit.sqlite"))
+    t0 = time.perf_counter()
+    for c in codes:
+        for day, pool in hist[c]: store.record(c, pool, observed=day)
+    t_write = time.perf_counter() - t0
+    stats = store.stats()
+    full = sum(pool.values.nbytes for c in codes for _, pool in hist[c])
+    print(f"写入: {n * N_YEARS / t_write:,.0f} 次观测/秒; 库文件 {stats['file_bytes'] / 1024 ** 2:.1f} MB, "
+          f"增量数据 {stats['payload_bytes'] / 1024 ** 2:.1f} MB vs 整份快照 {full / 1024 ** 2:.1f} MB "
+          f"({full / stats['payload_bytes']:.1f}x)")
+
+    # 正确性: 每个观测日的 as-of 结果 == 当时写入的整份数值
+    bad = 0
+    for c in codes[:50]:
+        for day, pool in hist[c]:
+            got, years = store.as_of(c, day)
+            bad += got is None or list(years) != list(pool.periods) or not np.array_equal(got.values, pool.values)
+    print(f"校验 {min(n, 50) * N_YEARS} 个 (代码, 观测日): 不一致 {bad}")
+
+    day = hist[codes[0]][N_YEARS // 2][0]
+    t0 = time.perf_counter()
+    for c in codes: store.as_of(c, day)
+    t_one = (time.perf_counter() - t0) / n
+    t0 = time.perf_counter()
+    got = store.as_of_many(codes, day)
+    t_many = time.perf_counter() - t0
+    years = next(iter(got.values()))[1]
+    t0 = time.perf_counter()
+    project_batch([got[c][0] for c in codes], years)
+    t_proj = time.perf_counter() - t0
+    print(f"as-of {day}: 逐个 {t_one * 1e6:,.0f} μs/代码; as_of_many {t_many * 1000:,.0f} ms 共 {len(got)} 个代码 "
+          f"({t_many / n * 1e6:,.0f} μs/代码); 整批预测 {t_proj * 1000:,.0f} ms")
+    per_day = t_many + t_proj
+    print(f"按此速度 5000 个代码每个时点约 {per_day / n * 5000:.1f}s, 10 年逐月回测 (120 个时点) 约 {per_day / n * 5000 * 120 / 60:.0f} 分钟 (不生成 xlsx)")
+
+
+if __name__ == "__main__":
+    main()
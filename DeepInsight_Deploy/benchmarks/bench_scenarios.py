@@ -0,0 +1,49 @@
+import sys
+import time
+import datetime
+
+import numpy as np
+
+from benchmarks.stand_in import synthetic_statement
+from services.normalize import normalize_statements
+from services.projection import project
+from services.scenarios import run_grid
+
+# ==========================================
+# 情景网格耗时: 批量数组计算 vs 逐情景调用 project
+# python -m benchmarks.bench_scenarios [每轴取值个数]
+# ==========================================
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    current_year = datetime.datetime.now().year
+    target_years = [str(y) for y in range(current_year - 7, current_year)]
+    frames = {s: synthetic_statement("SH600000", s) for s in ("IS", "BS", "CF")}
+    mat = normalize_statements(frames, target_years)
+    data_pool, years = mat.to_dict('index'), list(mat.index)
+    axes = {"REV_GROWTH": np.linspace(-0.1, 0.3, num), "SELL_RATE": np.linspace(0.0, 0.2, num)}
+
+    run_grid(data_pool, years, axes)
+    t0 = time.perf_counter()
+    grid = run_grid(data_pool, years, axes)
+    t_grid = time.perf_counter() - t0
+
+    # 逐情景对比只抽样 200 个, 按比例折算全网格耗时
+    sample = np.random.default_rng(0).choice(grid.size, min(200, grid.size), replace=False)
+    t0 = time.perf_counter()
+    worst = 0.0
+    for i in sample:
+        a, b = divmod(int(i), num)
+        p = project(data_pool, years, {"REV_GROWTH": axes["REV_GROWTH"][a], "SELL_RATE": axes["SELL_RATE"][b]})
+        worst = max(worst, np.nanmax(np.abs(p.row("IS.NETPROFIT")[len(years):] - grid.metrics["NETPROFIT"][i])))
+    t_loop = (time.perf_counter() - t0) / len(sample) * grid.size
+
+    print(f"{grid.size:,} 个情景 ({num} x {num}), 预测 {len(grid.proj_years)} 年")
+    print(f"批量网格:        {t_grid * 1000:.1f} ms")
+    print(f"逐情景 project:  {t_loop * 1000:.1f} ms (按 {len(sample)} 个样本折算)")
+    print(f"净利润最大偏差: {worst:.3g}")
+
+
+if __name__ == "__main__":
+    main()
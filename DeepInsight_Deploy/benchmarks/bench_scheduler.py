@@ -0,0 +1,157 @@
+import sys
+import json
+import time
+import argparse
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from services.scheduler import Scheduler, INTERACTIVE, BATCH
+
+# ==========================================
+# 回源调度器 对 本地模拟上游 (限流 + 长连接计数)
+# ==========================================
+# 模拟上游: 每秒最多受理 --capacity 个请求, 超出返回 429 (Retry-After: 1), 每个请求耗时 --latency;
+# 统计新建连接数 (keep-alive 复用时远少于请求数)。
+# 每个 "报表调用" 模拟 akshare 分页发 --pages 个 requests.get。
+#   naive      不经调度器, --threads 个线程直接 requests.get (每次新建连接)
+#   scheduler  经调度器: 限速 = capacity, 并发 = --workers
+#   overrate   限速配置为 capacity 的 2 倍, 靠 429 反馈 (AIMD) 自行降到上游可承受的速率
+#   priority   先排入大量批量调用, 再提交少量交互调用, 比较两者的完成耗时
+# python -m benchmarks.bench_scheduler [--calls 60] [--capacity 40]
+
+
+class Upstream(object):
+    def __init__(self, capacity, latency):
+        self.capacity, self.latency = capacity, latency
+        self.lock = threading.Lock()
+        self.window, self.in_window = 0, 0
+        self.requests = self.throttled = self.connections = 0
+        up = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with up.lock: up.connections += 1
+
+            def do_GET(self):
+                now = int(time.monotonic())
+                with up.lock:
+                    up.requests += 1
+                    if now != up.window: up.window, up.in_window = now, 0
+                    up.in_window += 1
+                    over = up.in_window > up.capacity
+                    if over: up.throttled += 1
+                if over:
+                    body, code = b'{"error": "too many requests"}', 429
+                else:
+                    time.sleep(up.latency)
+                    body, code = json.dumps({"data": list(range(50))}).encode(), 200
+                self.send_response(code)
+                if over: self.send_header("Retry-After", "1")
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args): pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def reset(self):
+        with self.lock: self.requests = self.throttled = self.connections = 0
+
+    def close(self): self.server.shutdown()
+
+
+def statement_call(url, pages, symbol):
+    # 与 akshare 报表接口相同的用法: 模块级 requests.get, 逐页请求, 非 200 时解析失败
+    out = []
+    for page in range(pages):
+        r = requests.get(url, params={"code": symbol, "page": page}, timeout=10)
+        if r.status_code != 200: raise ValueError(f"HTTP {r.status_code}")
+        out += r.json()["data"]
+    return len(out)
+
+
+def run(up, mode, args):
+    up.reset()
+    calls = [lambda i=i: statement_call(up.url, args.pages, f"S{i}") for i in range(args.calls)]
+    t0 = time.perf_counter()
+    lat = {"interactive": [], "batch": []}
+
+    def timed(prio, fut):
+        # 完成时刻由回调记录 (逐个 result() 会把先完成的交互调用算成最后完成)
+        t_sub = time.perf_counter()
+        fut.add_done_callback(lambda f: lat["interactive" if prio == INTERACTIVE else "batch"].append(time.perf_counter() - t_sub))
+        return fut
+    errors = 0
+    if mode == "naive":
+        with ThreadPoolExecutor(args.threads) as pool:
+            for fut in [pool.submit(c) for c in calls]:
+                try: fut.result()
+                except Exception: errors += 1
+    else:
+        rate = up.capacity * (2 if mode == "overrate" else 1)
+        sched = Scheduler(workers=args.workers, limits={"127.0.0.1": rate})
+        sched.install_transport()
+        try:
+            if mode == "priority":
+                futs = [timed(BATCH, sched.submit(c, BATCH)) for c in calls]
+                time.sleep(0.2)
+                futs += [timed(INTERACTIVE, sched.submit(c, INTERACTIVE)) for c in calls[:5]]
+            else:
+                futs = [timed(BATCH, sched.submit(c)) for c in calls]
+            for fut in futs:
+                try: fut.result()
+                except Exception: errors += 1
+        finally:
+            sched.uninstall_transport()
+    elapsed = time.perf_counter() - t0
+    res = {"mode": mode, "calls": args.calls, "failed_calls": errors, "http_requests": up.requests,
+           "http_429": up.throttled, "connections": up.connections, "elapsed_s": round(elapsed, 2),
+           "ok_req_per_s": round((up.requests - up.throttled) / elapsed, 1)}
+    if mode == "priority":
+        # 交互调用的完成耗时 (从提交算起) 对比批量调用
+        res["interactive_max_s"] = round(max(lat["interactive"]), 2)
+        res["batch_median_s"] = round(statistics.median(lat["batch"]), 2)
+    return res
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="回源调度器 对 本地模拟上游")
+    p.add_argument("--calls", type=int, default=60, help="报表调用次数")
+    p.add_argument("--pages", type=int, default=3, help="每次调用的分页请求数")
+    p.add_argument("--capacity", type=int, default=40, help="上游每秒受理上限")
+    p.add_argument("--latency", type=float, default=0.02, help="上游单请求耗时 (秒)")
+    p.add_argument("--threads", type=int, default=32, help="naive 模式的线程数")
+    p.add_argument("--workers", type=int, default=8, help="调度器并发上限")
+    p.add_argument("--modes", nargs="*", default=["naive", "scheduler", "overrate", "priority"])
+    p.add_argument("--json", action="store_true")
+    args = p.parse_args(argv)
+    up = Upstream(args.capacity, args.latency)
+    try: results = [run(up, m, args) for m in args.modes]
+    finally: up.close()
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False))
+        return 0
+    cols = ("failed_calls", "http_requests", "http_429", "connections", "elapsed_s", "ok_req_per_s")
+    print(f"上游: {args.capacity} 次/秒, {args.calls} 次调用 x {args.pages} 页")
+    print(f"{'模式':<12}" + "".join(f"{c:>15}" for c in cols))
+    for r in results: print(f"{r['mode']:<12}" + "".join(f"{r[c]:>15}" for c in cols))
+    for r in results:
+        if "interactive_max_s" in r:
+            print(f"\n优先级: 交互调用最长 {r['interactive_max_s']}s, 批量调用中位 {r['batch_median_s']}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
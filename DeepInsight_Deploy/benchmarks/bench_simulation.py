@@ -0,0 +1,43 @@
+import os
+import sys
+import time
+import datetime
+import resource
+
+import numpy as np
+
+from benchmarks.stand_in import synthetic_statement
+from services.normalize import normalize_statements
+from services.simulation import simulate, CHUNK
+
+# ==========================================
+# 蒙特卡洛耗时 / 可复现性: 单进程 vs 全部核心, 同一 seed 结果逐位一致
+# python -m benchmarks.bench_simulation [路径数]
+# ==========================================
+
+
+def main():
+    n_paths = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    current_year = datetime.datetime.now().year
+    target_years = [str(y) for y in range(current_year - 7, current_year)]
+    frames = {s: synthetic_statement("SH600000", s) for s in ("IS", "BS", "CF")}
+    mat = normalize_statements(frames, target_years)
+    data_pool, years = mat.to_dict('index'), list(mat.index)
+
+    # 单核机器上也至少比较 1 与 2 个进程; 路径数少时缩小块, 保证至少两块可分给不同进程
+    cores = max(2, os.cpu_count() or 1)
+    chunk = min(CHUNK, max(1, n_paths // 2))
+    runs = {}
+    for workers in (1, cores):
+        t0 = time.perf_counter()
+        runs[workers] = simulate(data_pool, years, n_paths, seed=2024, workers=workers, chunk=chunk)
+        print(f"{workers} 进程: {n_paths:,} 条路径 {time.perf_counter() - t0:.2f}s")
+    same = all(np.array_equal(runs[1].metrics[m], runs[cores].metrics[m]) for m in runs[1].metrics)
+    print(f"不同进程数结果一致: {same}")
+    print(f"峰值 RSS (主进程): {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    print("\n驱动因子拟合:\n" + runs[1].fit.frame().round(4).to_string())
+    print("\n末年净利润分位数 (百万元):\n" + runs[1].percentiles("NETPROFIT").round(1).to_string())
+
+
+if __name__ == "__main__":
+    main()
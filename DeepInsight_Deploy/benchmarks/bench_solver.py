@@ -0,0 +1,59 @@
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.stand_in import synthetic_statement
+from services.model_engine import build_pool
+from services.projection import project, project_batch
+
+# ==========================================
+# 利息循环求解: 收敛精度 vs 耗时, 逐个 project vs project_batch 整批
+# ==========================================
+# tol=inf 即只迭代一轮 (按期初余额计息, 相当于没有求解器); 误差以 tol=1e-12 的结果为准,
+# 取全部代码预测期 净利润 / 货币资金 / 利息支出 的最大相对偏差。
+# python -m benchmarks.bench_solver [代码数量]
+
+ROWS = ("IS.NETPROFIT", "BS.MONETARYFUNDS", "FIN.INT")
+
+
+def timed(fn, repeat=3):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def max_diff(a, b):
+    return max(float(np.nanmax(np.abs(x.row(k) - y.row(k)) / np.maximum(np.abs(y.row(k)), 1.0)))
+               for x, y in zip(a, b) for k in ROWS)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    universe = [f"SH{600000 + i}" for i in range(n)]
+    built = [build_pool({s: synthetic_statement(c, s) for s in ("IS", "BS", "CF")}, "A") for c in universe]
+    pools, years = [b[0] for b in built], built[0][1]
+    # 替身报表的部分代码税率 / 分红率远超 100% (反馈系数 >= 1, 求解器按期初余额退回), 只保留正常的
+    first = [p.rows for p in project_batch(pools, years)]
+    n_hist = len(years)
+    pools = [dp for dp, r in zip(pools, first)
+             if 0 <= r["ASSUMP.INCOME_TAX_RATE"][0, n_hist] < 1 and 0 <= r["ASSUMP.DIV_PAYOUT"][0, n_hist] <= 1]
+    # 提高最低现金天数并全额扫债, 让循环贷款 / 提前还债都参与迭代
+    drivers = {"MIN_CASH_DAYS": 90.0, "SWEEP_RATE": 1.0}
+    exact = project_batch(pools, years, drivers, tol=1e-12)
+
+    n = len(pools)
+    print(f"{n} 个代码 (剔除 {len(universe) - n} 个假设异常的), {n_hist} 期历史")
+    print(f"{'':<24}{'总耗时 ms':>12}{'每代码 μs':>12}{'最大偏差':>14}")
+    for tol in (float("inf"), 1e-3, 1e-6, 1e-9):
+        t, res = timed(lambda: project_batch(pools, years, drivers, tol=tol))
+        print(f"{'整批 tol=' + str(tol):<24}{t * 1000:>12.1f}{t / n * 1e6:>12.0f}{max_diff(res, exact):>14.2e}")
+    t, res = timed(lambda: [project(dp, years, drivers) for dp in pools])
+    print(f"{'逐个 project tol=1e-9':<24}{t * 1000:>12.1f}{t / n * 1e6:>12.0f}{max_diff(res, exact):>14.2e}")
+
+
+if __name__ == "__main__":
+    main()
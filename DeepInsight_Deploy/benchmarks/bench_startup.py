@@ -0,0 +1,73 @@
+import os
+import re
+import sys
+import json
+import time
+import subprocess
+
+# ==========================================
+# 冷启动: 各模块在全新解释器中的导入耗时 (-X importtime 累计值) + 看板首屏耗时
+# 首屏 = 新进程启动到 dashboard.py 首次运行结束 (streamlit AppTest, 无需浏览器)
+# python -m benchmarks.bench_startup [--json]
+# ==========================================
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ("numpy", "pandas", "xlsxwriter", "akshare", "streamlit", "altair",
+           "services.fetcher", "services.jobs", "services.model_engine", "services.scenarios")
+# 看板首屏实际执行的导入 (与 dashboard.py 顶部一致)
+FIRST_RENDER_IMPORTS = "import streamlit; from services.jobs import get_queue"
+LINE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)")
+FIRST_RENDER = """
+import time, sys
+t0 = float(sys.argv[1])
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("dashboard.py", default_timeout=120).run()
+print(time.time() - t0, len(at.exception))
+"""
+
+
+def import_time(module):
+    """全新解释器中导入 module 的累计耗时 (ms); 未安装时返回 None。"""
+    p = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=HERE,
+                       capture_output=True, text=True)
+    if p.returncode != 0: return None
+    total = None
+    for m in LINE.finditer(p.stderr):
+        if m.group(3) == module and not m.group(2): total = int(m.group(1)) / 1000
+    return total
+
+
+def wall_time(code):
+    t0 = time.perf_counter()
+    p = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True)
+    return (time.perf_counter() - t0) * 1000 if p.returncode == 0 else None
+
+
+def first_render():
+    """新进程启动到看板脚本首次运行完成的耗时 (ms); 未安装 streamlit 时返回 None。"""
+    env = dict(os.environ, DEEPINSIGHT_PREWARM=os.environ.get("DEEPINSIGHT_PREWARM", "1"))
+    p = subprocess.run([sys.executable, "-c", FIRST_RENDER, repr(time.time())], cwd=HERE, env=env,
+                       capture_output=True, text=True)
+    if p.returncode != 0: return None
+    elapsed, n_exc = p.stdout.strip().splitlines()[-1].split()
+    return float(elapsed) * 1000 if n_exc == "0" else None
+
+
+def main():
+    res = {"imports_ms": {m: import_time(m) for m in MODULES},
+           "interpreter_ms": wall_time("pass"),
+           "first_render_imports_ms": wall_time(FIRST_RENDER_IMPORTS),
+           "first_render_ms": first_render()}
+    if "--json" in sys.argv:
+        print(json.dumps(res))
+        return
+    fmt = lambda v: "未安装/失败" if v is None else f"{v:,.0f}"
+    print(f"{'模块':<24}{'导入耗时 ms':>14}")
+    for m, v in res["imports_ms"].items(): print(f"{m:<24}{fmt(v):>14}")
+    print(f"\n空解释器启动:            {fmt(res['interpreter_ms'])} ms")
+    print(f"首屏导入链 (新进程):     {fmt(res['first_render_imports_ms'])} ms")
+    print(f"看板首屏 (AppTest):      {fmt(res['first_render_ms'])} ms")
+
+
+if __name__ == "__main__":
+    main()
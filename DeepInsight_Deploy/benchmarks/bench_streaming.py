@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import json
+import hashlib
+import zipfile
+import datetime
+import resource
+import tempfile
+import tracemalloc
+import subprocess
+import xml.etree.ElementTree as ET
+
+from benchmarks.stand_in import synthetic_statement
+from services.normalize import normalize_statements
+
+# ==========================================
+# 单个模型的峰值内存: in_memory (整本字节在内存, 再写盘) vs 流式落盘 vs 分块生成器
+# 每种方式在独立子进程中运行, 峰值 RSS 互不影响
+# python -m benchmarks.bench_streaming [模型数]
+# ==========================================
+
+MODES = ("memory", "stream", "iter")
+NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+
+def _inspect(path):
+    # 重新打开生成的文件: 压缩包完整, 且各表公式 / 缓存值的摘要 (流式写出与 in_memory 应完全一致)
+    h, n = hashlib.sha1(), 0
+    with zipfile.ZipFile(path) as z:
+        bad = z.testzip()
+        if bad: raise RuntimeError(f"{path}: 压缩包损坏 ({bad})")
+        for name in sorted(x for x in z.namelist() if x.startswith("xl/worksheets/sheet")):
+            for c in ET.fromstring(z.read(name)).iter(NS + "c"):
+                f = c.find(NS + "f")
+                if f is None: continue
+                v = c.find(NS + "v")
+                h.update(f"{name}!{c.get('r')}={f.text}|{None if v is None else v.text}\n".encode())
+                n += 1
+    return n, h.hexdigest()
+
+
+def _run(mode, n):
+    from services.model_engine import create_model, iter_model, model_filename
+    current_year = datetime.datetime.now().year
+    target_years = [str(y) for y in range(current_year - 7, current_year)]
+    frames = {s: synthetic_statement("SH600000", s) for s in ("IS", "BS", "CF")}
+    mat = normalize_statements(frames, target_years)
+    data_pool, years = mat.to_dict('index'), list(mat.index)
+    out_dir = tempfile.mkdtemp()
+    # 预热一次 (导入 / 版式编译), 之后的增量才是单个模型的开销
+    create_model("600000", data_pool, years, save=True, out_dir=out_dir, sensitivity=True, streaming=(mode != "memory"), reuse=False)
+    rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    for k in range(n):
+        sym = f"60{k:04d}"
+        if mode == "iter":
+            with open(os.path.join(out_dir, model_filename(sym)), "wb") as f:
+                for chunk in iter_model(sym, data_pool, years, sensitivity=True): f.write(chunk)
+        else:
+            create_model(sym, data_pool, years, save=True, out_dir=out_dir, sensitivity=True, streaming=(mode == "stream"), reuse=False)
+    elapsed = (time.perf_counter() - t0) / n
+    peak = tracemalloc.get_traced_memory()[1]
+    rss1 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    formulas, digest = _inspect(os.path.join(out_dir, model_filename(sym)))
+    return {"mode": mode, "ms": elapsed * 1000, "py_peak_kb": peak / 1024, "rss_kb": rss1, "rss_growth_kb": rss1 - rss0,
+            "formulas": formulas, "digest": digest}
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        print(json.dumps(_run(sys.argv[2], int(sys.argv[3]))))
+        return 0
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print(f"{'方式':<8}{'耗时 ms/本':>12}{'Python 峰值分配 KB':>20}{'峰值 RSS MB':>14}{'RSS 增长 KB':>14}{'公式数':>8}")
+    digests = {}
+    for mode in MODES:
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_streaming", "--child", mode, str(n)],
+                             capture_output=True, text=True, check=True).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        digests[mode] = r["digest"]
+        print(f"{mode:<8}{r['ms']:>12.1f}{r['py_peak_kb']:>20.0f}{r['rss_kb'] / 1024:>14.1f}{r['rss_growth_kb']:>14.0f}{r['formulas']:>8}")
+    diff = [m for m in MODES if digests[m] != digests["memory"]]
+    if diff:
+        print(f"❌ 重新打开校验: {', '.join(diff)} 的公式 / 缓存值与 in_memory 不一致")
+        return 1
+    print("✅ 重新打开校验: 各方式生成的公式与缓存值一致")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
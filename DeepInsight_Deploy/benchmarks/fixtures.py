@@ -0,0 +1,110 @@
+import os
+import sys
+import threading
+
+import pandas as pd
+
+from benchmarks.stand_in import synthetic_statement
+from services.fetcher import STATEMENT_APIS
+
+# ==========================================
+# 录制 / 回放的报表样本 (离线基准测试用)
+# ==========================================
+# fixtures/<代码>/<IS|BS|CF>.pkl.gz 为接口原样返回的 DataFrame, 由 record 在有网络的环境中录制。
+# ReplayClient 与 akshare 三个报表接口同名同参; 某代码尚未录制时按其类别生成确定性的合成报表
+# (银行: 无存货/营业成本等工业企业科目; 字段缺失: 去掉若干驱动所需科目), 结果中标注数据来源。
+# python -m benchmarks.fixtures record [代码 ...]   录制 (需要网络)
+# python -m benchmarks.fixtures list                查看录制状态
+
+FIXTURE_DIR = os.environ.get("DEEPINSIGHT_FIXTURE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures"))
+
+# 代表性样本: 代码 -> (类别, 名称)
+SYMBOLS = {
+    "SH600036": ("bank", "招商银行"),
+    "SZ000001": ("bank", "平安银行"),
+    "SZ000895": ("manufacturer", "双汇发展"),
+    "SZ000333": ("manufacturer", "美的集团"),
+    "SH600031": ("manufacturer", "三一重工"),
+    "SZ300750": ("missing", "宁德时代"),
+}
+
+# 合成替代时各类别缺失的科目
+_BANK_MISSING = ("INVENTORY", "OPERATE_COST", "ACCOUNTS_RECE", "ACCOUNTS_PAYABLE", "NOTES_RECE", "NOTES_PAYABLE",
+                 "CONTRACT_ASSET", "CONTRACT_LIABILITIES", "PREPAYMENT", "SALE_EXPENSE", "RESEARCH_EXPENSE",
+                 "CONSTRUCTION_IN_PROCESS", "CONSTRUCT_LONG_ASSET", "TOTAL_OPERATE_COST")
+_PARTIAL_MISSING = ("MINORITY_INTEREST", "MINORITY_EQUITY", "ASSIGN_DIVIDEND_PORFIT", "SHORT_LOAN", "RESEARCH_EXPENSE")
+MISSING = {"bank": _BANK_MISSING, "missing": _PARTIAL_MISSING, "manufacturer": ()}
+
+
+def fixture_path(code, statement, root=None):
+    return os.path.join(root or FIXTURE_DIR, code, f"{statement}.pkl.gz")
+
+
+def recorded(code, root=None):
+    return all(os.path.exists(fixture_path(code, s, root)) for s in STATEMENT_APIS)
+
+
+class ReplayClient(object):
+    """回放录制的报表; 未录制的代码退回合成报表。sources 记录每个代码实际使用的来源。"""
+
+    def __init__(self, root=None, synthetic=True):
+        self.root = root or FIXTURE_DIR
+        self.synthetic = synthetic
+        self.sources = {}
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def frame(self, statement, symbol):
+        key = (symbol, statement)
+        with self._lock:
+            if key not in self._frames:
+                path = fixture_path(symbol, statement, self.root)
+                if os.path.exists(path):
+                    self._frames[key], self.sources[symbol] = pd.read_pickle(path), "recorded"
+                elif self.synthetic:
+                    missing = MISSING[SYMBOLS.get(symbol, ("manufacturer", ""))[0]]
+                    self._frames[key] = synthetic_statement(symbol, statement, missing=missing)
+                    self.sources.setdefault(symbol, "synthetic")
+                else:
+                    raise FileNotFoundError(f"未录制: {path}")
+        return self._frames[key].copy()
+
+    def stock_profit_sheet_by_report_em(self, symbol): return self.frame("IS", symbol)
+
+    def stock_balance_sheet_by_report_em(self, symbol): return self.frame("BS", symbol)
+
+    def stock_cash_flow_sheet_by_report_em(self, symbol): return self.frame("CF", symbol)
+
+
+def record(codes=None, root=None, client=None):
+    """从真实接口录制报表 (需要网络); 返回 {代码: 错误信息或 None}。"""
+    from services.fetcher import default_client, call_with_retry, DEFAULT_TIMEOUT, DEFAULT_RETRIES
+    client = client or default_client()
+    out = {}
+    for code in codes or SYMBOLS:
+        try:
+            for stmt, api in STATEMENT_APIS.items():
+                df, _ = call_with_retry(lambda: getattr(client, api)(symbol=code), DEFAULT_TIMEOUT, DEFAULT_RETRIES)
+                path = fixture_path(code, stmt, root)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                df.to_pickle(path)
+            out[code] = None
+        except Exception as e:
+            out[code] = str(e)
+        print(f"{'✅' if out[code] is None else '❌'} {code} {SYMBOLS.get(code, ('', ''))[1]} {out[code] or ''}")
+    return out
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    cmd = argv[0] if argv else "list"
+    if cmd == "record":
+        errors = record(argv[1:] or None)
+        return 1 if any(errors.values()) else 0
+    for code, (kind, name) in SYMBOLS.items():
+        print(f"{code}  {name:<6} {kind:<13} {'已录制' if recorded(code) else '未录制 (使用合成数据)'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
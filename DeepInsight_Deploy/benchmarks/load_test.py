@@ -0,0 +1,227 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import platform
+import resource
+import tempfile
+import threading
+import traceback
+import contextlib
+
+import numpy as np
+
+from benchmarks.stand_in import StandInClient
+from benchmarks.suite import _git_rev
+from services import fetcher, statement_cache
+from services.fetcher import to_code
+from services.jobs import JobQueue, Job, build_job
+
+# ==========================================
+# 并发用户压测: 看板会话 / 建模引擎, 上游为注入延迟的 akshare 替身
+# ==========================================
+# 部署形态是单个 streamlit 进程 (Dockerfile), 所有会话共用进程内的任务队列 (services/jobs.py) 与报表缓存。
+# 并发数取 --concurrency 中的每个值, 每个虚拟用户循环执行会话 (闭环, 会话之间停顿 --think 秒, 指数分布),
+# 持续 --duration 秒; 每个并发档位默认从空的报表缓存 / 新的任务队列开始 (--warm 时先把缓存灌满)。
+#   session  与 dashboard.py 相同的调用序列: queue.submit -> 每 --poll 秒轮询直到完成
+#            -> 情景网格 (sensitivity_grid, --grid 个取值) -> 读取模型字节 (下载按钮)
+#   engine   直接调用任务函数 (抓取 -> 建模 -> TTM), 不经队列: 没有合并同代码请求, 反映同步路径本身的上限
+#   app      streamlit.testing 的 AppTest 逐会话运行 dashboard.py (需安装 streamlit; 脚本在本进程内执行)
+# 输出各档位的 吞吐 (会话/秒), 出模型耗时与整个会话耗时的 p50 / p95 / p99, 错误率, 常驻内存及其增长;
+# 代码序列 / 停顿 / 替身延迟与错误都由 --seed 决定, 结果连同参数与环境写入 --out (JSON), 便于容量规划时复现对比。
+# python -m benchmarks.load_test [--target session] [--concurrency 1 2 4 8 16 32] [--duration 20]
+#                                [--universe 200] [--latency 0.3] [--error-rate 0.01] [--out load_results.json]
+
+PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_mb():
+    """当前常驻内存 (Linux 读 /proc, 其它平台退回峰值)。"""
+    try:
+        with open("/proc/self/statm") as f: return int(f.read().split()[1]) * PAGE / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def pct(values, q):
+    return round(float(np.percentile(values, q)) * 1000, 1) if values else None
+
+
+# ---------- 会话 ----------
+
+class SessionError(Exception):
+    pass
+
+
+def session_dashboard(ctx, symbol, freq):
+    from services.scenarios import sensitivity_grid
+    t0 = time.perf_counter()
+    job = ctx["queue"].submit(symbol, freq)
+    # 看板脚本: 未完成则 sleep(POLL_INTERVAL) 后 st.rerun()
+    while not job.done: time.sleep(ctx["poll"])
+    t_model = time.perf_counter() - t0
+    if job.error is not None: raise SessionError(f"{type(job.error).__name__}: {job.error}")
+    res = job.result
+    sensitivity_grid(res["data_pool"], res["years"], ("SELL_RATE", "REV_GROWTH"), num=ctx["grid"])
+    len(res["model"].data)
+    return t_model
+
+
+def session_engine(ctx, symbol, freq):
+    t0 = time.perf_counter()
+    build_job(Job(None, symbol, freq))
+    return time.perf_counter() - t0
+
+
+def session_app(ctx, symbol, freq):
+    from streamlit.testing.v1 import AppTest
+    t0 = time.perf_counter()
+    at = AppTest.from_file(ctx["script"], default_timeout=ctx["timeout"])
+    at.run()
+    at.text_input[0].set_value(symbol)
+    at.selectbox[0].set_value(freq)
+    at.button[0].click().run()
+    # 轮询中的脚本以 st.rerun() 结束, 逐次重跑直到结果进入 session_state
+    while "result" not in at.session_state:
+        if at.exception: raise SessionError(str(at.exception[0].value))
+        if at.error: raise SessionError(at.error[0].value)
+        if time.perf_counter() - t0 > ctx["timeout"]: raise SessionError("timeout")
+        at.run()
+    return time.perf_counter() - t0
+
+
+TARGETS = {"session": session_dashboard, "engine": session_engine, "app": session_app}
+
+
+# ---------- 负载 ----------
+
+def fresh_state(args, root, level):
+    """每个档位独立的报表缓存 / 任务队列 / 替身 (同一 seed 下各档位的上游行为一致)。"""
+    path = os.path.join(root, f"statements_{level}.sqlite") if not args.warm else os.path.join(root, "statements.sqlite")
+    statement_cache._default_cache = statement_cache.StatementCache(path=path)
+    client = StandInClient(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed)
+    client.preload(args.symbols)
+    fetcher._client = client
+    queue = JobQueue(workers=args.job_workers, ttl=args.job_ttl, prewarm=False) if args.target == "session" else None
+    return client, queue
+
+
+def user_loop(fn, ctx, rng, deadline, freq, records, lock):
+    while time.perf_counter() < deadline:
+        symbol = rng.choice(ctx["symbols"])
+        t0 = time.perf_counter()
+        rec = {"symbol": symbol, "start": t0}
+        try:
+            rec["model_s"] = fn(ctx, symbol, freq)
+            rec["ok"] = True
+        except Exception as e:
+            rec["ok"] = False
+            rec["error"] = f"{type(e).__name__}: {e}" if isinstance(e, SessionError) else traceback.format_exc(limit=2)
+        rec["total_s"] = time.perf_counter() - t0
+        with lock: records.append(rec)
+        if ctx["think"]: time.sleep(max(0.0, min(rng.expovariate(1 / ctx["think"]), deadline - time.perf_counter())))
+
+
+def run_level(args, level, root):
+    client, queue = fresh_state(args, root, level)
+    ctx = {"queue": queue, "poll": args.poll, "grid": args.grid, "symbols": args.symbols, "think": args.think,
+           "script": args.script, "timeout": args.timeout}
+    fn = TARGETS[args.target]
+    records, lock = [], threading.Lock()
+    rss0 = rss_mb()
+    t0 = time.perf_counter()
+    deadline = t0 + args.duration
+    users = [threading.Thread(target=user_loop, args=(fn, ctx, random.Random(f"{args.seed}:{level}:{u}"), deadline,
+                                                      args.freq, records, lock), daemon=True) for u in range(level)]
+    for t in users: t.start()
+    for t in users: t.join()
+    elapsed = time.perf_counter() - t0
+    if queue is not None: queue.shutdown()
+    ok = [r for r in records if r["ok"]]
+    errors = {}
+    for r in records:
+        if r["ok"]: continue
+        kind = r["error"].splitlines()[-1][:120]
+        errors[kind] = errors.get(kind, 0) + 1
+    model_s, total_s = [r["model_s"] for r in ok], [r["total_s"] for r in ok]
+    return {
+        "concurrency": level, "sessions": len(records), "ok": len(ok), "errors": len(records) - len(ok),
+        "error_rate": round((len(records) - len(ok)) / len(records), 4) if records else 0.0,
+        "throughput": round(len(ok) / elapsed, 2), "elapsed_s": round(elapsed, 2),
+        "model_p50_ms": pct(model_s, 50), "model_p95_ms": pct(model_s, 95), "model_p99_ms": pct(model_s, 99),
+        "total_p50_ms": pct(total_s, 50), "total_p95_ms": pct(total_s, 95), "total_p99_ms": pct(total_s, 99),
+        "upstream_calls": len(client.calls), "rss_start_mb": round(rss0, 1), "rss_end_mb": round(rss_mb(), 1),
+        "rss_growth_mb": round(rss_mb() - rss0, 1), "error_kinds": errors,
+    }
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="DeepInsight 并发用户压测")
+    p.add_argument("--target", choices=list(TARGETS), default="session")
+    p.add_argument("--concurrency", type=int, nargs="*", default=[1, 2, 4, 8, 16, 32])
+    p.add_argument("--duration", type=float, default=20.0, help="每个档位持续秒数")
+    p.add_argument("--think", type=float, default=1.0, help="会话间平均停顿秒数 (0 为不停顿)")
+    p.add_argument("--universe", type=int, default=200, help="会话随机选取的代码个数 (越小缓存 / 任务复用越多)")
+    p.add_argument("--freq", default="A", choices=("A", "Q"))
+    p.add_argument("--latency", type=float, default=0.3, help="替身每张报表的固定延迟 (秒)")
+    p.add_argument("--jitter", type=float, default=0.2, help="替身延迟的随机附加上限 (秒)")
+    p.add_argument("--error-rate", type=float, default=0.01, help="替身单次调用失败概率")
+    p.add_argument("--poll", type=float, default=0.5, help="看板轮询间隔 (dashboard.POLL_INTERVAL)")
+    p.add_argument("--grid", type=int, default=21, help="情景网格每轴取值个数 (看板滑块默认值)")
+    p.add_argument("--job-workers", type=int, default=None, help="任务队列线程数 (默认 DEEPINSIGHT_JOB_WORKERS)")
+    p.add_argument("--job-ttl", type=float, default=None, help="任务结果复用秒数 (0 为不复用)")
+    p.add_argument("--warm", action="store_true", help="各档位共用一份预先灌满的报表缓存")
+    p.add_argument("--script", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dashboard.py"))
+    p.add_argument("--timeout", type=float, default=120.0, help="app 目标单个会话的超时秒数")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--out", default=None, help="结果 JSON 路径")
+    p.add_argument("--verbose", action="store_true", help="显示引擎逐条日志")
+    args = p.parse_args(argv)
+    if args.target == "app":
+        try: import streamlit.testing.v1  # noqa: F401
+        except ImportError: p.error("app 目标需要安装 streamlit")
+    args.symbols = [to_code(f"{600000 + i}") for i in range(args.universe)]
+    root = tempfile.mkdtemp(prefix="deepinsight_load_")
+    os.environ.pop("DEEPINSIGHT_PIT", None)
+
+    # 预热: 导入 / 版式编译不计入第一个档位
+    from services.jobs import warm_up
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull): warm_up_s = warm_up()
+    if args.warm:
+        client, _ = fresh_state(args, root, 0)
+        client.error_rate, client.latency, client.jitter = 0.0, 0.0, 0.0
+        for s in args.symbols: fetcher.fetch_statements(s, client=client)
+
+    print(f"目标 {args.target} | 代码池 {args.universe} | 替身延迟 {args.latency}+{args.jitter}s 错误率 {args.error_rate:.1%} "
+          f"| 每档 {args.duration}s 停顿 {args.think}s | CPU {os.cpu_count()} | {'预热缓存' if args.warm else '冷缓存'}")
+    print(f"{'并发':>4}{'会话':>7}{'错误率':>8}{'会话/秒':>9}{'出模型 p50/p95/p99 ms':>26}{'整个会话 p50/p95/p99 ms':>28}"
+          f"{'上游调用':>9}{'RSS MB':>9}{'增长':>7}")
+    levels = []
+    for level in args.concurrency:
+        # 引擎的逐条打印会淹没结果表; 档位运行期间屏蔽 (与批量建模的子进程相同)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+            r = run_level(args, level, root)
+        levels.append(r)
+        fmt = lambda a, b, c: f"{a or 0:,.0f}/{b or 0:,.0f}/{c or 0:,.0f}"
+        print(f"{level:>4}{r['sessions']:>7}{r['error_rate']:>8.1%}{r['throughput']:>9.2f}"
+              f"{fmt(r['model_p50_ms'], r['model_p95_ms'], r['model_p99_ms']):>26}"
+              f"{fmt(r['total_p50_ms'], r['total_p95_ms'], r['total_p99_ms']):>28}"
+              f"{r['upstream_calls']:>9}{r['rss_end_mb']:>9.0f}{r['rss_growth_mb']:>+7.0f}")
+        for kind, n in r["error_kinds"].items(): print(f"      {n} x {kind}")
+
+    if args.out:
+        doc = {"meta": {"timestamp": datetime.datetime.now().isoformat(timespec="seconds"), "git": _git_rev(),
+                        "python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+                        "warm_up_s": round(warm_up_s, 2)},
+               "params": {k: v for k, v in vars(args).items() if k != "symbols"},
+               "levels": levels}
+        with open(args.out, "w", encoding="utf-8") as f: json.dump(doc, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
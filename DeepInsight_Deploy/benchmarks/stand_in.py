@@ -0,0 +1,96 @@
+import time
+import zlib
+import random
+import threading
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# akshare 本地替身 (注入延迟与错误, 无需网络)
+# ==========================================
+# 与 akshare 的三个报表接口同名同参, 可直接作为 fetch_data(client=...) 传入。
+# 生成的数据是按代码确定性的合成数据, 列结构模仿东方财富 by_report 接口:
+# 若干文本列 + 全部科目列 + 对应的 *_YOY 列 + 大量本引擎用不到的冗余列。
+
+_TEXT_COLS = ["SECUCODE", "SECURITY_CODE", "SECURITY_NAME_ABBR", "ORG_CODE", "ORG_TYPE",
+              "REPORT_DATE", "REPORT_TYPE", "REPORT_DATE_NAME", "SECURITY_TYPE_CODE", "NOTICE_DATE",
+              "UPDATE_DATE", "CURRENCY"]
+_EXTRA_COLS = 120
+_QUARTERS = (("12-31", "年报"), ("09-30", "三季报"), ("06-30", "中报"), ("03-31", "一季报"))
+
+
+def synthetic_statement(code, statement, last_year=None, n_years=12, missing=()):
+    from services.schema import FULL_SCHEMA, DERIVED_KEYS
+    last_year = last_year or (pd.Timestamp.now().year - 1)
+    rng = np.random.default_rng(zlib.crc32(f"{code}:{statement}".encode()))
+    periods = [(y, md, name) for y in range(last_year, last_year - n_years, -1) for md, name in _QUARTERS]
+    n = len(periods)
+    keys = [k for _, k, _, _ in FULL_SCHEMA[statement] if k and k not in missing and k not in DERIVED_KEYS]
+    if statement == "IS": keys += ["FE_INTEREST_EXPENSE"]
+    keys += [f"{statement}_UNUSED_{i:03d}" for i in range(_EXTRA_COLS)]
+
+    cols = {
+        "SECUCODE": f"{code[2:]}.{code[:2]}", "SECURITY_CODE": code[2:], "SECURITY_NAME_ABBR": f"样本{code[2:]}",
+        "ORG_CODE": f"10{code[2:]}", "ORG_TYPE": "通用", "SECURITY_TYPE_CODE": "058001001", "CURRENCY": "CNY",
+        "REPORT_DATE": [f"{y}-{md} 00:00:00" for y, md, _ in periods],
+        "REPORT_TYPE": [name for _, _, name in periods],
+        "REPORT_DATE_NAME": [f"{y}{name}" for y, _, name in periods],
+        "NOTICE_DATE": [f"{y + (1 if md == '12-31' else 0)}-04-2{i % 9} 00:00:00" for i, (y, md, _) in enumerate(periods)],
+        "UPDATE_DATE": [f"{y + 1}-04-30 00:00:00" for y, _, _ in periods],
+    }
+    scale = rng.uniform(5e8, 5e10)
+    # 年度增长趋势 + 季度累计 (利润表/现金流量表为年初至今累计值)
+    trend = np.array([(1.08 ** (y - last_year + n_years)) for y, _, _ in periods])
+    ytd = np.array([{"12-31": 1.0, "09-30": 0.74, "06-30": 0.49, "03-31": 0.23}[md] for _, md, _ in periods])
+    for k in keys:
+        v = scale * rng.uniform(0.005, 0.6) * trend * rng.normal(1.0, 0.05, n)
+        if statement != "BS": v = v * ytd
+        cols[k] = np.round(v, 2)
+        cols[f"{k}_YOY"] = np.round(rng.normal(5, 15, n), 4)
+    df = pd.DataFrame(cols)
+    # 模仿真实数据: 个别单元格缺失
+    mask = rng.random(df.shape) < 0.01
+    mask[:, :len(_TEXT_COLS)] = False
+    return df.mask(mask)
+
+
+class StandInClient(object):
+    """latency: 固定延迟(秒) 或 {报表: 延迟}; error_rate: 每次调用失败的概率; fail: 必定失败的报表集合。"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, fail=(), seed=0, missing=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.fail = set(fail)
+        self.missing = missing or {}
+        self.calls = []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._frames = {}
+
+    def _serve(self, statement, symbol):
+        with self._lock:
+            self.calls.append((statement, symbol, time.time()))
+            delay = self.latency.get(statement, 0.0) if isinstance(self.latency, dict) else self.latency
+            delay += self._rng.uniform(0, self.jitter) if self.jitter else 0.0
+            failed = statement in self.fail or self._rng.random() < self.error_rate
+        time.sleep(delay)
+        if failed: raise ConnectionError(f"stand-in: {statement} {symbol} 模拟网络错误")
+        key = (symbol, statement)
+        if key not in self._frames:
+            self._frames[key] = synthetic_statement(symbol, statement, missing=self.missing.get(symbol, ()))
+        return self._frames[key].copy()
+
+    def preload(self, symbols, statements=("IS", "BS", "CF")):
+        """预先生成合成报表, 测量时替身只剩注入的延迟, 不再占用本进程 CPU。"""
+        for symbol in symbols:
+            for s in statements:
+                if (symbol, s) not in self._frames:
+                    self._frames[(symbol, s)] = synthetic_statement(symbol, s, missing=self.missing.get(symbol, ()))
+
+    def stock_profit_sheet_by_report_em(self, symbol): return self._serve("IS", symbol)
+
+    def stock_balance_sheet_by_report_em(self, symbol): return self._serve("BS", symbol)
+
+    def stock_cash_flow_sheet_by_report_em(self, symbol): return self._serve("CF", symbol)
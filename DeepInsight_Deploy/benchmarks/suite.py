@@ -0,0 +1,124 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import datetime
+import resource
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+
+from benchmarks.fixtures import FIXTURE_DIR, SYMBOLS, ReplayClient
+from services.fetcher import fetch_statements
+from services.model_engine import fetch_data, build_pool, create_model
+
+# ==========================================
+# 离线基准套件: 回放录制报表, 分阶段计时并对照阈值
+# ==========================================
+# 每个样本代码分别测量 (取多次运行的中位数):
+#   fetch_ms       抓取 (回放, 仅反映接口层开销)
+#   normalize_ms   报表解析 / 标准化 (fetch_data 中的 build_pool)
+#   build_ms       工作簿生成 (create_model, 内存中)
+#   output_bytes   输出文件大小
+#   peak_mb        标准化 + 生成过程中的 Python 峰值分配 (tracemalloc, 单独一次运行)
+#   end_to_end_ms  fetch_data + create_model 落盘 (强制重建, 不沿用存储中的文件)
+# 结果写入 JSON; 任一代码超过 thresholds.json 中的上限即记为回归, --check 时以非零状态退出。
+# 未录制的代码退回合成报表并醒目提示; --check 时视为失败 (除非加 --allow-synthetic)。
+# python -m benchmarks.suite [--repeat 5] [--out bench_results.json] [--check [--allow-synthetic]]
+
+THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.json")
+METRICS = ("fetch_ms", "normalize_ms", "build_ms", "output_bytes", "peak_mb", "end_to_end_ms")
+
+
+def _ms(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return (time.perf_counter() - t0) * 1000, out
+
+
+def measure(code, client, repeat, out_dir):
+    runs = {m: [] for m in ("fetch_ms", "normalize_ms", "build_ms", "end_to_end_ms")}
+    size = None
+    for _ in range(repeat + 1):  # 首轮预热 (回放文件读取 / 版式编译), 不计入
+        t_fetch, report = _ms(lambda: fetch_statements(code, use_cache=False, client=client))
+        t_norm, (data_pool, years) = _ms(lambda: build_pool(report.frames, "A"))
+        t_build, model = _ms(lambda: create_model(code, data_pool, years, save=False))
+        t_e2e, _ = _ms(lambda: create_model(code, *fetch_data(code, use_cache=False, client=client), save=True, out_dir=out_dir, reuse=False))
+        size = model.size
+        for m, v in zip(runs, (t_fetch, t_norm, t_build, t_e2e)): runs[m].append(v)
+    res = {m: round(statistics.median(v[1:]), 2) for m, v in runs.items()}
+    tracemalloc.start()
+    data_pool, years = build_pool(report.frames, "A")
+    create_model(code, data_pool, years, save=False)
+    res["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+    tracemalloc.stop()
+    res["output_bytes"] = size
+    res["periods"] = len(years)
+    return res
+
+
+def check(results, thresholds):
+    """返回超过阈值的 (代码, 指标, 实测, 上限) 列表。"""
+    return [(code, m, r[m], limit) for code, r in results.items() for m, limit in thresholds.items()
+            if m in r and r[m] > limit]
+
+
+def _git_rev():
+    try: return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError: return None
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="DeepInsight 离线基准套件")
+    p.add_argument("--repeat", type=int, default=5, help="每个代码的计时次数 (取中位数)")
+    p.add_argument("--symbols", nargs="*", default=None, help="只测指定代码 (默认全部样本)")
+    p.add_argument("--out", default="bench_results.json", help="结果 JSON 路径")
+    p.add_argument("--thresholds", default=THRESHOLDS, help="阈值 JSON 路径")
+    p.add_argument("--check", action="store_true", help="有指标超过阈值, 或有代码未录制 (使用合成报表) 时返回非零状态")
+    p.add_argument("--allow-synthetic", action="store_true", help="--check 时允许未录制的代码使用合成报表")
+    args = p.parse_args(argv)
+
+    with open(args.thresholds, encoding="utf-8") as f: thresholds = json.load(f)
+    client = ReplayClient()
+    out_dir = tempfile.mkdtemp()
+    results = {}
+    for code in args.symbols or list(SYMBOLS):
+        results[code] = measure(code, client, args.repeat, out_dir)
+        results[code]["source"] = client.sources.get(code)
+        results[code]["kind"] = SYMBOLS.get(code, ("other", ""))[0]
+    violations = check(results, thresholds)
+    synthetic = [c for c, r in results.items() if r["source"] != "recorded"]
+    doc = {
+        "meta": {"timestamp": datetime.datetime.now().isoformat(timespec="seconds"), "git": _git_rev(),
+                 "python": platform.python_version(), "machine": platform.machine(), "repeat": args.repeat,
+                 "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                 "synthetic": synthetic},
+        "thresholds": thresholds,
+        "results": results,
+        "summary": {m: max(r[m] for r in results.values()) for m in METRICS},
+        "violations": [{"symbol": c, "metric": m, "value": v, "limit": l} for c, m, v, l in violations],
+    }
+    with open(args.out, "w", encoding="utf-8") as f: json.dump(doc, f, ensure_ascii=False, indent=2)
+
+    print(f"{'代码':<10}{'来源':<10}" + "".join(f"{m:>15}" for m in METRICS))
+    for code, r in results.items():
+        print(f"{code:<10}{r['source'] or '-':<10}" + "".join(f"{r[m]:>15,}" for m in METRICS))
+    print(f"\n结果已写入 {args.out}")
+    for c, m, v, l in violations: print(f"❌ 回归: {c} {m} = {v:,} > 上限 {l:,}")
+    if not violations: print("✅ 全部指标在阈值内")
+    if synthetic:
+        # 合成报表只能说明代码路径可运行, 不能代表真实报表的耗时与内存
+        print(f"⚠️  {len(synthetic)}/{len(results)} 个代码没有录制的报表, 使用了合成报表: {', '.join(synthetic)}")
+        print(f"⚠️  结果不代表真实数据; 请先录制: python -m benchmarks.fixtures record (目录 {FIXTURE_DIR})")
+    if not args.check: return 0
+    if synthetic and not args.allow_synthetic:
+        print("❌ --check 需要录制的报表 (或显式加 --allow-synthetic)")
+        return 1
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import sys
+import math
+import tempfile
+
+from benchmarks.stand_in import StandInClient
+from services.model_engine import fetch_data, create_model
+
+# ==========================================
+# 校验: 计算引擎写入的缓存值 vs 独立公式求值
+# python -m benchmarks.verify_projection [代码 ...]
+# 依赖开发工具包 formulas 与 openpyxl (pip install formulas openpyxl), 不在运行镜像中安装。
+# ==========================================
+
+
+def verify(path):
+    import formulas
+    import openpyxl
+    solution = formulas.ExcelModel().loads(path).finish().calculate()
+    wb = openpyxl.load_workbook(path)
+    cached = openpyxl.load_workbook(path, data_only=True)
+    sheets = {name.upper(): name for name in wb.sheetnames}
+    checked, mismatches = 0, []
+    for ref, rng in solution.items():
+        if "!" not in ref or ":" in ref: continue
+        sheet, cell = ref.split("!")
+        sheet = sheets.get(sheet.strip("'").split("]")[-1])
+        if sheet is None: continue
+        f = wb[sheet][cell].value
+        if not (isinstance(f, str) and f.startswith("=")): continue
+        checked += 1
+        got, want = rng.value[0][0], cached[sheet][cell].value
+        try: got = float(got)
+        except (TypeError, ValueError): got = str(got)
+        same = (isinstance(got, float) and isinstance(want, (int, float))
+                and math.isclose(got, want, rel_tol=1e-9, abs_tol=1e-6)) or str(got) == str(want)
+        if not same: mismatches.append((sheet, cell, f, got, want))
+    return checked, mismatches
+
+
+def main():
+    symbols = sys.argv[1:] or ["600519", "000895", "601398"]
+    client = StandInClient()
+    failed = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for sym in symbols:
+            data_pool, years = fetch_data(sym, use_cache=False, client=client)
+            result = create_model(sym, data_pool, years, save=True, out_dir=tmp)
+            checked, mismatches = verify(result.path)
+            failed += len(mismatches)
+            print(f"{sym}: 校验公式 {checked} 个, 不一致 {len(mismatches)} 个")
+            for m in mismatches[:10]: print("   ", m)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,28 +2,30 @@ import streamlit as st
 import os
 import sys
 import time
-import ssl
-
-# ==========================================
-# 0. 前端环境 SSL 修复 (双重保险)
-# ==========================================
-try:
-    _create_unverified_https_context = ssl._create_unverified_context
-except AttributeError:
-    pass
-else:
-    ssl._create_default_https_context = _create_unverified_https_context
 
 # 将当前目录加入路径，确保能找到 services 文件夹
 sys.path.append(os.getcwd())
 
-# 导入后端引擎 (确保 services/model_engine.py 存在)
+# 导入后端任务队列 (确保 services/ 目录存在); 建模引擎与数据接口由队列在后台线程预热,
+# 结果展示用到的 pandas / altair / 情景模块在有结果时才导入, 首屏不承担这些导入
 try:
-    from services.model_engine import create_model, fetch_data
+    from services.jobs import get_queue, JobError
+    from services.preview_index import get_preview
 except ImportError:
-    st.error("❌ 无法导入后端引擎，请确保 'services/model_engine.py' 文件存在且路径正确。")
+    st.error("❌ 无法导入后端引擎，请确保 'services/' 目录存在且路径正确。")
     st.stop()
 
+POLL_INTERVAL = 0.5  # 任务进度轮询间隔 (秒)
+
+
+def metric_cards(data):
+    # data: 期间行 (data_pool[年份]) 或预览索引的 Preview, 都支持 .get(科目, 0)
+    k1, k2, k3 = st.columns(3)
+    k1.metric("营业总收入", f"{data.get('TOTAL_OPERATE_INCOME', 0)/1e8:,.2f} 亿")
+    k2.metric("归母净利润", f"{data.get('PARENT_NETPROFIT', 0)/1e8:,.2f} 亿", delta_color="normal")
+    k3.metric("经营性现金流", f"{data.get('NETCASH_OPERATE', 0)/1e8:,.2f} 亿")
+
+
 # --- 页面配置 ---
 st.set_page_config(
     page_title="DeepInsight | 智能投研平台",
@@ -41,6 +43,8 @@ with st.sidebar:
     st.info("✅ 业务/成本多维拆分")
     st.info("✅ 资产负债表自动配平")
     st.info("✅ 现金流量表间接法")
+    st.info("✅ 情景 / 敏感性网格分析")
+    st.info("✅ 全市场截面筛选 (左侧页面)")
     st.markdown("---")
     st.markdown("Created by AI Industry Agent")
 
@@ -50,85 +54,127 @@ st.markdown("输入股票代码，一键生成 **华尔街标准 (Standardized)*
 
 # 输入区域
 with st.container():
-    col1, col2 = st.columns([3, 1])
+    col1, col_f, col2 = st.columns([2, 1, 1])
     with col1:
         symbol = st.text_input("股票代码", value="000895", placeholder="例如: 000895, 600519")
+    with col_f:
+        freq = st.selectbox("口径", ["A", "Q"], format_func={"A": "年度", "Q": "单季"}.get)
     with col2:
         st.write("") 
         st.write("") 
         run_btn = st.button("🚀 开始建模", type="primary", use_container_width=True)
 
 # --- 逻辑处理 ---
+# 建模在后台任务队列中进行 (同一代码/口径/数据版本只建一次, 结果短期保留), 页面只提交与轮询;
+# 建模结果保存在 session_state 中, 情景面板的控件变化触发重跑脚本时无需重新抓取/建模
+queue = get_queue()
 if run_btn:
     if not symbol:
         st.warning("请输入有效的股票代码")
     else:
-        # 初始化状态
-        status_box = st.status("正在连接交易所数据中心...", expanded=True)
-        
-        try:
-            # 1. 获取预览数据 (用于前端展示)
-            status_box.write(f"🔍 正在抓取 {symbol} 的核心财务数据...")
-            data_pool, years = fetch_data(symbol)
-            
-            if not data_pool:
-                status_box.update(label="❌ 数据获取失败", state="error")
-                st.error(f"无法获取代码 {symbol} 的数据，请检查代码是否正确（如：000895）。")
-            else:
-                # 2. 调用引擎生成 Excel
-                status_box.write("⚙️ 正在构建三张报表勾稽关系...")
-                create_model(symbol) # 核心生成步骤
-                
-                # 3. 检查文件是否生成
-                file_prefix = "SZ" if symbol.startswith("0") or symbol.startswith("3") else "SH"
-                if symbol.lower().startswith("sz") or symbol.lower().startswith("sh"):
-                    file_prefix = "" # 如果用户自己输了前缀
-                    
-                filename = f"generated_models/{file_prefix}{symbol}_DeepInsight_V15_Standard.xlsx"
-                # 简单的模糊查找，防止前缀大小写问题
-                if not os.path.exists(filename):
-                    # 尝试找一下目录下包含该代码的文件
-                    import glob
-                    files = glob.glob(f"generated_models/*{symbol}*V15*.xlsx")
-                    if files:
-                        filename = files[0]
-
-                if os.path.exists(filename):
-                    status_box.update(label="✅ 建模完成！", state="complete", expanded=False)
-                    
-                    # --- 结果展示区 ---
-                    st.divider()
-                    st.success(f"🎉 **{symbol} 估值模型已生成**")
-                    
-                    # 核心指标卡片
-                    latest_year = years[-1]
-                    latest_data = data_pool[latest_year]
-                    
-                    st.subheader(f"📊 核心指标预览 ({latest_year})")
-                    k1, k2, k3 = st.columns(3)
-                    
-                    rev = latest_data.get('TOTAL_OPERATE_INCOME', 0)
-                    profit = latest_data.get('PARENT_NETPROFIT', 0)
-                    cash = latest_data.get('NETCASH_OPERATE', 0)
-                    
-                    k1.metric("营业总收入", f"{rev/1e8:,.2f} 亿")
-                    k2.metric("归母净利润", f"{profit/1e8:,.2f} 亿", delta_color="normal")
-                    k3.metric("经营性现金流", f"{cash/1e8:,.2f} 亿")
-
-                    # 下载按钮
-                    with open(filename, "rb") as file:
-                        st.download_button(
-                            label="📥 点击下载 Excel 估值模型 (.xlsx)",
-                            data=file,
-                            file_name=os.path.basename(filename),
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                            type="primary"
-                        )
-                else:
-                    status_box.update(label="❌ 生成失败", state="error")
-                    st.error("模型文件未生成，请检查后端日志。")
-
-        except Exception as e:
-            status_box.update(label="❌ 发生系统错误", state="error")
-            st.error(f"Error: {e}")
-            st.code(traceback.format_exc())
+        st.session_state.pop("result", None)
+        st.session_state["job"] = queue.submit(symbol, freq).id
+        st.query_params.update(symbol=symbol, freq=freq)
+elif "job" not in st.session_state and "result" not in st.session_state and "symbol" in st.query_params:
+    # 刷新页面后按地址栏参数找回进行中 / 刚完成的任务 (不重新提交)
+    found = queue.lookup(st.query_params["symbol"], st.query_params.get("freq", "A"))
+    if found is not None: st.session_state["job"] = found.id
+
+job = queue.get(st.session_state["job"]) if "job" in st.session_state else None
+
+# 预计算的核心指标 (索引查询, 不等抓取与建模): 建模结果出来之前先展示
+preview = get_preview(job.symbol if job is not None else symbol) if symbol and "result" not in st.session_state else None
+if preview is not None:
+    st.subheader(f"📊 核心指标预览 ({preview.period})")
+    metric_cards(preview)
+    st.caption(f"{preview.name} · 来自预计算索引, 建模完成后以最新数据为准")
+
+if job is not None:
+    status_box = st.status("正在连接交易所数据中心...", expanded=True)
+    for msg in job.messages: status_box.write(msg)
+    if not job.done:
+        status_box.update(label=f"⏳ {job.symbol} 建模中...", state="running")
+        time.sleep(POLL_INTERVAL)
+        st.rerun()
+    st.session_state.pop("job")
+    if job.error is None:
+        status_box.update(label="✅ 建模完成！", state="complete", expanded=False)
+        st.session_state["result"] = job.result
+    elif isinstance(job.error, JobError):
+        status_box.update(label="❌ 生成失败", state="error")
+        st.error(str(job.error))
+    else:
+        status_box.update(label="❌ 发生系统错误", state="error")
+        st.error(f"Error: {job.error}")
+        st.code(job.trace)
+elif "job" in st.session_state:
+    st.session_state.pop("job")  # 任务已过期
+
+# --- 结果展示区 ---
+if "result" in st.session_state:
+    import pandas as pd
+    import altair as alt
+    from services.model_engine import XLSX_MIME
+    from services.scenarios import sensitivity_grid, METRICS, DRIVER_NAMES
+    res = st.session_state["result"]
+    symbol, data_pool, years, model = res["symbol"], res["data_pool"], res["years"], res["model"]
+    st.divider()
+    st.success(f"🎉 **{symbol} 估值模型已生成**")
+    
+    # 核心指标卡片
+    latest_year = years[-1]
+    latest_data = data_pool[latest_year]
+    
+    st.subheader(f"📊 核心指标预览 ({latest_year})")
+    metric_cards(latest_data)
+
+    # 预测摘要 (计算引擎直接给出的数值, 单位: 百万元)
+    proj = model.projection
+    st.subheader(f"📈 预测摘要 ({proj.proj_years[0]}-{proj.proj_years[-1]}, 百万元)")
+    summary = pd.DataFrame({
+        "营业总收入": proj.row("IS.REV")[len(years):],
+        "净利润": proj.row("IS.NETPROFIT")[len(years):],
+        "经营活动现金流": proj.row("CF.CFO")[len(years):],
+        "期末现金": proj.row("CF.END")[len(years):],
+    }, index=proj.proj_years).T
+    st.dataframe(summary.style.format("{:,.1f}"), use_container_width=True)
+
+    ttm_pool, ttm_periods = res["ttm"]
+    if ttm_pool:
+        with st.expander("📅 滚动四季 (TTM) 视图, 亿元"):
+            items = {"营业总收入": "TOTAL_OPERATE_INCOME", "归母净利润": "PARENT_NETPROFIT", "经营性现金流": "NETCASH_OPERATE"}
+            ttm = pd.DataFrame({name: [ttm_pool[p].get(k, 0) / 1e8 for p in ttm_periods] for name, k in items.items()},
+                               index=ttm_periods).T
+            st.dataframe(ttm.style.format("{:,.2f}"), use_container_width=True)
+
+    # 情景分析: 两个驱动因子的笛卡尔网格, 一次批量计算
+    st.subheader("🎛️ 情景分析")
+    codes = list(DRIVER_NAMES)
+    c1, c2, c3, c4 = st.columns(4)
+    x_code = c1.selectbox("横轴驱动", codes, index=codes.index("REV_GROWTH"), format_func=DRIVER_NAMES.get)
+    y_code = c2.selectbox("纵轴驱动", [c for c in codes if c != x_code], index=0, format_func=DRIVER_NAMES.get)
+    metric = c3.selectbox("指标", list(METRICS), format_func=METRICS.get)
+    year = c4.selectbox("年份", proj.proj_years, index=len(proj.proj_years) - 1)
+    num = st.slider("每轴取值个数", 5, 100, 21)
+    grid = sensitivity_grid(data_pool, years, (y_code, x_code), num=num)
+    tbl = grid.pivot(metric, y_code, x_code, year=year)
+    long = tbl.stack().rename("value").reset_index()
+    heat = alt.Chart(long).mark_rect().encode(
+        x=alt.X(f"{x_code}:O", title=DRIVER_NAMES[x_code], axis=alt.Axis(format=".3~g")),
+        y=alt.Y(f"{y_code}:O", title=DRIVER_NAMES[y_code], sort="descending", axis=alt.Axis(format=".3~g")),
+        color=alt.Color("value:Q", title=f"{METRICS[metric]} (百万元)", scale=alt.Scale(scheme="redyellowgreen")),
+        tooltip=[x_code, y_code, alt.Tooltip("value:Q", format=",.1f")],
+    )
+    st.altair_chart(heat, use_container_width=True)
+    st.caption(f"共 {grid.size:,} 个情景; 驱动取值在全部预测年相同, 其余假设为历史 3 年均值。")
+    with st.expander("查看数据表"):
+        st.dataframe(tbl.style.format("{:,.1f}"), use_container_width=True)
+
+    # 下载按钮
+    st.download_button(
+        label="📥 点击下载 Excel 估值模型 (.xlsx)",
+        data=model.data,
+        file_name=model.filename,
+        mime=XLSX_MIME,
+        type="primary"
+    )
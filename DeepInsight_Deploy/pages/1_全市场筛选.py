@@ -0,0 +1,55 @@
+import streamlit as st
+import os
+import sys
+import time
+
+# 将当前目录加入路径 (直接打开本页时主脚本未运行)
+sys.path.append(os.getcwd())
+
+from services.panel import get_panel, PRESETS, ALIASES, ALIAS_NAMES, LABELS, FUNCS, DEFAULT_PANEL_DIR, QueryError
+
+# ==========================================
+# 全市场筛选: 基于截面面板 (services/panel.py) 的表达式筛选
+# ==========================================
+
+st.set_page_config(page_title="DeepInsight | 全市场筛选", page_icon="🔎", layout="wide")
+st.title("🔎 全市场筛选")
+
+panel = get_panel()
+if panel is None:
+    st.warning(f"尚未构建截面面板 ({DEFAULT_PANEL_DIR})。")
+    st.code("python -m services.panel build --file universe.txt", language="bash")
+    st.stop()
+
+st.caption(f"{len(panel):,} 个代码 · {panel.periods[0]}-{panel.periods[-1]} ({panel.freq}) · "
+           f"构建于 {panel.meta['built_at']}")
+
+preset = st.selectbox("预置筛选", ["自定义"] + list(PRESETS))
+spec = PRESETS.get(preset, {})
+c1, c2 = st.columns([3, 2])
+where = c1.text_input("筛选条件", value=spec.get("where", "NETPROFIT > 0"), help="如 rising(DSO, 3) and ROE > 0.15")
+rank = c2.text_input("排序指标", value=spec.get("rank", "ROE"))
+c3, c4, c5 = st.columns(3)
+top = c3.number_input("返回条数", 10, 5000, spec.get("top", 100), step=10)
+ascending = c4.toggle("升序", value=False)
+period = c5.selectbox("期间", ["各代码最新一期"] + panel.periods[::-1])
+extra = st.multiselect("附加列", list(ALIASES) + panel.keys, default=[],
+                       format_func=lambda k: f"{k} {ALIAS_NAMES.get(k) or LABELS.get(k, '')}")
+
+t0 = time.perf_counter()
+try:
+    df = panel.screen(where or None, rank or None, int(top), ascending, None if period == "各代码最新一期" else period, extra)
+except QueryError as e:
+    st.error(str(e))
+    st.stop()
+elapsed = (time.perf_counter() - t0) * 1000
+
+st.success(f"命中 {len(df):,} 个代码 · 耗时 {elapsed:,.1f} ms")
+st.dataframe(df, use_container_width=True)
+st.download_button("📥 下载结果 (CSV)", df.to_csv().encode("utf-8-sig"), file_name="screen.csv", mime="text/csv")
+
+with st.expander("表达式说明"):
+    st.markdown("科目名 (如 `NETCASH_OPERATE`) 与下列比率可直接运算, 支持 `+ - * / **`、比较、`and / or / not`。")
+    st.markdown("**比率**: " + " · ".join(f"`{k}` {ALIAS_NAMES.get(k, '')}" for k in ALIASES))
+    st.markdown("**函数** (沿期间轴): " + " · ".join(f"`{f}`" for f in FUNCS) +
+                "; 如 `rising(DSO, 3)` 连续 3 期上升, `growth(NETPROFIT)` 同比, `mean(ROE, 3)` 3 期均值")
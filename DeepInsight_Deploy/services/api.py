@@ -0,0 +1,452 @@
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait, TimeoutError as FutureTimeout
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+from services.telemetry import span, inc, registry
+
+# ==========================================
+# 无界面建模接口 (HTTP, 只返回数值, 不生成 xlsx)
+# ==========================================
+# 与 dashboard.py 并列运行, 供量化 / 报表系统取数:
+#   GET  /v1/history/<代码>?freq=A&periods=7            标准化后的历史数据 (元)
+#   GET  /v1/projection/<代码>?freq=A&years=5&drivers=  三表预测 (百万元), drivers 为 JSON, 缺省取默认假设
+#   POST /v1/projection/<代码>   {"drivers": {"REV_GROWTH": 0.1, "SELL_RATE": [0.05, ...]}, "freq": "A"}
+#   POST /v1/batch               {"symbols": [...], "kind": "history" | "projection", "drivers": {...}, ...}
+#   GET  /healthz  /metrics  /metrics.json
+# 输出: format=json (默认) 或 format=arrow / Accept: application/vnd.apache.arrow.stream (需安装 pyarrow)。
+#   json  单个代码为一个对象 {symbol, periods, rows, values: [行 x 期间], ...}; 批量为 NDJSON, 每个代码一行
+#   arrow 长表 (symbol, section, item, period, value), 字符串列为字典编码, 缓冲区 zstd 压缩; 每个代码一个 record batch
+# 批量请求按完成先后逐个代码分块写出 (chunked), 不等全部算完; 单个代码失败只影响该代码 (error 行)。
+# 计算在进程池中进行 (--workers, 吞吐随进程数扩展), HTTP 线程只做收发; 只跑计算引擎, 不调用 xlsxwriter。
+# 各进程保留最近整理过的数据池 (DEEPINSIGHT_API_POOL_TTL 秒内复用), 同一代码换假设反复请求时不再读缓存、重新标准化。
+# python -m services.api [--port 8090] [--workers 4]
+
+DEFAULT_PORT = int(os.environ.get("DEEPINSIGHT_API_PORT", 8090))
+REQUEST_TIMEOUT = float(os.environ.get("DEEPINSIGHT_API_TIMEOUT", 120))
+MAX_BATCH = int(os.environ.get("DEEPINSIGHT_API_MAX_BATCH", 1000))
+FREQS = ("A", "Q", "TTM")
+JSON_MIME = "application/json"
+NDJSON_MIME = "application/x-ndjson"
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+
+
+class ApiError(Exception):
+    """带 HTTP 状态码的请求错误 (可跨进程传回)。"""
+
+    def __init__(self, status, message):
+        super().__init__(status, message)
+        self.status, self.message = status, message
+
+    def __str__(self): return self.message
+
+
+# ==========================================
+# 计算 (在子进程中执行)
+# ==========================================
+
+POOL_TTL = float(os.environ.get("DEEPINSIGHT_API_POOL_TTL", 300))
+POOL_MAX = int(os.environ.get("DEEPINSIGHT_API_POOL_MAX", 2000))
+
+_client = None  # 子进程内的数据接口 (None 为 akshare; 基准测试传入替身)
+_pools = OrderedDict()  # (代码, 口径, 期数) -> (时间, data_pool, years); 每个约 8 KB
+
+
+def _data_pool(code, freq, n_periods):
+    """近期整理过的数据池直接复用 (读报表缓存 + 标准化约 15 ms, 预测本身约 3 ms); 超过 POOL_TTL 秒重新取。"""
+    from services.model_engine import fetch_data
+    key, now = (code, freq, n_periods), time.monotonic()
+    hit = _pools.get(key)
+    if hit is not None and now - hit[0] < POOL_TTL:
+        _pools.move_to_end(key)
+        inc("api_pool_cache_total", result="hit")
+        return hit[1], hit[2]
+    data_pool, years = fetch_data(code, client=_client, freq=freq, n_periods=n_periods)
+    inc("api_pool_cache_total", result="miss")
+    if data_pool:
+        _pools[key] = (now, data_pool, years)
+        while len(_pools) > POOL_MAX: _pools.popitem(last=False)
+    return data_pool, years
+
+
+def _init_worker(workers, client_factory=None):
+    # 屏蔽引擎内部的逐条打印; 各进程各有一个调度器, 平分每个上游主机的限速
+    global _client
+    sys.stdout = open(os.devnull, "w")
+    if client_factory is not None: _client = client_factory()
+    import services.model_engine  # noqa: F401
+    from services.scheduler import get_scheduler
+    from services.telemetry import start_from_env
+    get_scheduler().share(workers)
+    os.environ.pop("DEEPINSIGHT_METRICS_PORT", None)
+    start_from_env()
+
+
+def check_drivers(drivers, n_proj):
+    from services.projection import ALL_DRIVER_CODES
+    if not drivers: return {}
+    if not isinstance(drivers, dict): raise ApiError(400, "drivers 应为 {驱动因子: 数值或逐年数值列表}")
+    out = {}
+    for k, v in drivers.items():
+        if k not in ALL_DRIVER_CODES: raise ApiError(400, f"未知驱动因子: {k} (可选: {', '.join(ALL_DRIVER_CODES)})")
+        try: v = np.asarray(v, dtype=np.float64)
+        except (TypeError, ValueError): raise ApiError(400, f"驱动因子 {k} 的取值不是数值")
+        if v.ndim > 1 or (v.ndim == 1 and len(v) != n_proj):
+            raise ApiError(400, f"驱动因子 {k} 应为标量或 {n_proj} 个逐年数值")
+        out[k] = v
+    return out
+
+
+def compute(kind, symbol, freq="A", n_periods=None, drivers=None, n_proj=None, fmt="json"):
+    """单个代码: 抓取 (走报表缓存) -> 标准化 -> [预测]; fmt=json 时直接编码好返回字节, 否则返回数组。"""
+    from services.fetcher import to_code
+    from services.projection import project, N_PROJ
+    from services.datapool import ITEMS
+    code = to_code(symbol)
+    n_proj = n_proj or N_PROJ
+    with span("api.compute", symbol=code, freq=freq, mode=kind):
+        data_pool, years = _data_pool(code, freq, n_periods)
+        if not data_pool: raise ApiError(404, f"{code} 无可用数据")
+        if kind == "history":
+            payload = {"symbol": code, "kind": kind, "freq": freq, "unit": "元", "periods": list(years),
+                       "rows": list(ITEMS), "values": data_pool.values.T}
+        else:
+            try: proj = project(data_pool, years, drivers, n_proj)
+            except ValueError as e: raise ApiError(400, str(e))
+            names = list(proj.rows)
+            payload = {"symbol": code, "kind": kind, "freq": freq, "unit": "百万元", "periods": proj.years,
+                       "n_hist": len(proj.hist_years), "rows": names,
+                       "values": np.stack([proj.rows[n][0] for n in names])}
+    return encode_json(payload) if fmt == "json" else payload
+
+
+# ==========================================
+# 编码
+# ==========================================
+
+def encode_json(payload):
+    """紧凑 JSON (无空格, NaN / inf 记为 null)。"""
+    v = payload["values"]
+    body = dict(payload, values=np.where(np.isfinite(v), v, None).tolist())
+    return json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def error_json(symbol, status, message):
+    return json.dumps({"symbol": symbol, "status": status, "error": message}, ensure_ascii=False).encode()
+
+
+def _pa():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+        return pyarrow
+    except ImportError:
+        raise ApiError(406, "服务端未安装 pyarrow, 请改用 format=json")
+
+
+def arrow_schema():
+    pa = _pa()
+    dict_str = pa.dictionary(pa.int16(), pa.string())
+    return pa.schema([("symbol", dict_str), ("section", dict_str), ("item", dict_str), ("period", dict_str),
+                      ("value", pa.float64())])
+
+
+def arrow_batch(payload=None, symbol=None, error=None):
+    """一个代码的长表: 每个 (行, 期间) 一行; 预测行名 "IS.REV" 拆成 section=IS, item=REV; 出错时为一行 ERROR。"""
+    pa = _pa()
+    schema = arrow_schema()
+
+    def col(idx, names):
+        return pa.DictionaryArray.from_arrays(pa.array(idx, pa.int16()), pa.array(names, pa.string()))
+    if payload is None:
+        cols = [col([0], [symbol]), col([0], ["ERROR"]), col([0], [error]), col([0], [""]), pa.array([None], pa.float64())]
+        return pa.record_batch(cols, schema=schema)
+    rows, periods, v = payload["rows"], payload["periods"], payload["values"]
+    if payload["kind"] == "history":
+        split = [("HIST", r) for r in rows]
+    else:
+        split = [r.split(".", 1) for r in rows]
+    # 字典须去重 (不同 section 下有同名 item)
+    sections, items = list(dict.fromkeys(s for s, _ in split)), list(dict.fromkeys(i for _, i in split))
+    sec_idx = np.array([sections.index(s) for s, _ in split], dtype=np.int16)
+    pos = {k: j for j, k in enumerate(items)}
+    item_idx = np.array([pos[i] for _, i in split], dtype=np.int16)
+    n_rows, n_cols = v.shape
+    r = np.repeat(np.arange(n_rows), n_cols)
+    cols = [col(np.zeros(n_rows * n_cols, dtype=np.int16), [payload["symbol"]]), col(sec_idx[r], sections),
+            col(item_idx[r], items), col(np.tile(np.arange(n_cols, dtype=np.int16), n_rows), list(periods)),
+            pa.array(np.ascontiguousarray(v, dtype=np.float64).ravel(), from_pandas=True)]
+    return pa.record_batch(cols, schema=schema)
+
+
+class ArrowStream(object):
+    """逐个 record batch 写出 IPC 流; write 返回本次新产生的字节 (用于分块发送)。"""
+
+    def __init__(self):
+        pa = _pa()
+        self._sink = BytesIO()
+        # 缓冲区压缩 (pyarrow 读取时自动解压); 编译时未带 zstd 则不压缩
+        codec = "zstd" if pa.Codec.is_available("zstd") else None
+        self._writer = pa.ipc.new_stream(self._sink, arrow_schema(), options=pa.ipc.IpcWriteOptions(compression=codec))
+
+    def _take(self):
+        out = self._sink.getvalue()
+        self._sink.seek(0)
+        self._sink.truncate()
+        return out
+
+    def write(self, batch):
+        self._writer.write_batch(batch)
+        return self._take()
+
+    def close(self):
+        self._writer.close()
+        return self._take()
+
+
+# ==========================================
+# HTTP
+# ==========================================
+
+def _first(qs, name, default=None):
+    v = qs.get(name)
+    return v[0] if v else default
+
+
+def _int(value, name, lo, hi):
+    if value is None: return None
+    try: v = int(value)
+    except (TypeError, ValueError): raise ApiError(400, f"{name} 应为整数")
+    if not lo <= v <= hi: raise ApiError(400, f"{name} 应在 {lo}~{hi} 之间")
+    return v
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "DeepInsightAPI/15.0"
+
+    def do_GET(self): self._dispatch("GET")
+
+    def do_POST(self): self._dispatch("POST")
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose: sys.stderr.write(f"{self.address_string()} {fmt % args}\n")
+
+    # ---------- 路由 ----------
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        route = "/".join(parts[:2]) or "/"
+        t0 = time.perf_counter()
+        status = 200
+        self.headers_sent = False
+        try:
+            qs = parse_qs(url.query)
+            body = self._body() if method == "POST" else {}
+            if parts == ["healthz"]:
+                self._send(200, JSON_MIME, json.dumps({"ok": True, "workers": self.server.workers}).encode())
+            elif parts and parts[0] in ("metrics", "metrics.json"):
+                if parts[0] == "metrics.json":
+                    self._send(200, JSON_MIME, json.dumps(registry.snapshot(), ensure_ascii=False).encode())
+                else:
+                    self._send(200, "text/plain; version=0.0.4", registry.render().encode())
+            elif len(parts) == 3 and parts[0] == "v1" and parts[1] in ("history", "projection"):
+                self._single(parts[1], parts[2], self._params(qs, body))
+            elif parts == ["v1", "batch"] and method == "POST":
+                symbols = body.get("symbols")
+                if not isinstance(symbols, list) or not symbols: raise ApiError(400, "symbols 应为非空的代码列表")
+                if len(symbols) > MAX_BATCH: raise ApiError(413, f"单次最多 {MAX_BATCH} 个代码")
+                kind = body.get("kind", "projection")
+                if kind not in ("history", "projection"): raise ApiError(400, "kind 应为 history 或 projection")
+                self._batch(kind, list(dict.fromkeys(str(s) for s in symbols)), self._params(qs, body))
+            else:
+                raise ApiError(404, f"未知接口: {method} {url.path}")
+        except ApiError as e:
+            status = e.status
+            self._fail(e.status, e.message)
+        except (BrokenPipeError, ConnectionResetError):
+            status = 499
+        except Exception as e:
+            status = 500
+            self._fail(500, f"{type(e).__name__}: {e}")
+        inc("api_requests_total", route=route, status=status)
+        inc("api_request_seconds_total", time.perf_counter() - t0, route=route)
+
+    def _fail(self, status, message):
+        # 响应头已发出 (分块流式写出中) 时不能再写状态行, 只能断开连接
+        if self.headers_sent: self.close_connection = True
+        else: self._send(status, JSON_MIME, json.dumps({"error": message}, ensure_ascii=False).encode())
+
+    def _body(self):
+        n = int(self.headers.get("Content-Length") or 0)
+        if not n: return {}
+        try: body = json.loads(self.rfile.read(n))
+        except ValueError: raise ApiError(400, "请求体不是合法 JSON")
+        if not isinstance(body, dict): raise ApiError(400, "请求体应为 JSON 对象")
+        return body
+
+    def _params(self, qs, body):
+        from services.projection import N_PROJ
+        freq = str(body.get("freq") or _first(qs, "freq", "A")).upper()
+        if freq not in FREQS: raise ApiError(400, f"freq 应为 {' / '.join(FREQS)}")
+        n_proj = _int(body.get("years", _first(qs, "years")), "years", 1, 20) or N_PROJ
+        drivers = body.get("drivers")
+        if drivers is None and _first(qs, "drivers"):
+            try: drivers = json.loads(_first(qs, "drivers"))
+            except ValueError: raise ApiError(400, "drivers 不是合法 JSON")
+        fmt = str(body.get("format") or _first(qs, "format") or
+                  ("arrow" if "arrow" in (self.headers.get("Accept") or "") else "json")).lower()
+        if fmt not in ("json", "arrow"): raise ApiError(400, "format 应为 json 或 arrow")
+        if fmt == "arrow": _pa()
+        return {"freq": freq, "n_periods": _int(body.get("periods", _first(qs, "periods")), "periods", 1, 40),
+                "drivers": check_drivers(drivers, n_proj), "n_proj": n_proj, "fmt": fmt}
+
+    # ---------- 单个代码 ----------
+
+    def _single(self, kind, symbol, p):
+        fut = self.server.pool.submit(compute, kind, symbol, **p)
+        try: out = fut.result(timeout=REQUEST_TIMEOUT)
+        except FutureTimeout:
+            fut.cancel()
+            raise ApiError(504, f"{symbol} 计算超时")
+        if p["fmt"] == "json":
+            self._send(200, JSON_MIME, out)
+        else:
+            stream = ArrowStream()
+            self._send(200, ARROW_MIME, stream.write(arrow_batch(out)) + stream.close())
+
+    # ---------- 批量 ----------
+
+    def _batch(self, kind, symbols, p):
+        """按完成先后逐个代码写出; 同时在途的代码不超过 2 x 进程数, 避免一个大批量占满进程池的队列。"""
+        arrow = p["fmt"] == "arrow"
+        stream = ArrowStream() if arrow else None
+        self.send_response(200)
+        self.send_header("Content-Type", ARROW_MIME if arrow else NDJSON_MIME)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.headers_sent = True
+        in_flight = {}
+        try:
+            self._stream_batch(kind, symbols, p, stream, in_flight)
+            if arrow: self._chunk(stream.close())
+        except (BrokenPipeError, ConnectionResetError):
+            raise
+        except Exception as e:
+            # 已开始流式写出: 错误作为一条记录 (symbol 为空) 写入, 再正常结束分块, 不再写第二个状态行
+            for fut in in_flight: fut.cancel()
+            try:
+                self._chunk(self._encode_error(stream, None, 500, f"{type(e).__name__}: {e}"))
+                if arrow: self._chunk(stream.close())
+            except (BrokenPipeError, ConnectionResetError):
+                raise
+            except Exception:
+                # 流本身已损坏 (如 IPC 写入器失效): 不写结束块, 断开连接让客户端识别为不完整的响应
+                self.close_connection = True
+                return
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _stream_batch(self, kind, symbols, p, stream, in_flight):
+        arrow = stream is not None
+        pending = iter(symbols)
+        deadline = time.monotonic() + REQUEST_TIMEOUT * max(1, len(symbols) / max(1, self.server.workers))
+        while True:
+            while len(in_flight) < self.server.workers * 2:
+                sym = next(pending, None)
+                if sym is None: break
+                in_flight[self.server.pool.submit(compute, kind, sym, **p)] = sym
+            if not in_flight: break
+            finished, _ = wait(in_flight, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not finished:
+                # 超时: 剩余代码逐个记为失败
+                for fut, sym in in_flight.items():
+                    fut.cancel()
+                    self._chunk(self._encode_error(stream, sym, 504, "计算超时"))
+                for sym in pending: self._chunk(self._encode_error(stream, sym, 504, "计算超时"))
+                break
+            for fut in finished:
+                sym = in_flight.pop(fut)
+                try: out = fut.result()
+                except ApiError as e:
+                    self._chunk(self._encode_error(stream, sym, e.status, e.message))
+                    continue
+                except Exception as e:
+                    self._chunk(self._encode_error(stream, sym, 500, f"{type(e).__name__}: {e}"))
+                    continue
+                self._chunk(stream.write(arrow_batch(out)) if arrow else out + b"\n")
+                inc("api_batch_symbols_total", kind=kind)
+
+    @staticmethod
+    def _encode_error(stream, symbol, status, message):
+        inc("api_batch_errors_total", status=status)
+        if stream is not None: return stream.write(arrow_batch(symbol=symbol, error=message))
+        return error_json(symbol, status, message) + b"\n"
+
+    def _chunk(self, data):
+        if data: self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    def _send(self, status, ctype, body):
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.headers_sent = True
+        self.wfile.write(body)
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, workers=None, verbose=False, client_factory=None):
+        super().__init__(address, Handler)
+        self.workers = workers or os.cpu_count() or 1
+        self.verbose = verbose
+        # spawn: 子进程不继承父进程中已启动的线程池 / 调度器线程 (fork 后这些线程不存在, 提交的任务永远不会执行)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_worker, initargs=(self.workers, client_factory))
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT, workers=None, verbose=False):
+    server = ApiServer((host, port), workers, verbose)
+    print(f"🚀 DeepInsight API: http://{host}:{server.server_address[1]} (进程数 {server.workers})")
+    try: server.serve_forever()
+    except KeyboardInterrupt: pass
+    finally: server.server_close()
+    return 0
+
+
+def start_background(host="127.0.0.1", port=0, workers=None, client_factory=None):
+    """在后台线程中启动 (基准测试 / 嵌入使用); 返回服务器对象, 用完调用 shutdown() + server_close()。
+    client_factory: 子进程中构造数据接口的可调用对象 (须可 pickle, 如模块级的类)。"""
+    server = ApiServer((host, port), workers, client_factory=client_factory)
+    threading.Thread(target=server.serve_forever, name="deepinsight-api", daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="DeepInsight 建模接口 (JSON / Arrow, 不生成 xlsx)")
+    p.add_argument("--host", default=os.environ.get("DEEPINSIGHT_API_HOST", "127.0.0.1"))
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p.add_argument("--workers", type=int, default=None, help="计算进程数 (默认 CPU 核数)")
+    p.add_argument("--verbose", action="store_true", help="打印访问日志")
+    args = p.parse_args(argv)
+    return serve(args.host, args.port, args.workers, args.verbose)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
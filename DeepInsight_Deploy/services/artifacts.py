@@ -0,0 +1,166 @@
+import os
+import sys
+import time
+import shutil
+import hashlib
+import argparse
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+from services.schema import FULL_SCHEMA, DRIVERS
+from services.datapool import DataPool
+
+# ==========================================
+# 模型文件的内容寻址存储 (输入不变则不重建)
+# ==========================================
+# 键 = sha256(引擎指纹, 代码, 期间, 标准化后的 data_pool 数值, 自定义假设, 敏感性选项);
+# 引擎指纹 = ENGINE_VERSION + 科目表 / 默认假设 + 引擎源码 + xlsxwriter 版本, 任一变化都会生成新键。
+# <root>/objects/<键前 2 位>/<键>.xlsx        不可变的模型文件
+# <root>/<代码>_DeepInsight_V15_Standard.xlsx 指向该代码最近一次模型的硬链接 (不额外占空间)
+# 写入: 同目录临时文件写完后 os.replace, 并发写同一个键时后到者原样覆盖, 读者只会看到完整文件。
+# 命中时刷新文件 mtime, 淘汰按 mtime 做 LRU: 超过 max_age 的先删, 总量仍超过 max_bytes 时从最久未用的删起;
+# 对象被删后, 仍指向它的代码文件名一并删除。EVICT_GRACE 秒内访问过的对象不淘汰; 仍被并发淘汰时,
+# link 抛出 FileNotFoundError, 调用方 (model_engine._save) 按未命中重建。
+# python -m services.artifacts [--root generated_models] [--evict]
+
+ENGINE_VERSION = "15.0"   # 源码之外影响输出的改动 (如模板约定) 时手动提升
+DEFAULT_MAX_BYTES = int(os.environ.get("DEEPINSIGHT_ARTIFACT_MAX_BYTES", 2 * 1024 ** 3))
+DEFAULT_MAX_AGE = float(os.environ.get("DEEPINSIGHT_ARTIFACT_MAX_AGE", 30 * 86400))
+EVICT_INTERVAL = 60.0     # 写入后最多每分钟扫描淘汰一次
+EVICT_GRACE = float(os.environ.get("DEEPINSIGHT_ARTIFACT_GRACE", 300))  # 最近访问 / 写入的对象不淘汰 (命中后还要建链接、读取)
+SUFFIX = ".xlsx"
+# 决定模型内容的引擎源码
+ENGINE_MODULES = ("model_engine.py", "layout.py", "projection.py", "scenarios.py", "schema.py", "normalize.py", "datapool.py")
+
+
+@lru_cache(maxsize=1)
+def engine_fingerprint():
+    import xlsxwriter
+    h = hashlib.sha256(f"{ENGINE_VERSION}|{xlsxwriter.__version__}|{FULL_SCHEMA!r}|{DRIVERS!r}".encode())
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in ENGINE_MODULES:
+        with open(os.path.join(here, name), "rb") as f: h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+def artifact_key(symbol, data_pool, years, drivers=None, sensitivity=None):
+    h = hashlib.sha256(engine_fingerprint().encode())
+    drivers = sorted((k, np.asarray(v, dtype=np.float64).tolist()) for k, v in (drivers or {}).items())
+    h.update(repr((symbol, list(years), drivers, sensitivity)).encode())
+    keys = sorted(set().union(*(data_pool[y].keys() for y in years)))
+    h.update("\0".join(keys).encode())
+    if isinstance(data_pool, DataPool): M = data_pool.matrix(keys, years).T
+    else: M = np.array([[data_pool[y].get(k, 0.0) for k in keys] for y in years], dtype=np.float64)
+    h.update(np.ascontiguousarray(M).tobytes())
+    return h.hexdigest()
+
+
+class ArtifactStore(object):
+    def __init__(self, root, max_bytes=None, max_age=None, grace=None):
+        self.root = root
+        self.max_bytes = DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+        self.max_age = DEFAULT_MAX_AGE if max_age is None else max_age
+        self.grace = EVICT_GRACE if grace is None else grace
+        self.objects = os.path.join(root, "objects")
+        self._last_evict = 0.0
+        self._lock = threading.Lock()
+
+    def path(self, key): return os.path.join(self.objects, key[:2], key + SUFFIX)
+
+    def get(self, key):
+        """已有则刷新访问时间并返回路径, 否则 None。"""
+        path = self.path(key)
+        try: os.utime(path)
+        except FileNotFoundError: return None
+        return path
+
+    def put(self, key, write):
+        """write(临时路径) 写出完整文件后原子地放到键对应位置; 返回最终路径。"""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            write(tmp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp): os.remove(tmp)
+        if time.time() - self._last_evict > EVICT_INTERVAL: self.evict()
+        return path
+
+    def link(self, key, name):
+        """<root>/name 指向该键的文件 (硬链接, 不支持时复制); 返回该路径。对象已被淘汰时抛出 FileNotFoundError。"""
+        dest = os.path.join(self.root, name)
+        tmp = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            try: os.link(self.path(key), tmp)
+            except FileNotFoundError: raise
+            except OSError: shutil.copyfile(self.path(key), tmp)
+            os.replace(tmp, dest)
+        finally:
+            if os.path.exists(tmp): os.remove(tmp)
+        return dest
+
+    def _scan(self):
+        out = []
+        if not os.path.isdir(self.objects): return out
+        for sub in os.scandir(self.objects):
+            if not sub.is_dir(): continue
+            for e in os.scandir(sub.path):
+                if e.name.endswith(SUFFIX):
+                    st = e.stat()
+                    out.append((st.st_mtime, st.st_size, e.path, (st.st_dev, st.st_ino)))
+        return out
+
+    def evict(self, now=None):
+        """按 max_age / max_bytes 淘汰; 返回删除的对象数。"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._last_evict = now
+            objs = sorted(self._scan())
+            total = sum(o[1] for o in objs)
+            removed = set()
+            for mtime, size, path, inode in objs:
+                if now - mtime <= self.max_age and total <= self.max_bytes: break
+                if now - mtime < self.grace: break  # 按 mtime 排序, 其后都是刚访问过的
+                try: os.remove(path)
+                except FileNotFoundError: pass
+                total -= size
+                removed.add(inode)
+            if removed:
+                for e in os.scandir(self.root):
+                    if e.is_file() and e.name.endswith(SUFFIX) and (e.stat().st_dev, e.stat().st_ino) in removed:
+                        os.remove(e.path)
+        return len(removed)
+
+    def stats(self):
+        objs = self._scan()
+        return {"objects": len(objs), "bytes": sum(o[1] for o in objs), "max_bytes": self.max_bytes,
+                "oldest_age": round(time.time() - min(o[0] for o in objs), 1) if objs else None}
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(root):
+    root = os.path.abspath(root)
+    with _stores_lock:
+        if root not in _stores: _stores[root] = ArtifactStore(root)
+        return _stores[root]
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="DeepInsight 模型文件存储")
+    p.add_argument("--root", default="generated_models")
+    p.add_argument("--evict", action="store_true", help="立即按容量 / 期限淘汰")
+    args = p.parse_args(argv)
+    store = get_store(args.root)
+    if args.evict: print(f"🧹 已淘汰 {store.evict()} 个模型文件")
+    print(store.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import time
+import argparse
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# ==========================================
+# 全市场批量建模 (进程池 + 断点续跑)
+# ==========================================
+# python -m services.batch 600519 000895 ...
+# python -m services.batch --file csi800.txt --workers 8
+# 每个代码完成后立即追加一行到 manifest (JSONL); 重跑时跳过 manifest 中已成功的代码。
+# 财报季: python -m services.batch --file csi800.txt --refresh
+#   只重建缓存显示可能有新报告期的代码 (其余代码不发请求), 新报告期与本地历史合并;
+#   数据实际未变的代码直接沿用已有模型文件 (services/artifacts.py), 不重新生成。
+# 回测: python -m services.batch --file csi800.txt --as-of 2021-06-30 --out backtest/2021-06-30
+#   数据取自时点报表库 (services/pit_store.py) 截至该日的观测, 不回源。
+
+DEFAULT_OUT_DIR = "generated_models"
+
+
+def read_symbols(args_symbols, path=None):
+    raw = list(args_symbols or [])
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0]
+                raw += [s for s in line.replace(",", " ").split() if s]
+    return list(dict.fromkeys(s.strip() for s in raw if s.strip()))
+
+
+def load_manifest(path):
+    done = {}
+    if not os.path.exists(path): return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try: rec = json.loads(line)
+            except ValueError: continue  # 中断时可能留下半行
+            if rec.get("ok"): done[rec["symbol"]] = rec
+    return done
+
+
+def _init_worker(verbose, workers=1):
+    # 子进程预先加载引擎; 非 verbose 模式下屏蔽引擎内部的逐条打印
+    if not verbose: sys.stdout = open(os.devnull, "w")
+    import services.model_engine  # noqa: F401
+    # 批量回源走低优先级通道; 各进程各有一个调度器, 平分每个上游主机的限速
+    from services.scheduler import get_scheduler, set_default_priority, BATCH
+    set_default_priority(BATCH)
+    get_scheduler().share(workers)
+    # 各子进程各自追加 span 到 DEEPINSIGHT_TRACE_LOG; 指标端点只在主进程开 (端口不能重复绑定)
+    from services.telemetry import start_from_env
+    os.environ.pop("DEEPINSIGHT_METRICS_PORT", None)
+    start_from_env()
+
+
+def build_one(symbol, out_dir, reuse=True, as_of=None):
+    from services.model_engine import fetch_data, create_model
+    from services.telemetry import add_hook, remove_hook
+    t0 = time.perf_counter()
+    rec = {"symbol": symbol, "ok": False}
+    # 各阶段耗时 (同名 span 累加) 一并写入清单, 便于定位慢代码卡在哪一步
+    stages = {}
+    hook = add_hook(lambda sp: stages.__setitem__(sp.name, stages.get(sp.name, 0.0) + sp.duration))
+    try:
+        data_pool, years, report = fetch_data(symbol, return_report=True, as_of=as_of)
+        if report is not None:
+            rec["fetch_failed"] = report.failed
+            rec["new_periods"] = report.new_periods
+        else: rec["as_of"] = str(as_of)
+        if not data_pool:
+            rec["error"] = "无可用数据"
+        else:
+            result = create_model(symbol, data_pool, years, save=True, out_dir=out_dir, reuse=reuse)
+            rec.update(ok=True, path=os.path.join(out_dir, result.filename), size=result.size, years=[years[0], years[-1]],
+                       key=result.key, reused=result.reused)
+    except Exception as e:
+        rec["error"] = f"{type(e).__name__}: {e}"
+        rec["trace"] = traceback.format_exc(limit=3)
+    finally:
+        remove_hook(hook)
+    rec["stages"] = {k: round(v, 4) for k, v in stages.items()}
+    rec["elapsed"] = round(time.perf_counter() - t0, 3)
+    rec["finished_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    return rec
+
+
+def _progress(done, total, ok, failed, t0):
+    elapsed = time.perf_counter() - t0
+    rate = done / elapsed * 60 if elapsed > 0 else 0.0
+    eta = (total - done) / (rate / 60) if rate > 0 else 0.0
+    sys.stderr.write(f"\r⏳ {done}/{total} | ✅ {ok} ❌ {failed} | {rate:,.1f} 模型/分钟 | 剩余约 {eta:,.0f}s   ")
+    sys.stderr.flush()
+
+
+def due_symbols(symbols):
+    from services.fetcher import to_code
+    from services.statement_cache import get_cache
+    cache = get_cache()
+    return [s for s in symbols if cache.due(to_code(s))]
+
+
+def run_batch(symbols, out_dir=DEFAULT_OUT_DIR, workers=None, manifest=None, force=False, verbose=False, refresh=False,
+              as_of=None):
+    workers = workers or os.cpu_count() or 1
+    manifest = manifest or os.path.join(out_dir, "manifest.jsonl")
+    os.makedirs(out_dir, exist_ok=True)
+    done = {} if force else load_manifest(manifest)
+    todo = [s for s in symbols if s not in done]
+    if refresh:
+        # 父进程查询缓存后持有打开的 SQLite 连接; 子进程用 spawn 启动 (同 services/api.py), 不继承该连接
+        due = set(due_symbols([s for s in symbols if s in done]))
+        todo = [s for s in symbols if s not in done or s in due]
+        print(f"🔄 增量刷新: {len(due)} 个已完成代码可能有新报告期")
+    print(f"🚀 批量建模: 共 {len(symbols)} 个代码, 已完成 {len(symbols) - len(todo)}, 待处理 {len(todo)}, 进程数 {workers}")
+    if not todo: return {"total": len(symbols), "ok": 0, "failed": 0, "reused": 0, "skipped": len(symbols), "elapsed": 0.0}
+
+    ok = failed = reused = 0
+    t0 = time.perf_counter()
+    pending = iter(todo)
+    with open(manifest, "a", encoding="utf-8") as mf, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(verbose, workers),
+                                mp_context=multiprocessing.get_context("spawn")) as pool:
+        in_flight = set()
+        # 有界提交: 同时在途的任务不超过 2 x 进程数, 避免一次性提交数千个 future
+        while True:
+            while len(in_flight) < workers * 2:
+                sym = next(pending, None)
+                if sym is None: break
+                in_flight.add(pool.submit(build_one, sym, out_dir, not force, as_of))
+            if not in_flight: break
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                rec = fut.result()
+                ok += rec["ok"]; failed += not rec["ok"]; reused += bool(rec.get("reused"))
+                mf.write(json.dumps(rec, ensure_ascii=False) + "\n"); mf.flush()
+                _progress(ok + failed, len(todo), ok, failed, t0)
+    elapsed = time.perf_counter() - t0
+    sys.stderr.write("\n")
+    # reused: 数据与引擎均未变化, 沿用了存储中的模型文件 (未重建)
+    summary = {"total": len(symbols), "ok": ok, "failed": failed, "reused": reused, "skipped": len(symbols) - len(todo),
+               "elapsed": round(elapsed, 2), "models_per_min": round((ok + failed) / elapsed * 60, 1) if elapsed else 0.0}
+    print(f"✅ 批量完成: {summary}")
+    print(f"📄 清单: {manifest}")
+    return summary
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="DeepInsight 批量建模")
+    p.add_argument("symbols", nargs="*", help="股票代码, 如 600519 000895")
+    p.add_argument("--file", help="代码列表文件 (每行一个或逗号分隔, # 注释)")
+    p.add_argument("--workers", type=int, default=None, help="进程数 (默认 CPU 核数)")
+    p.add_argument("--out", default=DEFAULT_OUT_DIR, help="输出目录")
+    p.add_argument("--manifest", default=None, help="清单文件 (默认 <out>/manifest.jsonl)")
+    p.add_argument("--force", action="store_true", help="忽略清单, 全部重建")
+    p.add_argument("--refresh", action="store_true", help="增量刷新: 重建可能有新报告期的已完成代码")
+    p.add_argument("--verbose", action="store_true", help="显示引擎逐条日志")
+    p.add_argument("--as-of", default=None, help="YYYY-MM-DD: 用时点报表库中截至该日的数值建模 (回测)")
+    args = p.parse_args(argv)
+    symbols = read_symbols(args.symbols, args.file)
+    if not symbols: p.error("请提供股票代码或 --file")
+    if args.as_of and args.refresh: p.error("--as-of 与 --refresh 不能同时使用")
+    summary = run_batch(symbols, args.out, args.workers, args.manifest, args.force, args.verbose, args.refresh, args.as_of)
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
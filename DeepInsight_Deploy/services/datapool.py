@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+from services.schema import USED_KEYS, DERIVED_KEYS
+
+# ==========================================
+# 紧凑数据池: 期间 x 科目 float64 连续矩阵 + 全局固定科目索引
+# ==========================================
+# 取代 {期间: {科目: float}} 的嵌套字典: 每个期间不再持有一个字典和上百个 float 对象,
+# 科目索引由科目表 + 驱动因子表导出, 所有实例共用。读取方式与原字典一致:
+#   pool[期间].get(科目, 0) / pool.keys() / for 期间 in pool / 期间 in pool
+# 引擎内部按列整块取数 (column / matrix), 不再逐格查字典。
+# 接口中引擎不用的数值列可选保留在 extra (期间 x 列 DataFrame), 默认不保留。
+
+ITEMS = tuple(dict.fromkeys(USED_KEYS + DERIVED_KEYS))
+INDEX = {k: i for i, k in enumerate(ITEMS)}
+
+
+class PeriodRow(object):
+    """单个期间的只读视图, 行为同原来的 {科目: 数值} 字典 (全部固定科目都在, 缺失为 0)。"""
+    __slots__ = ("_row",)
+
+    def __init__(self, row):
+        self._row = row
+
+    def get(self, key, default=0.0):
+        i = INDEX.get(key)
+        return default if i is None else float(self._row[i])
+
+    def __getitem__(self, key): return float(self._row[INDEX[key]])
+
+    def __contains__(self, key): return key in INDEX
+
+    def __iter__(self): return iter(ITEMS)
+
+    def __len__(self): return len(ITEMS)
+
+    def keys(self): return ITEMS
+
+    def values(self): return self._row.tolist()
+
+    def items(self): return zip(ITEMS, self._row.tolist())
+
+
+class DataPool(object):
+    __slots__ = ("periods", "values", "extra")
+
+    def __init__(self, periods, values, extra=None):
+        self.periods = tuple(periods)  # 期数很少 (7~12), 按位置查找即可, 不另建字典
+        self.values = values           # float64 [期间 x ITEMS], C 连续
+        self.extra = extra             # 可选: 期间 x 未使用列 的 DataFrame
+
+    @classmethod
+    def from_frame(cls, mat, extra=None):
+        """normalize_statements 的输出 (期间 x 科目 DataFrame) -> DataPool; 不在 ITEMS 中的列丢弃。"""
+        values = np.zeros((len(mat.index), len(ITEMS)), dtype=np.float64)
+        cols = [k for k in mat.columns if k in INDEX]
+        values[:, [INDEX[k] for k in cols]] = mat[cols].to_numpy(dtype=np.float64)
+        return cls([str(p) for p in mat.index], values, extra)
+
+    @classmethod
+    def from_dict(cls, pool):
+        """原 {期间: {科目: 数值}} 字典 -> DataPool (旧代码 / 测试数据兼容)。"""
+        return cls.from_frame(pd.DataFrame.from_dict(pool, orient="index").fillna(0.0))
+
+    # --- 字典式访问 ---
+    def _row(self, period):
+        try: return self.periods.index(period)
+        except ValueError: raise KeyError(period)
+
+    def __getitem__(self, period): return PeriodRow(self.values[self._row(period)])
+
+    def get(self, period, default=None):
+        return self[period] if period in self.periods else default
+
+    def __contains__(self, period): return period in self.periods
+
+    def __iter__(self): return iter(self.periods)
+
+    def __len__(self): return len(self.periods)
+
+    def keys(self): return list(self.periods)
+
+    def items(self): return [(p, self[p]) for p in self.periods]
+
+    # --- 整块取数 ---
+    def column(self, key, periods=None):
+        """某科目在各期间的取值 (未知科目为 0)。"""
+        i = INDEX.get(key)
+        rows = self.values if periods is None else self.values[[self._row(p) for p in periods]]
+        return np.zeros(len(rows)) if i is None else rows[:, i].copy()
+
+    def matrix(self, keys, periods=None):
+        """[科目 x 期间] 矩阵 (未知科目整行为 0)。"""
+        rows = self.values if periods is None else self.values[[self._row(p) for p in periods]]
+        idx = [INDEX.get(k, -1) for k in keys]
+        out = rows[:, [max(i, 0) for i in idx]].T.copy()
+        out[[j for j, i in enumerate(idx) if i < 0]] = 0.0
+        return out
+
+    def to_frame(self): return pd.DataFrame(self.values, index=self.periods, columns=ITEMS)
+
+    def to_dict(self): return {p: dict(zip(ITEMS, self.values[i].tolist())) for i, p in enumerate(self.periods)}
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + (int(self.extra.memory_usage(deep=True).sum()) if self.extra is not None else 0)
+
+    def __repr__(self):
+        span = f"{self.periods[0]}..{self.periods[-1]}" if self.periods else "-"
+        return f"<DataPool {span} {len(self.periods)}x{len(ITEMS)}{' +extra' if self.extra is not None else ''}>"
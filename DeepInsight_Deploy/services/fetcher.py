@@ -0,0 +1,175 @@
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from services.statement_cache import get_cache, merge_history, report_dates
+from services.telemetry import span, inc
+from services.scheduler import get_scheduler, current_priority
+
+# ==========================================
+# 并发报表抓取 (单次超时 + 抖动退避重试 + 部分失败报告)
+# ==========================================
+STATEMENT_APIS = {
+    "IS": "stock_profit_sheet_by_report_em",
+    "BS": "stock_balance_sheet_by_report_em",
+    "CF": "stock_cash_flow_sheet_by_report_em",
+}
+
+DEFAULT_TIMEOUT = float(os.environ.get("DEEPINSIGHT_FETCH_TIMEOUT", 20))
+DEFAULT_RETRIES = int(os.environ.get("DEEPINSIGHT_FETCH_RETRIES", 2))
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+
+# 报表任务 (查缓存 / 合并) 与底层接口调用分开: 接口调用统一交给回源调度器 (services/scheduler.py,
+# 按主机限速 + 并发上限 + 优先级), 避免任务占满线程后等待自己提交的调用而死锁
+_stmt_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("DEEPINSIGHT_FETCH_WORKERS", 12)), thread_name_prefix="di-stmt")
+_rng = random.Random()
+_rng_lock = threading.Lock()
+_client = None
+
+
+def default_client():
+    """akshare 模块 (首次回源时才导入: 导入本身要数秒, 命中缓存的请求与看板首屏都不需要它)。"""
+    global _client
+    if _client is None:
+        import akshare
+        get_scheduler().install_transport()
+        _client = akshare
+    return _client
+
+
+def to_code(symbol):
+    symbol = symbol.strip()
+    if symbol[:2].upper() in ("SZ", "SH", "BJ"): return symbol.upper()
+    return f"SZ{symbol}" if symbol.startswith("3") or symbol.startswith("0") else f"SH{symbol}"
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    # full jitter: U(0, min(cap, base * 2^attempt))
+    with _rng_lock:
+        return _rng.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def call_with_retry(fn, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, priority=None):
+    """经回源调度器执行 fn, 单次调用超时后按抖动退避重试。返回 (结果, 尝试次数)。
+    超时从提交算起 (含排队与限速等待); 超时的调用无法强行终止, 会在调度器中自然结束。"""
+    err = None
+    for attempt in range(retries + 1):
+        fut = get_scheduler().submit(fn, priority)
+        try:
+            return fut.result(timeout=timeout), attempt + 1
+        except FutureTimeout:
+            fut.cancel()
+            err = TimeoutError(f"调用超时 ({timeout:.1f}s)")
+        except Exception as e:
+            err = e
+        if attempt < retries: time.sleep(backoff_delay(attempt))
+    raise err
+
+
+class StatementResult(object):
+    __slots__ = ("statement", "frame", "error", "attempts", "elapsed", "source", "new_periods")
+
+    def __init__(self, statement, frame=None, error=None, attempts=0, elapsed=0.0, source=None, new_periods=()):
+        self.statement = statement
+        self.frame = frame
+        self.error = error
+        self.attempts = attempts
+        self.elapsed = elapsed
+        self.source = source  # "cache" / "network" / "stale" / None(失败)
+        self.new_periods = list(new_periods)  # 本次回源新增的报告期
+
+    @property
+    def ok(self): return self.error is None and self.frame is not None
+
+    def __repr__(self):
+        state = f"ok[{self.source}]" if self.ok else f"failed({self.error})"
+        return f"<{self.statement} {state} attempts={self.attempts} {self.elapsed:.2f}s>"
+
+
+class FetchReport(object):
+    __slots__ = ("code", "results", "elapsed")
+
+    def __init__(self, code, results, elapsed):
+        self.code = code
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def frames(self): return {k: r.frame for k, r in self.results.items() if r.ok}
+
+    @property
+    def failed(self): return [k for k, r in self.results.items() if not r.ok]
+
+    @property
+    def ok(self): return not self.failed
+
+    @property
+    def new_periods(self): return sorted(set(p for r in self.results.values() for p in r.new_periods))
+
+    def summary(self):
+        return {k: {"ok": r.ok, "source": r.source, "attempts": r.attempts,
+                    "elapsed": round(r.elapsed, 3), "error": None if r.ok else str(r.error), "new_periods": r.new_periods}
+                for k, r in self.results.items()}
+
+
+def fetch_statement(code, statement, use_cache=True, client=None, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                    priority=None, revalidate=False):
+    # revalidate: 缓存未过期也回源 (已知有新披露时), 结果照常与缓存历史合并写回
+    with span("fetch.statement", symbol=code, statement=statement) as sp:
+        res = _fetch_statement(code, statement, use_cache, client, timeout, retries, priority, revalidate)
+        sp.set(source=res.source or "failed", attempts=res.attempts, rows=len(res.frame) if res.ok else 0,
+               new_periods=len(res.new_periods))
+    if use_cache: inc("cache_requests_total", result=_CACHE_RESULT.get(res.source, "error"))
+    if not res.ok: inc("fetch_errors_total", statement=statement, error=type(res.error).__name__)
+    return res
+
+
+# 结果来源 -> 缓存命中统计口径
+_CACHE_RESULT = {"cache": "hit", "network": "miss", "stale": "stale"}
+
+
+def _fetch_statement(code, statement, use_cache, client, timeout, retries, priority, revalidate=False):
+    # 先查本地缓存; 只有可能出现新报告期时才回源, 回源失败时退回旧缓存
+    t0 = time.perf_counter()
+    cache = get_cache() if use_cache else None
+    hit = cache.get(code, statement) if cache else None
+    if hit is not None and ((hit.fresh and not revalidate) or cache.offline):
+        return StatementResult(statement, hit.frame, attempts=0, elapsed=time.perf_counter() - t0, source="cache")
+    if cache is not None and cache.offline:
+        return StatementResult(statement, error=LookupError(f"离线模式下缓存中没有 {code} {statement}"),
+                               elapsed=time.perf_counter() - t0)
+    api = getattr(client or default_client(), STATEMENT_APIS[statement])
+    # 接口返回空表与调用失败同样处理: 有缓存时退回缓存
+    attempts = retries + 1
+    try:
+        df, attempts = call_with_retry(lambda: api(symbol=code), timeout, retries, priority)
+        if df is None or df.empty: raise ValueError("接口返回空表")
+    except Exception as e:
+        if hit is not None:
+            print(f"⚠️ {code} {statement} 回源失败, 使用缓存数据 (报告期至 {hit.latest_report})")
+            return StatementResult(statement, hit.frame, attempts=attempts, elapsed=time.perf_counter() - t0, source="stale")
+        return StatementResult(statement, error=e, attempts=attempts, elapsed=time.perf_counter() - t0)
+    # 与缓存中的历史合并: 只有新出现的报告期会改变本地数据
+    new_periods = sorted(report_dates(df) - report_dates(hit.frame)) if hit is not None else []
+    if hit is not None: df = merge_history(hit.frame, df)
+    if cache is not None: cache.put(code, statement, df)
+    return StatementResult(statement, df, attempts=attempts, elapsed=time.perf_counter() - t0, source="network",
+                           new_periods=new_periods)
+
+
+def fetch_statements(code, statements=("IS", "BS", "CF"), use_cache=True, client=None,
+                     timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, priority=None, revalidate=False):
+    """并发抓取三张报表, 总耗时约等于最慢的一张。单张失败不影响其它报表。
+    priority 缺省取调用方所在的通道 (services.scheduler.lane)。"""
+    t0 = time.perf_counter()
+    priority = current_priority() if priority is None else priority
+    futures = {s: _stmt_pool.submit(fetch_statement, code, s, use_cache, client, timeout, retries, priority, revalidate)
+               for s in statements}
+    results = {}
+    for s, fut in futures.items():
+        try: results[s] = fut.result()
+        except Exception as e: results[s] = StatementResult(s, error=e)
+    return FetchReport(code, results, time.perf_counter() - t0)
@@ -0,0 +1,204 @@
+import os
+import time
+import uuid
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from services.fetcher import to_code
+from services.statement_cache import get_cache
+from services.telemetry import span, inc, start_from_env
+
+# ==========================================
+# 后台建模任务队列 (看板用: 同一请求只建一次, 结果短期保留)
+# ==========================================
+# 看板脚本线程只负责提交与轮询, 抓取 + 建模在工作线程中完成, 刷新页面不会丢失进行中的任务。
+# 任务键 = (代码, 口径, 数据版本); 数据版本取报表缓存中的最新报告期, 同一键的并发请求共用一个任务 (single-flight),
+# 成功的结果在 TTL 内直接复用 (刷新 / 其他用户同样请求时立即返回)。
+# 抓取以网络等待为主, 建模单本约几十毫秒, 用线程池即可; 结果对象无需跨进程序列化。
+
+WORKERS = int(os.environ.get("DEEPINSIGHT_JOB_WORKERS", 4))
+RESULT_TTL = float(os.environ.get("DEEPINSIGHT_JOB_TTL", 600))
+MAX_RESULTS = int(os.environ.get("DEEPINSIGHT_JOB_MAX_RESULTS", 64))
+# 保留结果的总字节上限 (按工作簿大小计; 结果在内存中, 只限条数时长期运行的进程占用无上界)
+MAX_RESULT_BYTES = int(os.environ.get("DEEPINSIGHT_JOB_MAX_BYTES", 256 << 20))
+# 队列创建时在工作线程中预热建模引擎 (导入 + 常用版式编译), 首个建模请求不再承担冷启动
+PREWARM = os.environ.get("DEEPINSIGHT_PREWARM", "1") != "0"
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobError(Exception):
+    """可预期的失败 (无数据 / 未生成模型), 看板直接展示信息而非堆栈。"""
+
+
+class Job(object):
+    __slots__ = ("id", "key", "symbol", "freq", "state", "messages", "result", "error", "trace",
+                 "created", "finished", "nbytes", "_done")
+
+    def __init__(self, key, symbol, freq):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.symbol = symbol
+        self.freq = freq
+        self.state = QUEUED
+        self.messages = []        # 进度信息 (只追加, 看板轮询时整体重放)
+        self.result = None
+        self.error = None
+        self.trace = None
+        self.created = time.time()
+        self.finished = None
+        self.nbytes = 0           # 结果中工作簿的字节数, 用于保留上限
+        self._done = threading.Event()
+
+    def log(self, msg): self.messages.append(msg)
+
+    @property
+    def done(self): return self._done.is_set()
+
+    def wait(self, timeout=None): return self._done.wait(timeout)
+
+
+def build_job(job):
+    """默认任务: 抓取 -> 建模 (内存中) -> TTM 视图; 返回看板展示所需的结果字典。"""
+    from services.model_engine import fetch_data, create_model, build_pool
+    from services.scheduler import lane, INTERACTIVE
+    job.log(f"🔍 正在抓取 {job.symbol} 的核心财务数据...")
+    # 看板请求走交互通道, 回源时排在批量刷新之前
+    with lane(INTERACTIVE): data_pool, years, report = fetch_data(job.symbol, return_report=True, freq=job.freq)
+    for stmt in report.failed: job.log(f"⚠️ {stmt} 报表获取失败: {report.results[stmt].error}")
+    if report.new_periods: job.log(f"🆕 新增报告期: {', '.join(report.new_periods)}")
+    if not data_pool: raise JobError(f"无法获取代码 {job.symbol} 的数据，请检查代码是否正确（如：000895）。")
+    job.log("⚙️ 正在构建三张报表勾稽关系...")
+    model = create_model(job.symbol, data_pool, years, save=False, sensitivity=True)
+    if model is None: raise JobError("模型文件未生成，请检查后端日志。")
+    # 同一份原始报表再整理一份 TTM 口径, 仅用于展示
+    ttm_pool, ttm_periods = build_pool(report.frames, "TTM")
+    return {"symbol": job.symbol, "data_pool": data_pool, "years": years, "model": model, "ttm": (ttm_pool, ttm_periods)}
+
+
+def result_bytes(result):
+    # 只计内存中的工作簿 (save=False); 已落盘的结果只持有路径
+    model = result.get("model") if isinstance(result, dict) else None
+    return model.size if model is not None and model.path is None else 0
+
+
+def warm_up():
+    """导入建模引擎与数据接口, 编译默认窗口 (年报 7 年 / 单季 12 期) 的工作簿版式。"""
+    t0 = time.perf_counter()
+    from services.model_engine import build_workbook  # noqa: F401 (导入即预热)
+    from services.layout import compile_layout
+    from services.projection import N_PROJ
+    from services.fetcher import default_client
+    compile_layout(7, N_PROJ, 360, frozenset())
+    compile_layout(12, N_PROJ, 90, frozenset())
+    try: default_client()
+    except ImportError as e: print(f"⚠️ 数据接口预热失败: {e}")
+    return time.perf_counter() - t0
+
+
+class JobQueue(object):
+    def __init__(self, workers=None, ttl=None, max_results=None, runner=build_job, cache=None, prewarm=None,
+                 max_bytes=None):
+        self.ttl = RESULT_TTL if ttl is None else ttl
+        self.max_results = max_results or MAX_RESULTS
+        self.max_bytes = MAX_RESULT_BYTES if max_bytes is None else max_bytes
+        self.runner = runner
+        self.cache = cache
+        self._pool = ThreadPoolExecutor(max_workers=workers or WORKERS, thread_name_prefix="deepinsight-job")
+        self._lock = threading.Lock()
+        self._jobs = {}               # id -> Job (进行中 + 保留期内已结束)
+        self._by_key = OrderedDict()  # 键 -> Job (进行中或成功且未过期), 按完成先后排列
+        self.warm = self._pool.submit(warm_up) if (PREWARM if prewarm is None else prewarm) else None
+
+    def key(self, symbol, freq="A"):
+        code = to_code(symbol)
+        return (code, freq, (self.cache or get_cache()).version(code))
+
+    def submit(self, symbol, freq="A"):
+        """提交建模任务; 同键任务进行中或结果未过期时直接返回已有任务。"""
+        key = self.key(symbol, freq)
+        with self._lock:
+            self._expire(time.time())
+            job = self._by_key.get(key)
+            if job is not None:
+                inc("jobs_submitted_total", result="reused" if job.done else "joined")
+                return job
+            inc("jobs_submitted_total", result="new")
+            job = Job(key, symbol, freq)
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+        self._pool.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock: return self._jobs.get(job_id)
+
+    def lookup(self, symbol, freq="A"):
+        """只查询不提交 (页面刷新后按地址栏参数找回任务)。"""
+        key = self.key(symbol, freq)
+        with self._lock:
+            self._expire(time.time())
+            return self._by_key.get(key)
+
+    def _run(self, job):
+        job.state = RUNNING
+        inc("job_wait_seconds_total", time.time() - job.created)
+        try:
+            with span("job", symbol=job.symbol, freq=job.freq): job.result = self.runner(job)
+            job.nbytes = result_bytes(job.result)
+            job.state = DONE
+        except Exception as e:
+            job.error, job.trace, job.state = e, traceback.format_exc(), FAILED
+        job.finished = time.time()
+        inc("jobs_finished_total", state=job.state)
+        # 首次抓取 / 回源后缓存中的数据版本会变化, 结果同时登记在新版本的键下
+        fresh_key = self.key(job.symbol, job.freq) if job.state == DONE else None
+        with self._lock:
+            # 失败的任务不复用 (下次请求重新建), 但保留在 _jobs 中供轮询方读取错误
+            if job.state == FAILED: self._by_key.pop(job.key, None)
+            elif job.key in self._by_key: self._by_key.move_to_end(job.key)
+            if fresh_key is not None and fresh_key not in self._by_key: self._by_key[fresh_key] = job
+            job._done.set()
+            self._expire(job.finished)
+
+    def _expire(self, now):
+        # 一个任务可能登记在多个键下 (抓取前后的数据版本), 按任务清理
+        expired = {jid for jid, j in self._jobs.items() if j.finished is not None and now - j.finished > self.ttl}
+        for jid in expired: del self._jobs[jid]
+        for k in [k for k, j in self._by_key.items() if j.id in expired]: del self._by_key[k]
+        # 已完成的任务按登记顺序去重后计数, 超出上限的最早任务连同它的全部键一起移除
+        done = list({j.id: j for j in self._by_key.values() if j.done}.values())
+        drop = {j.id for j in done[:max(0, len(done) - self.max_results)]}
+        # 再按总字节数从最早的开始移除, 最新完成的一个始终保留
+        total = sum(j.nbytes for j in done if j.id not in drop)
+        for j in done[:-1]:
+            if total <= self.max_bytes: break
+            if j.id not in drop: drop.add(j.id); total -= j.nbytes
+        for jid in drop: self._jobs.pop(jid, None)
+        for k in [k for k, j in self._by_key.items() if j.id in drop]: del self._by_key[k]
+
+    def stats(self):
+        with self._lock:
+            states = [j.state for j in self._jobs.values()]
+        return {s: states.count(s) for s in (QUEUED, RUNNING, DONE, FAILED)}
+
+    def shutdown(self, wait=True): self._pool.shutdown(wait=wait)
+
+
+_default_queue = None
+_default_lock = threading.Lock()
+
+
+def get_queue():
+    # Streamlit 每个会话重跑脚本, 模块级单例在同一服务进程内共享
+    global _default_queue
+    with _default_lock:
+        if _default_queue is None:
+            start_from_env()
+            _default_queue = JobQueue()
+            # 定时预热报表缓存与预览索引 (DEEPINSIGHT_WARMUP_INTERVAL > 0 时)
+            from services.preview_index import start_warmup_from_env
+            start_warmup_from_env()
+    return _default_queue
@@ -0,0 +1,544 @@
+import functools
+from collections import namedtuple
+
+import numpy as np
+from xlsxwriter.utility import xl_col_to_name
+
+from services.projection import (
+    bs_side, IS_KEYS, BS_KEYS, SEGMENTS, SEG_COST_RATIO, FIXED_DRIVERS, FIN_DRIVERS, IS_RATE_KEYS, IS_EXPENSE_KEYS, IS_GAIN_KEYS,
+)
+from services.schema import FULL_SCHEMA, DRIVERS
+from services.datapool import DataPool
+from services.telemetry import span
+
+# ==========================================
+# 工作簿版式模板 (按 期数 / 口径 / 输入驱动 编译一次, 各公司复用)
+# ==========================================
+# 版式 (单元格位置、格式、公式文本) 只取决于科目表与历史/预测期数, 与公司无关。
+# compile_layout 用记录器跑一遍建表逻辑, 把数值位置记成占位符:
+#   Ref("Y", None, i)     表头第 i 期的期间标签
+#   Ref("T", 模板, None)   含证券代码的标题
+#   Ref("H", 科目, i)     第 i 个历史期的原始数据 (百万元)
+#   Ref("V", 行名, i)     计算引擎第 i 期的结果 (公式缓存值 / 输入值)
+# render 时一次性取出全部数值, 按位置写入。
+
+Ref = namedtuple("Ref", "kind, name, i")
+UNIT = 1e6
+
+_FONT = 'Arial'
+FORMATS = {
+    "title": {'bold': True, 'font_size': 14, 'font_color': '#003366', 'font_name': _FONT},
+    "th_hist": {'bold': True, 'align': 'center', 'border': 1, 'bg_color': '#D9E1F2', 'font_name': _FONT},
+    "th_proj": {'bold': True, 'align': 'center', 'border': 1, 'bg_color': '#FFF2CC', 'font_name': _FONT},
+    "item0": {'bold': True, 'indent': 0, 'font_name': _FONT},
+    "item1": {'indent': 2, 'font_name': _FONT},
+    "item2": {'indent': 4, 'font_color': '#666666', 'font_name': _FONT},
+    "num_h": {'num_format': '#,##0', 'font_color': '#003366', 'font_name': _FONT},
+    "num_f": {'num_format': '#,##0', 'font_color': 'black', 'font_name': _FONT},
+    "pct_h": {'num_format': '0.0%', 'font_color': '#003366', 'font_name': _FONT},
+    "inp": {'bg_color': '#FFFFCC', 'border': 1, 'font_color': 'blue', 'num_format': '#,##0'},
+    "inp_pct": {'bg_color': '#FFFFCC', 'border': 1, 'font_color': 'blue', 'num_format': '0.00%'},
+    "plug": {'bg_color': '#E6E6E6', 'font_color': 'red', 'bold': True, 'num_format': '#,##0'},
+}
+
+
+# 定义名称的工作表 (ref_map 分区 -> 工作表名)
+NAMED_SHEETS = {"ASSUMP": "2.基本假设", "REV": "3.业务拆分预测", "INV": "4.投资预测", "FIN": "5.筹资预测",
+                "WC": "6.营运资金", "IS": "7.利润表预测", "BS": "8.资产负债表预测", "CF": "9.现金流量表预测"}
+
+
+def sum_areas(col, rows):
+    """rows (0 起) 按连续区间合并成一个 SUM: =SUM(B4:B8,B10:B18,B21)。"""
+    rows = sorted(rows)
+    areas, start = [], rows[0]
+    for a, b in zip(rows, rows[1:] + [None]):
+        if b == a + 1: continue
+        areas.append(f"{col}{start+1}" if start == a else f"{col}{start+1}:{col}{a+1}")
+        start = b
+    return f"=SUM({','.join(areas)})"
+
+
+def V(name, i): return Ref("V", name, i)
+
+
+def H(key, i): return Ref("H", key, i)
+
+
+def Y(i): return Ref("Y", None, i)
+
+
+class _SheetRecorder(object):
+    """与 xlsxwriter Worksheet 同名的写入接口, 只记录操作; 同一单元格后写覆盖先写。"""
+    __slots__ = ("name", "setup", "cells")
+
+    def __init__(self, name):
+        self.name = name
+        self.setup = []
+        self.cells = {}
+
+    def hide_gridlines(self, *a): self.setup.append(("hide_gridlines", a))
+
+    def set_column(self, *a): self.setup.append(("set_column", a))
+
+    def set_tab_color(self, *a): self.setup.append(("set_tab_color", a))
+
+    def write(self, row, col, value, fmt=None): self.cells[(row, col)] = ("w", value, fmt)
+
+    def write_formula(self, row, col, formula, fmt=None, value=0): self.cells[(row, col)] = ("f", formula, fmt, value)
+
+
+# 单元格种类: 静态文本/标签, 引擎数值 (输入值), 历史数据, 公式
+_STATIC, _NUMBER, _HIST, _FORMULA = range(4)
+
+
+class SheetTemplate(object):
+    """单张工作表的版式: cells 按 (行, 列) 排序, 满足 constant_memory 模式逐行写出的要求。"""
+    __slots__ = ("name", "setup", "cells", "n_formulas")
+
+    def __init__(self, rec, slot_of, hist_slot_of):
+        self.name = rec.name
+        self.setup = rec.setup
+        self.cells = []
+        for (r, c), op in sorted(rec.cells.items()):
+            if op[0] == "f": cell = (r, c, _FORMULA, op[1], op[2], slot_of(op[3]))
+            elif isinstance(op[1], Ref) and op[1].kind == "V": cell = (r, c, _NUMBER, None, op[2], slot_of(op[1]))
+            elif isinstance(op[1], Ref) and op[1].kind == "H": cell = (r, c, _HIST, None, op[2], hist_slot_of(op[1]))
+            else: cell = (r, c, _STATIC, op[1], op[2], None)
+            self.cells.append(cell)
+        self.n_formulas = sum(1 for cell in self.cells if cell[2] == _FORMULA)
+
+
+class Layout(object):
+    """编译好的工作簿版式。row_names/slot_*: 引擎结果取值表; hist_keys/hist_*: 历史数据取值表。"""
+    __slots__ = ("n_hist", "n_proj", "sheets", "row_names", "slot_rows", "slot_cols", "hist_keys", "hist_rows",
+                 "hist_cols", "ref_map", "names", "n_formulas")
+
+    def __init__(self, n_hist, n_proj, recorders, ref_map, names=()):
+        self.n_hist, self.n_proj, self.ref_map, self.names = n_hist, n_proj, ref_map, list(names)
+        row_idx, slots, h_idx, h_slots = {}, {}, {}, {}
+
+        def slot_of(ref):
+            if not isinstance(ref, Ref): return ref  # 常量缓存值 (如 0)
+            key = (row_idx.setdefault(ref.name, len(row_idx)), ref.i)
+            return slots.setdefault(key, len(slots))
+
+        def hist_slot_of(ref):
+            key = (h_idx.setdefault(ref.name, len(h_idx)), ref.i)
+            return h_slots.setdefault(key, len(h_slots))
+
+        self.sheets = [SheetTemplate(r, slot_of, hist_slot_of) for r in recorders]
+        self.row_names = list(row_idx)
+        self.slot_rows = np.array([k[0] for k in slots], dtype=np.intp)
+        self.slot_cols = np.array([k[1] for k in slots], dtype=np.intp)
+        self.hist_keys = list(h_idx)
+        self.hist_rows = np.array([k[0] for k in h_slots], dtype=np.intp)
+        self.hist_cols = np.array([k[1] for k in h_slots], dtype=np.intp)
+        self.n_formulas = sum(s.n_formulas for s in self.sheets)
+
+    def bind(self, data_pool, years, proj):
+        """取出全部占位数值: (引擎结果列表, 历史数据列表)。非有限值按 Excel 记为 #DIV/0!。"""
+        M = np.stack([proj.rows[n][0] for n in self.row_names])
+        vals = M[self.slot_rows, self.slot_cols]
+        values = vals.tolist()
+        for j in np.flatnonzero(~np.isfinite(vals)): values[j] = "#DIV/0!"
+        if isinstance(data_pool, DataPool): Hm = data_pool.matrix(self.hist_keys, years) / UNIT
+        else: Hm = np.array([[data_pool[y].get(k, 0) for y in years] for k in self.hist_keys], dtype=np.float64) / UNIT
+        return values, Hm[self.hist_rows, self.hist_cols].tolist()
+
+    def render(self, wb, symbol, years, proj_years, data_pool, proj):
+        """把版式写入 xlsxwriter 工作簿; 返回 (格式字典, {工作表名: worksheet}) 供追加额外工作表。
+        各表严格按 (行, 列) 顺序调用公开写入接口, 满足 constant_memory 模式 "按行序写入" 的要求。"""
+        fmt = {k: wb.add_format(v) for k, v in FORMATS.items()}
+        fmt[None] = None
+        labels = list(years) + list(proj_years)
+        values, hist = self.bind(data_pool, years, proj)
+        for name, ref in self.names: wb.define_name(name, ref)
+        sheets = {}
+        for st in self.sheets:
+            with span("sheet", symbol=symbol, sheet=st.name, cells=len(st.cells)):
+                ws = wb.add_worksheet(st.name)
+                sheets[st.name] = ws
+                for method, args in st.setup: getattr(ws, method)(*args)
+                for r, c, kind, x, f, slot in st.cells:
+                    if kind == _STATIC:
+                        if isinstance(x, Ref): x = labels[x.i] if x.kind == "Y" else x.name.format(symbol=symbol)
+                        ws.write(r, c, x, fmt[f])
+                    elif kind == _NUMBER: ws.write(r, c, values[slot], fmt[f])
+                    elif kind == _HIST: ws.write_number(r, c, hist[slot], fmt[f])
+                    else: ws.write_formula(r, c, x, fmt[f], values[slot] if type(slot) is int else slot)
+        return fmt, sheets
+
+
+@functools.lru_cache(maxsize=32)
+def compile_layout(n_hist, n_proj, days, inputs=frozenset()):
+    """按 (历史期数, 预测期数, 期间天数, 外部输入的驱动) 编译版式。inputs 中的驱动在 2.基本假设 写为输入值。"""
+    schema = FULL_SCHEMA
+    T = n_hist + n_proj
+    ref_map = {s: {} for s in ['HIST', 'REV', 'ASSUMP', 'INV', 'FIN', 'WC', 'IS', 'BS']}
+    col_name = xl_col_to_name
+
+    # Sheet 1: History
+    s1 = _SheetRecorder("1.历史财务报表")
+    s1.hide_gridlines(2); s1.set_column(0,0,50); s1.set_column(1, n_hist+1, 14); s1.set_tab_color('#336699')
+    s1.write(0, 0, Ref("T", "{symbol} 历史数据底稿 (Standardized)", None), "title")
+    s1.write(2, 0, "会计科目", "th_hist")
+    for i in range(n_hist): s1.write(2, i+1, Y(i), "th_hist")
+    curr = 3
+    for sht in ["IS", "BS", "CF"]:
+        for cn, key, indent, bold in schema[sht]:
+            fmt = "item0" if bold else ("item1" if indent==1 else "item2")
+            s1.write(curr, 0, cn, fmt)
+            if key:
+                for i in range(n_hist): s1.write(curr, i+1, H(key, i), "num_h")
+                ref_map['HIST'][key] = curr
+            curr += 1
+        curr += 1
+
+    # Sheet 2: Assumptions
+    s_assump = _SheetRecorder("2.基本假设")
+    s_assump.hide_gridlines(2); s_assump.set_column(0,0,45); s_assump.set_column(1, T+1, 12); s_assump.set_tab_color('#FF0000')
+    s_assump.write(0, 0, "核心驱动假设", "title")
+    for i in range(T): s_assump.write(2, i+1, Y(i), "th_hist" if i<n_hist else "th_proj")
+    curr = 3
+    for code, name, num_key, den_key, default, is_growth in DRIVERS:
+        s_assump.write(curr, 0, name, "item1")
+        ref_map['ASSUMP'][code] = curr
+        for i in range(n_hist):
+            col = col_name(i+1)
+            if is_growth:
+                if i == 0: s_assump.write(curr, i+1, 0, "pct_h")
+                else:
+                    prev_col = col_name(i)
+                    if num_key in ref_map['HIST']:
+                        row_idx = ref_map['HIST'][num_key] + 1
+                        s_assump.write_formula(curr, i+1, f"=('1.历史财务报表'!{col}{row_idx}/'1.历史财务报表'!{prev_col}{row_idx})-1", "pct_h", V(f"ASSUMP.{code}", i))
+                    else: s_assump.write(curr, i+1, 0, "pct_h")
+            else:
+                if num_key in ref_map['HIST'] and den_key in ref_map['HIST']:
+                    num_row = ref_map['HIST'][num_key] + 1
+                    den_row = ref_map['HIST'][den_key] + 1
+                    formula = f"=IFERROR('1.历史财务报表'!{col}{num_row}/'1.历史财务报表'!{col}{den_row}, 0)"
+                    if "周转天数" in name: formula += f"*{days}"
+                    fmt = "num_h" if "周转天数" in name else "pct_h"
+                    s_assump.write_formula(curr, i+1, formula, fmt, V(f"ASSUMP.{code}", i))
+                else: s_assump.write(curr, i+1, 0, "num_h")
+        start_avg_col = col_name(max(1, n_hist-2))
+        end_avg_col = col_name(n_hist)
+        for i in range(n_proj):
+            col_idx = n_hist + i + 1
+            fmt = "inp" if "周转天数" in name else "inp_pct"
+            # 外部指定的驱动值直接作为输入写入, 否则取最近 3 年均值
+            if code in inputs: s_assump.write(curr, col_idx, V(f"ASSUMP.{code}", n_hist+i), fmt)
+            else:
+                avg_formula = f"=AVERAGE({start_avg_col}{curr+1}:{end_avg_col}{curr+1})"
+                s_assump.write_formula(curr, col_idx, avg_formula, fmt, V(f"ASSUMP.{code}", n_hist+i))
+        curr += 1
+    for code, name, default in FIXED_DRIVERS + FIN_DRIVERS:
+        s_assump.write(curr, 0, name, "item1")
+        fmt_h, fmt_p = ("num_h", "inp") if "天数" in name else ("pct_h", "inp_pct")
+        for i in range(T): s_assump.write(curr, i+1, V(f"ASSUMP.{code}", i), fmt_p if i>=n_hist else fmt_h)
+        ref_map['ASSUMP'][code] = curr; curr += 1
+
+    # Sheet 3 (Revenue)
+    s2 = _SheetRecorder("3.业务拆分预测"); s2.hide_gridlines(2); s2.set_column(0,0,35); s2.set_column(1, T+1, 13); s2.set_tab_color('#FF9900')
+    s2.write(0,0,"业务量价与成本模型", "title")
+    for i in range(T): s2.write(2, i+1, Y(i), "th_hist")
+    curr=3
+    total_rev_rows = []; total_cost_rows = []
+    for k, (seg, ratio) in enumerate(SEGMENTS):
+        s2.write(curr, 0, seg, "item0"); curr += 1
+        s2.write(curr, 0, "  销量 (Vol)", "item1"); curr += 1
+        s2.write(curr, 0, "  单价 (ASP)", "item1"); curr += 1
+        s2.write(curr, 0, "  单位成本 (Unit Cost)", "item1"); curr += 1
+        s2.write(curr, 0, f"  {seg}收入", "item1")
+        for i in range(T):
+            col = col_name(i+1)
+            if i < n_hist:
+                hist_ref = f"'1.历史财务报表'!{col}{ref_map['HIST']['TOTAL_OPERATE_INCOME']+1}"
+                s2.write_formula(curr, i+1, f"={hist_ref}*{ratio}", "num_h", V(f"REV.SEG{k}", i))
+            else:
+                prev=col_name(i); growth=f"'2.基本假设'!{col}{ref_map['ASSUMP']['REV_GROWTH']+1}"
+                s2.write_formula(curr, i+1, f"={prev}{curr+1}*(1+{growth})", "num_f", V(f"REV.SEG{k}", i))
+        total_rev_rows.append(curr); curr += 1
+        s2.write(curr, 0, f"  {seg}成本", "item1")
+        for i in range(T):
+            col = col_name(i+1)
+            if i < n_hist:
+                hist_ref = f"'1.历史财务报表'!{col}{ref_map['HIST']['OPERATE_COST']+1}"
+                s2.write_formula(curr, i+1, f"={hist_ref}*{ratio}", "num_h", V(f"REV.SEG{k}_COST", i))
+            else: s2.write_formula(curr, i+1, f"={col}{curr}*{SEG_COST_RATIO}", "num_f", V(f"REV.SEG{k}_COST", i))
+        total_cost_rows.append(curr); curr += 2
+    s2.write(curr, 0, "营业总收入合计", "item0")
+    for i in range(T):
+        col = col_name(i+1)
+        f = "=" + "+".join([f"{col}{r+1}" for r in total_rev_rows])
+        s2.write_formula(curr, i+1, f, "num_f", V("REV.TOTAL", i))
+    ref_map['REV']['TOTAL'] = curr; curr += 1
+    s2.write(curr, 0, "营业总成本合计", "item0")
+    for i in range(T):
+        col = col_name(i+1)
+        f = "=" + "+".join([f"{col}{r+1}" for r in total_cost_rows])
+        s2.write_formula(curr, i+1, f, "num_f", V("REV.COST", i))
+    ref_map['REV']['COST'] = curr
+
+    # Sheet 4-6 (Schedules)
+    s4 = _SheetRecorder("4.投资预测"); s4.hide_gridlines(2); s4.set_column(0,0,35); s4.set_column(1, T+1, 13)
+    s4.write(0,0,"CAPEX", "title"); curr=3
+    s4.write(curr,0,"期初PPE", "item1"); beg=curr; curr+=1
+    s4.write(curr,0,"CAPEX", "item1"); capex=curr; curr+=1
+    s4.write(curr,0,"Depr", "item1"); da=curr; curr+=1
+    s4.write(curr,0,"期末PPE", "item0"); end=curr
+    for i in range(T):
+        col = col_name(i+1); prev = col_name(i)
+        if i==0: s4.write(beg, i+1, 0, "num_f")
+        else: s4.write_formula(beg, i+1, f"={prev}{end+1}", "num_f", V("INV.BEG", i))
+        if i<n_hist: s4.write_formula(capex, i+1, f"='1.历史财务报表'!{col}{ref_map['HIST'].get('CONSTRUCT_LONG_ASSET', 0)+1}", "num_h", V("INV.CAPEX", i))
+        else: s4.write_formula(capex, i+1, f"='3.业务拆分预测'!{col}{ref_map['REV']['TOTAL']+1}*'2.基本假设'!{col}{ref_map['ASSUMP']['CAPEX_RATE']+1}", "num_f", V("INV.CAPEX", i))
+        s4.write_formula(da, i+1, f"={col}{beg+1}*'2.基本假设'!{col}{ref_map['ASSUMP']['DEPR_RATE']+1}", "num_f", V("INV.DA", i))
+        s4.write_formula(end, i+1, f"={col}{beg+1}+{col}{capex+1}-{col}{da+1}", "num_f", V("INV.PPE", i))
+    ref_map['INV']['DA']=da; ref_map['INV']['PPE']=end; ref_map['INV']['CAPEX']=capex
+
+    # Sheet 5: 筹资 (定期债务 + 循环贷款; 利息按平均余额, 由引擎迭代求解后作为数值写入, 避免循环引用)
+    s5 = _SheetRecorder("5.筹资预测"); s5.hide_gridlines(2); s5.set_column(0,0,35); s5.set_column(1, T+1, 13)
+    s5.write(0,0,"Debt", "title")
+    s5.write(1,0,"利息支出 / 利息收入按期初期末平均余额计, 为引擎迭代求解的收敛值 (修改假设后需重新生成); 其余为公式", "item2")
+    curr=3
+    fin_rows = ("TERM", "定期债务", "item1"), ("REVOLVER", "循环贷款 (Revolver)", "item1"), ("DEBT", "Debt Bal", "item0"), \
+               ("INT", "Interest", "item1"), ("INT_INC", "利息收入", "item1"), (None, None, None), \
+               ("MIN_CASH", "最低现金", "item1"), ("CASH_AVAIL", "融资前现金", "item1"), \
+               ("REV_CHG", "循环贷款提用 / 偿还", "item1"), ("SWEEP", "超额现金提前还债", "item1")
+    for code, label, fmt in fin_rows:
+        if code: s5.write(curr, 0, label, fmt); ref_map['FIN'][code] = curr
+        curr += 1
+    fr = lambda code: ref_map['FIN'][code] + 1
+    a_ref = lambda code, col: f"'2.基本假设'!{col}{ref_map['ASSUMP'][code]+1}"
+    for i in range(T):
+        col = col_name(i+1); prev=col_name(i)
+        if i<n_hist:
+            s5.write_formula(fr("TERM")-1, i+1, f"='1.历史财务报表'!{col}{ref_map['HIST'].get('SHORT_LOAN',0)+1}", "num_h", V("FIN.TERM", i))
+            s5.write(fr("REVOLVER")-1, i+1, 0, "num_h")
+            s5.write_formula(fr("INT")-1, i+1, f"={col}{fr('DEBT')}*{a_ref('DEBT_RATE', col)}", "num_f", V("FIN.INT", i))
+            s5.write_formula(fr("INT_INC")-1, i+1, f"='1.历史财务报表'!{col}{ref_map['HIST']['INTEREST_INCOME']+1}", "num_h", V("FIN.INT_INC", i))
+            for code in ("MIN_CASH", "CASH_AVAIL", "REV_CHG", "SWEEP"): s5.write(fr(code)-1, i+1, 0, "num_h")
+        else:
+            s5.write_formula(fr("TERM")-1, i+1, f"={prev}{fr('TERM')}+{col}{fr('SWEEP')}", "num_f", V("FIN.TERM", i))
+            s5.write_formula(fr("REVOLVER")-1, i+1, f"={prev}{fr('REVOLVER')}+{col}{fr('REV_CHG')}", "num_f", V("FIN.REVOLVER", i))
+            s5.write(fr("INT")-1, i+1, V("FIN.INT", i), "num_f")
+            s5.write(fr("INT_INC")-1, i+1, V("FIN.INT_INC", i), "num_f")
+            s5.write_formula(fr("MIN_CASH")-1, i+1, f"='3.业务拆分预测'!{col}{ref_map['REV']['COST']+1}/{days}*{a_ref('MIN_CASH_DAYS', col)}", "num_f", V("FIN.MIN_CASH", i))
+            # 融资前现金引用 9.现金流量表预测, 行号在下方建好现金流量表后回填
+            s5.write_formula(fr("REV_CHG")-1, i+1, f"=MAX({col}{fr('MIN_CASH')}-{col}{fr('CASH_AVAIL')},-{prev}{fr('REVOLVER')})", "num_f", V("FIN.REV_CHG", i))
+            s5.write_formula(fr("SWEEP")-1, i+1, f"=-MIN(MAX({col}{fr('CASH_AVAIL')}-{col}{fr('MIN_CASH')}-{prev}{fr('REVOLVER')},0)*{a_ref('SWEEP_RATE', col)},{prev}{fr('TERM')})", "num_f", V("FIN.SWEEP", i))
+        s5.write_formula(fr("DEBT")-1, i+1, f"={col}{fr('TERM')}+{col}{fr('REVOLVER')}", "num_f", V("FIN.DEBT", i))
+
+    s6 = _SheetRecorder("6.营运资金"); s6.hide_gridlines(2); s6.set_column(0,0,35); s6.set_column(1, T+1, 13)
+    s6.write(0,0,"WC", "title"); curr=3
+    s6.write(curr,0,"AR", "item0"); ar=curr; curr+=1
+    s6.write(curr,0,"Inv", "item0"); inv=curr; curr+=1
+    s6.write(curr,0,"AP", "item0"); ap=curr; curr+=1
+    s6.write(curr,0,"Change", "item0"); chg=curr
+    for i in range(T):
+        col = col_name(i+1); prev=col_name(i)
+        if i<n_hist:
+            s6.write_formula(ar, i+1, f"='1.历史财务报表'!{col}{ref_map['HIST']['ACCOUNTS_RECE']+1}", "num_h", V("WC.AR", i))
+            s6.write_formula(inv, i+1, f"='1.历史财务报表'!{col}{ref_map['HIST']['INVENTORY']+1}", "num_h", V("WC.INV", i))
+            s6.write_formula(ap, i+1, f"='1.历史财务报表'!{col}{ref_map['HIST']['ACCOUNTS_PAYABLE']+1}", "num_h", V("WC.AP", i))
+        else:
+            drv = lambda code: f"'2.基本假设'!{col}{ref_map['ASSUMP'][code]+1}"
+            s6.write_formula(ar, i+1, f"='3.业务拆分预测'!{col}{ref_map['REV']['TOTAL']+1}/{days}*{drv('DSO')}", "num_f", V("WC.AR", i))
+            s6.write_formula(inv, i+1, f"='3.业务拆分预测'!{col}{ref_map['REV']['COST']+1}/{days}*{drv('DIO')}", "num_f", V("WC.INV", i))
+            s6.write_formula(ap, i+1, f"='3.业务拆分预测'!{col}{ref_map['REV']['COST']+1}/{days}*{drv('DPO')}", "num_f", V("WC.AP", i))
+        if i==0: s6.write(chg, i+1, 0, "num_f")
+        else: s6.write_formula(chg, i+1, f"=-({col}{ar+1}-{prev}{ar+1} + {col}{inv+1}-{prev}{inv+1} - ({col}{ap+1}-{prev}{ap+1}))", "num_f", V("WC.CHG", i))
+    ref_map['WC']['AR']=ar; ref_map['WC']['INV']=inv; ref_map['WC']['AP']=ap; ref_map['WC']['CHG']=chg
+
+    # Sheet 7: IS
+    s7 = _SheetRecorder("7.利润表预测"); s7.hide_gridlines(2); s7.set_column(0,0,45)
+    s7.write(0,0,"IS", "title"); curr=3
+    s7.write(curr, 0, "营业总收入", "item0")
+    for i in range(T):
+        col = col_name(i+1)
+        s7.write_formula(curr, i+1, f"='3.业务拆分预测'!{col}{ref_map['REV']['TOTAL']+1}", "num_f", V("IS.REV", i))
+    curr += 1
+    s7.write(curr, 0, "营业成本", "item0")
+    for i in range(T):
+        col = col_name(i+1)
+        s7.write_formula(curr, i+1, f"='3.业务拆分预测'!{col}{ref_map['REV']['COST']+1}", "num_f", V("IS.COST", i))
+    curr += 1
+    # 利润表各行行号先确定, 便于小计行引用其后的科目 (如归母净利润引用少数股东损益)
+    is_rows = {key: curr + k for k, key in enumerate(IS_KEYS)}
+    rev_row, cost_row = is_rows[IS_KEYS[0]] - 2, is_rows[IS_KEYS[0]] - 1
+    hist_np, hist_mi = ref_map['HIST']['NETPROFIT']+1, ref_map['HIST']['MINORITY_INTEREST']+1
+    last_col = col_name(n_hist)
+    for cn, key, indent, bold in schema['IS']:
+        if key not in IS_KEYS: continue
+        fmt = "item0" if bold else ("item1" if indent==1 else "item2")
+        s7.write(curr, 0, cn, fmt)
+        for i in range(T):
+            col = col_name(i+1)
+            r = lambda k: f"{col}{is_rows[k]+1}"
+            if i < n_hist:
+                s7.write_formula(curr, i+1, f"='1.历史财务报表'!{col}{ref_map['HIST'][key]+1}", "num_h", V("IS." + key, i))
+                continue
+            if key in IS_RATE_KEYS:
+                f = f"={col}{rev_row+1}*'2.基本假设'!{col}{ref_map['ASSUMP'][IS_RATE_KEYS[key]]+1}"
+            elif key == "INTEREST_EXPENSE": f = f"='5.筹资预测'!{col}{ref_map['FIN']['INT']+1}"
+            elif key == "INTEREST_INCOME": f = f"='5.筹资预测'!{col}{ref_map['FIN']['INT_INC']+1}"
+            elif key == "FINANCE_EXPENSE": f = f"={r('INTEREST_EXPENSE')}-{r('INTEREST_INCOME')}"
+            elif key == "OPERATE_PROFIT":
+                f = f"={col}{rev_row+1}-{col}{cost_row+1}-" + "-".join(r(k) for k in IS_EXPENSE_KEYS) + "+" + "+".join(r(k) for k in IS_GAIN_KEYS)
+            elif key == "TOTAL_PROFIT": f = f"={r('OPERATE_PROFIT')}+{r('NONBUSINESS_INCOME')}-{r('NONBUSINESS_EXPENSE')}"
+            elif key == "INCOME_TAX": f = f"={r('TOTAL_PROFIT')}*'2.基本假设'!{col}{ref_map['ASSUMP']['INCOME_TAX_RATE']+1}"
+            elif key == "NETPROFIT": f = f"={r('TOTAL_PROFIT')}-{r('INCOME_TAX')}"
+            elif key == "MINORITY_INTEREST":
+                f = f"={r('NETPROFIT')}*IFERROR('1.历史财务报表'!{last_col}{hist_mi}/'1.历史财务报表'!{last_col}{hist_np}, 0)"
+            elif key == "PARENT_NETPROFIT": f = f"={r('NETPROFIT')}-{r('MINORITY_INTEREST')}"
+            elif key == "EBITDA_CALC": f = f"={r('TOTAL_PROFIT')}+{r('FINANCE_EXPENSE')}"
+            else:
+                s7.write(curr, i+1, 0, "num_f")  # 其余损益项不做预测
+                continue
+            s7.write_formula(curr, i+1, f, "num_f", V("IS." + key, i))
+        ref_map['IS'][key] = curr; curr += 1
+
+    # Sheet 8: BS (期末现金引用 9.现金流量表预测 的期末现金行, 行号在下方建好现金流量表后回填)
+    s8 = _SheetRecorder("8.资产负债表预测"); s8.hide_gridlines(2); s8.set_column(0,0,45)
+    s8.write(0,0,"BS", "title"); curr=3
+    asset_rows=[]; liab_rows=[]; equity_rows=[]; plug_row=-1
+    s8.write(curr, 0, "货币资金", "item1")
+    asset_rows.append(curr); cash_row=curr
+    for i in range(n_hist):
+        col = col_name(i+1)
+        s8.write_formula(curr, i+1, f"='1.历史财务报表'!{col}{ref_map['HIST']['MONETARYFUNDS']+1}", "num_h", V("BS.MONETARYFUNDS", i))
+    curr+=1
+    for cn, key, indent, bold in schema['BS']:
+        if key not in BS_KEYS: continue
+        if key == "BS_PLUG":
+            # 历史未建模科目净额 (最近一期配平项) 在预测期结转, 预测期的配平项应为 0
+            carry_row = curr; s8.write(curr, 0, "未建模科目净额 (结转)", "item1")
+            for i in range(T):
+                if i < n_hist: s8.write(curr, i+1, 0, "num_h")
+                else: s8.write_formula(curr, i+1, f"=${col_name(n_hist)}${curr+2}", "num_f", V("BS.CARRY", i))
+            curr += 1
+            plug_row = curr; s8.write(curr, 0, "报表配平项 (Plug)", "plug"); curr += 1; continue
+        fmt = "item0" if bold else ("item1" if indent==1 else "item2")
+        s8.write(curr, 0, cn, fmt)
+        side = bs_side(key)
+        if side == "A": asset_rows.append(curr)
+        elif side == "E": equity_rows.append(curr)
+        else: liab_rows.append(curr)
+        for i in range(T):
+            col = col_name(i+1)
+            val = V("BS." + key, i)
+            if key == "ACCOUNTS_RECE": s8.write_formula(curr, i+1, f"='6.营运资金'!{col}{ref_map['WC']['AR']+1}", "num_f", val)
+            elif key == "INVENTORY": s8.write_formula(curr, i+1, f"='6.营运资金'!{col}{ref_map['WC']['INV']+1}", "num_f", val)
+            elif key == "ACCOUNTS_PAYABLE": s8.write_formula(curr, i+1, f"='6.营运资金'!{col}{ref_map['WC']['AP']+1}", "num_f", val)
+            elif key == "FIXED_ASSET": s8.write_formula(curr, i+1, f"='4.投资预测'!{col}{ref_map['INV']['PPE']+1}", "num_f", val)
+            elif key == "SHORT_LOAN": s8.write_formula(curr, i+1, f"='5.筹资预测'!{col}{ref_map['FIN']['DEBT']+1}", "num_f", val)
+            elif key == "UNDISTRIBUTED_PROFIT" and i >= n_hist:
+                prev = col_name(i)
+                ni = f"'7.利润表预测'!{col}{ref_map['IS']['NETPROFIT']+1}"
+                div = f"'2.基本假设'!{col}{ref_map['ASSUMP']['DIV_PAYOUT']+1}"
+                s8.write_formula(curr, i+1, f"={prev}{curr+1} + {ni}*(1-{div})", "num_f", val)
+            elif i < n_hist and key in ref_map['HIST']:
+                s8.write_formula(curr, i+1, f"='1.历史财务报表'!{col}{ref_map['HIST'][key]+1}", "num_h", val)
+            else:
+                prev = col_name(i)
+                s8.write_formula(curr, i+1, f"={prev}{curr+1}", "num_f", val)
+        ref_map['BS'][key] = curr
+        curr += 1
+    # 合计与配平只引用小计行, 小计用连续区域 SUM (每个数只算一次, 依赖边与公式长度都更少)
+    s8.write(curr, 0, "资产总计", "item0"); asset_total_row = curr
+    for i in range(T): s8.write_formula(curr, i+1, sum_areas(col_name(i+1), asset_rows), "num_f", V("BS.ASSET_TOTAL", i))
+    ref_map['BS']['ASSET_TOTAL'] = curr; curr += 2
+    s8.write(curr, 0, "负债合计", "item1"); liab_total_row = curr
+    for i in range(T): s8.write_formula(curr, i+1, sum_areas(col_name(i+1), liab_rows), "num_f", V("BS.LIAB_TOTAL", i))
+    ref_map['BS']['LIAB_TOTAL'] = curr; curr += 1
+    s8.write(curr, 0, "所有者权益合计", "item1"); equity_total_row = curr
+    for i in range(T): s8.write_formula(curr, i+1, sum_areas(col_name(i+1), equity_rows), "num_f", V("BS.EQUITY_TOTAL", i))
+    ref_map['BS']['EQUITY_TOTAL'] = curr; curr += 1
+    s8.write(curr, 0, "负债权益合计", "item0")
+    for i in range(T):
+        col = col_name(i+1)
+        s8.write_formula(curr, i+1, f"={col}{liab_total_row+1}+{col}{equity_total_row+1}+{col}{carry_row+1}+{col}{plug_row+1}", "num_f", V("BS.LE_TOTAL", i))
+        s8.write_formula(plug_row, i+1, f"={col}{asset_total_row+1}-({col}{liab_total_row+1}+{col}{equity_total_row+1}+{col}{carry_row+1})", "plug", V("BS.BS_PLUG", i))
+    ref_map['BS'].update(LE_TOTAL=curr, MONETARYFUNDS=cash_row, CARRY=carry_row, BS_PLUG=plug_row)
+
+    # Sheet 9: CF
+    s9 = _SheetRecorder("9.现金流量表预测"); s9.hide_gridlines(2); s9.set_column(0,0,45)
+    s9.write(0,0,"CF (Indirect)", "title"); curr=3
+    s9.write(curr, 0, "一、经营活动", "item0"); curr += 1
+    s9.write(curr, 0, "净利润", "item1"); ni_row=curr
+    for i in range(T):
+        col = col_name(i+1)
+        if i < n_hist: s9.write_formula(curr, i+1, f"='1.历史财务报表'!{col}{ref_map['HIST']['NETPROFIT']+1}", "num_h", V("CF.NI", i))
+        else: s9.write_formula(curr, i+1, f"='7.利润表预测'!{col}{ref_map['IS']['NETPROFIT']+1}", "num_f", V("CF.NI", i))
+    curr += 1
+    s9.write(curr, 0, "加: 折旧摊销", "item1")
+    for i in range(T):
+        col = col_name(i+1)
+        if i < n_hist:
+            cfo = f"'1.历史财务报表'!{col}{ref_map['HIST']['NETCASH_OPERATE']+1}"
+            ni = f"'1.历史财务报表'!{col}{ref_map['HIST']['NETPROFIT']+1}"
+            s9.write_formula(curr, i+1, f"={cfo}-{ni}", "num_h", V("CF.DA", i))
+        else: s9.write_formula(curr, i+1, f"='4.投资预测'!{col}{ref_map['INV']['DA']+1}", "num_f", V("CF.DA", i))
+    curr += 1
+    s9.write(curr, 0, "加: 营运资金变动", "item1"); wc_row=curr
+    for i in range(T):
+        col = col_name(i+1)
+        if i < n_hist: s9.write(curr, i+1, 0, "num_h")
+        else: s9.write_formula(curr, i+1, f"='6.营运资金'!{col}{ref_map['WC']['CHG']+1}", "num_f", V("CF.WC", i))
+    curr += 1
+    s9.write(curr, 0, "经营活动现金流净额", "item0"); cfo=curr
+    for i in range(T):
+        col = col_name(i+1)
+        if i < n_hist: s9.write_formula(curr, i+1, f"='1.历史财务报表'!{col}{ref_map['HIST']['NETCASH_OPERATE']+1}", "num_h", V("CF.CFO", i))
+        else: s9.write_formula(curr, i+1, f"=SUM({col}{ni_row+1}:{col}{wc_row+1})", "num_f", V("CF.CFO", i))
+    curr += 2
+    s9.write(curr, 0, "二、投资活动", "item0"); curr += 1
+    s9.write(curr, 0, "CAPEX", "item1")
+    for i in range(T):
+        col = col_name(i+1)
+        if i < n_hist: s9.write_formula(curr, i+1, f"=-'1.历史财务报表'!{col}{ref_map['HIST'].get('CONSTRUCT_LONG_ASSET', 0)+1}", "num_h", V("CF.CAPEX", i))
+        else: s9.write_formula(curr, i+1, f"=-'4.投资预测'!{col}{ref_map['INV']['CAPEX']+1}", "num_f", V("CF.CAPEX", i))
+    cfi=curr; curr += 2
+    s9.write(curr, 0, "三、筹资活动", "item0"); curr += 1
+    s9.write(curr, 0, "债务变动", "item1"); debt_row=curr
+    for i in range(T):
+        col = col_name(i+1)
+        if i < n_hist: s9.write(curr, i+1, 0, "num_h")
+        else: s9.write_formula(curr, i+1, f"='5.筹资预测'!{col}{fr('REV_CHG')}+'5.筹资预测'!{col}{fr('SWEEP')}", "num_f", V("CF.DEBT", i))
+    curr += 1
+    s9.write(curr, 0, "股利", "item1")
+    for i in range(T):
+        col = col_name(i+1)
+        if i < n_hist: s9.write_formula(curr, i+1, f"=-'1.历史财务报表'!{col}{ref_map['HIST'].get('ASSIGN_DIVIDEND_PORFIT',0)+1}", "num_h", V("CF.DIV", i))
+        else:
+            ni = f"'7.利润表预测'!{col}{ref_map['IS']['NETPROFIT']+1}"
+            rate = f"'2.基本假设'!{col}{ref_map['ASSUMP']['DIV_PAYOUT']+1}"
+            s9.write_formula(curr, i+1, f"=-{ni}*{rate}", "num_f", V("CF.DIV", i))
+    cff=curr; curr += 2
+    s9.write(curr, 0, "现金净增加额", "item0"); net_chg=curr
+    for i in range(T):
+        col = col_name(i+1)
+        if i < n_hist: s9.write_formula(curr, i+1, f"='1.历史财务报表'!{col}{ref_map['HIST']['CASH_NETINCREASE']+1}", "num_h", V("CF.NET", i))
+        else: s9.write_formula(curr, i+1, f"={col}{cfo+1}+{col}{cfi+1}+{col}{debt_row+1}+{col}{cff+1}", "num_f", V("CF.NET", i))
+    curr += 1
+    s9.write(curr, 0, "期初现金", "item1"); beg_c=curr; curr+=1
+    s9.write(curr, 0, "期末现金", "item0"); end_c=curr
+    for i in range(T):
+        col = col_name(i+1); prev = col_name(i)
+        # 首个预测期的期初现金取最近一期资产负债表的货币资金 (与资产负债表预测的起点一致)
+        if i==0 or i==n_hist: s9.write_formula(beg_c, i+1, f"='1.历史财务报表'!{col_name(max(i, 1))}{ref_map['HIST']['MONETARYFUNDS']+1}", "num_h" if i==0 else "num_f", V("CF.BEG", i))
+        else: s9.write_formula(beg_c, i+1, f"={prev}{end_c+1}", "num_f", V("CF.BEG", i))
+        s9.write_formula(end_c, i+1, f"={col}{beg_c+1}+{col}{net_chg+1}", "num_f", V("CF.END", i))
+    for i in range(n_hist, T):
+        col = col_name(i+1)
+        s8.write_formula(cash_row, i+1, f"='9.现金流量表预测'!{col}{end_c+1}", "num_f", V("BS.MONETARYFUNDS", i))
+        s5.write_formula(fr("CASH_AVAIL")-1, i+1, f"='9.现金流量表预测'!{col}{beg_c+1}+'9.现金流量表预测'!{col}{cfo+1}+'9.现金流量表预测'!{col}{cfi+1}+'9.现金流量表预测'!{col}{cff+1}", "num_f", V("FIN.CASH_AVAIL", i))
+    ref_map['CF'] = {"NI": ni_row, "CFO": cfo, "CAPEX": cfi, "DEBT": debt_row, "DIV": cff, "NET": net_chg, "BEG": beg_c, "END": end_c}
+
+    # 驱动与各预测页的行定义为工作簿名称, 名称与计算引擎的行名一致 (如 ASSUMP.DSO, INV.PPE, CF.END)
+    last = col_name(T)
+    names = [(f"{part}.{code}", f"='{NAMED_SHEETS[part]}'!$B${r+1}:${last}${r+1}")
+             for part in NAMED_SHEETS for code, r in ref_map.get(part, {}).items()]
+    return Layout(n_hist, n_proj, [s1, s_assump, s2, s4, s5, s6, s7, s8, s9], ref_map, names)
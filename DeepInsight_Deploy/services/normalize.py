@@ -0,0 +1,172 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from services.schema import USED_KEYS, KEY_OWNER
+
+# ==========================================
+# 报表标准化 (向量化)
+# ==========================================
+# 东方财富 by_report 接口每张报表有数百列、每个报告期一行。
+# 这里一次性完成: 报告期行筛选 -> 只保留引擎用得到的列 -> 整块数值转换,
+# 输出紧凑的 期间 x 科目 float64 矩阵 (缺失/非数值记 0.0)。
+# 口径 (freq): "A" 年报 (标签 "2024"); "Q" 单季 (标签 "2024Q3"); "TTM" 滚动四季 (标签 "2024Q3TTM")。
+# 资产负债表为时点数, 各口径直接取期末值; 利润表/现金流量表为年初至今累计值, 季度/TTM 口径做差分。
+
+STATEMENT_ORDER = ("IS", "BS", "CF")
+FLOW_STATEMENTS = ("IS", "CF")
+FREQS = ("A", "Q", "TTM")
+_QUARTER_OF = {"03-31": 1, "06-30": 2, "09-30": 3, "12-31": 4}
+
+
+def normalize_key(key): return str(key).upper().strip()
+
+
+def period_label(year, q, freq="A"):
+    if freq == "A": return str(year)
+    return f"{year}Q{q}" + ("TTM" if freq == "TTM" else "")
+
+
+def parse_label(label):
+    """"2024" -> (2024, 4, "A"); "2024Q3" -> (2024, 3, "Q"); "2024Q3TTM" -> (2024, 3, "TTM")。"""
+    label = str(label)
+    if len(label) == 4: return int(label), 4, "A"
+    return int(label[:4]), int(label[5]), ("TTM" if label.endswith("TTM") else "Q")
+
+
+def _needed_periods(target, freq, flow):
+    # 季度单季值 = 本期累计 - 上期累计; TTM = 本期累计 + 上年年报 - 上年同期累计
+    need = set()
+    for y, q in target:
+        need.add((y, q))
+        if not flow or q == 4 and freq != "Q": continue
+        if freq == "Q" and q > 1: need.add((y, q - 1))
+        if freq == "TTM": need |= {(y - 1, 4), (y - 1, q)}
+    return need
+
+
+def period_rows(df, target_periods, keys=USED_KEYS, freq="A", flow=False):
+    """单张报表 -> (期间标签列表, 科目列表, 数值矩阵), 只含该表实际存在的列。
+    flow=True 表示利润表/现金流量表 (接口给出年初至今累计值), 季度/TTM 口径需要差分。"""
+    if df is None or df.empty: return None
+    names = df.columns.astype(str).str.upper().str.strip()
+    pos = {}
+    for i, n in enumerate(names): pos.setdefault(n, i)
+    if 'REPORT_DATE' not in pos: return None
+    target = [parse_label(t)[:2] for t in target_periods]
+    need = _needed_periods(target, freq, flow)
+    dates = [str(d) for d in df.iloc[:, pos['REPORT_DATE']].to_numpy()]
+    periods = [(int(d[:4]), _QUARTER_OF.get(d[5:10])) if d[:4].isdigit() else (0, None) for d in dates]
+    mask = np.array([p in need for p in periods], dtype=bool)
+    if not mask.any(): return None
+    cols = [k for k in keys if k in pos]
+    sub = df.iloc[mask, [pos[k] for k in cols]]
+    # 只有 object 列需要逐列解析, 数值列整块转换
+    obj = [i for i, dt in enumerate(sub.dtypes) if not np.issubdtype(dt, np.number)]
+    if obj:
+        sub = sub.copy()
+        for i in obj: sub.isetitem(i, pd.to_numeric(sub.iloc[:, i], errors='coerce'))
+    values = np.nan_to_num(sub.to_numpy(dtype=np.float64, na_value=np.nan), nan=0.0)
+    # 同一期出现多行时与旧逻辑一致: 后出现的行覆盖前面的
+    row = {}
+    for i, p in enumerate(p for p, m in zip(periods, mask) if m): row[p] = i
+    if freq == "A" or not flow:
+        got = [p for p in target if p in row]
+        return [period_label(y, q, freq) for y, q in got], cols, values[[row[p] for p in got]]
+    out_labels, out = [], []
+    for y, q in target:
+        if (y, q) not in row: continue
+        v = values[row[(y, q)]]
+        if freq == "Q" and q > 1:
+            if (y, q - 1) not in row: continue
+            v = v - values[row[(y, q - 1)]]
+        elif freq == "TTM" and q < 4:
+            if (y - 1, 4) not in row or (y - 1, q) not in row: continue
+            v = v + values[row[(y - 1, 4)]] - values[row[(y - 1, q)]]
+        out_labels.append(period_label(y, q, freq)); out.append(v)
+    if not out: return None
+    return out_labels, cols, np.vstack(out)
+
+
+def annual_rows(df, target_years, keys=USED_KEYS):
+    return period_rows(df, target_years, keys, "A")
+
+
+def combine_statements(parts, keys=USED_KEYS):
+    """合并三张报表: 每个科目优先取所属报表的值, 所属报表缺列时再依次取其它报表。"""
+    parts = {k: v for k, v in parts.items() if v is not None}
+    if not parts: return None
+    years = sorted(set().union(*[p[0] for p in parts.values()]), key=parse_label)
+    y_idx = {y: i for i, y in enumerate(years)}
+    k_idx = {k: i for i, k in enumerate(keys)}
+    out = np.zeros((len(years), len(keys)), dtype=np.float64)
+    # 先按 CF -> BS -> IS 写入非所属报表的列, 最后写所属报表, 优先级高的后写
+    for owner_pass in (False, True):
+        for sht in reversed(STATEMENT_ORDER):
+            if sht not in parts: continue
+            p_years, p_cols, values = parts[sht]
+            sel = [j for j, k in enumerate(p_cols) if (KEY_OWNER.get(k) == sht) == owner_pass]
+            if not sel: continue
+            rows = np.array([y_idx[y] for y in p_years])
+            cols = np.array([k_idx[p_cols[j]] for j in sel])
+            out[np.ix_(rows, cols)] = values[:, sel]
+    return pd.DataFrame(out, index=years, columns=list(keys))
+
+
+def add_derived(mat):
+    """补充衍生科目 (利息费用回填、EBIT/EBITDA、负债权益合计与配平检查)。"""
+    col = lambda k: mat[k].to_numpy()
+    fin = col("FINANCE_EXPENSE")
+    fe = np.where(col("FE_INTEREST_EXPENSE") == 0, fin, col("FE_INTEREST_EXPENSE"))
+    interest = np.where(col("INTEREST_EXPENSE") == 0, fe, col("INTEREST_EXPENSE"))
+    ebit = col("TOTAL_PROFIT") + fin
+    total_liab = col("TOTAL_LIABILITIES")
+    total_eq = col("TOTAL_LIAB_EQUITY") - total_liab
+    total_eq = np.where(total_eq <= 0, col("TOTAL_EQUITY") + col("MINORITY_EQUITY"), total_eq)
+    tle = total_liab + total_eq
+    derived = {
+        "FE_INTEREST_EXPENSE": fe, "INTEREST_EXPENSE": interest, "EBIT_CALC": ebit, "EBITDA_CALC": ebit,
+        "TOTAL_LIABILITIES_AND_EQUITY_CALC": tle, "BALANCE_CHECK": col("TOTAL_ASSETS") - tle,
+    }
+    rest = mat.drop(columns=[k for k in derived if k in mat.columns])
+    return pd.concat([rest, pd.DataFrame(derived, index=mat.index)], axis=1)
+
+
+def target_periods(freq="A", n=None, today=None):
+    """默认期间窗口: 年报取最近 7 个完整年度; 季度/TTM 取已结束的最近 n 个季度 (默认 12)。"""
+    today = today or datetime.date.today()
+    if freq == "A":
+        n = n or 7
+        return [str(y) for y in range(today.year - n, today.year)]
+    n = n or 12
+    y, q = today.year, (today.month - 1) // 3  # 当前季度尚未结束
+    out = []
+    while len(out) < n:
+        if q == 0: y, q = y - 1, 4
+        out.append(period_label(y, q, freq)); q -= 1
+    return out[::-1]
+
+
+def extra_columns(frames, target_periods, freq="A"):
+    """引擎不用的接口数值列 (期间 x 列), 按接口原值保留 (季度口径也不做单季差分); 同名列取 IS -> BS -> CF 中的第一张。"""
+    seen, out = set(USED_KEYS), []
+    for sht in STATEMENT_ORDER:
+        df = frames.get(sht)
+        if df is None or df.empty: continue
+        names = df.columns.astype(str).str.upper().str.strip()
+        keys = list(dict.fromkeys(n for n, dt in zip(names, df.dtypes) if n not in seen and pd.api.types.is_numeric_dtype(dt)))
+        seen.update(keys)
+        part = period_rows(df, [str(p) for p in target_periods], keys, freq, flow=False)
+        if part: out.append(pd.DataFrame(part[2], index=part[0], columns=part[1]))
+    return pd.concat(out, axis=1) if out else None
+
+
+def normalize_statements(frames, target_years, keys=USED_KEYS, freq="A"):
+    """frames: {"IS": df, "BS": df, "CF": df} -> 期间 x 科目矩阵 (无有效数据时返回 None)。"""
+    if freq not in FREQS: raise ValueError(f"未知口径: {freq}")
+    target_years = [str(y) for y in target_years]
+    parts = {sht: period_rows(frames.get(sht), target_years, keys, freq, sht in FLOW_STATEMENTS) for sht in STATEMENT_ORDER}
+    mat = combine_statements(parts, keys)
+    if mat is None: return None
+    return add_derived(mat)
@@ -0,0 +1,383 @@
+import os
+import ast
+import glob
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import datetime
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from services.schema import FULL_SCHEMA, DRIVERS, USED_KEYS, DERIVED_KEYS
+from services.normalize import normalize_statements, target_periods
+from services.projection import DAYS, period_days
+
+# ==========================================
+# 全市场截面面板 (内存映射列式存储) + 筛选表达式
+# ==========================================
+# <root>/values.npy  float64 [科目 x 代码 x 期间], 每个科目是一块连续的 代码 x 期间 矩阵 (列式),
+#                    查询只读取用到的科目; 以 mmap 打开, 多个进程共享同一份页缓存
+# <root>/meta.json   代码 / 期间 / 科目顺序, 口径, 构建时间
+# 某代码缺少的期间整行记 NaN (区别于 "科目值为 0"); 其余与 normalize_statements 的输出一致。
+# 构建时从报表缓存逐代码标准化 (缓存未命中才回源), 写入 <root>.build-* 目录; root 是指向当前构建的符号链接,
+# 完成后原子地改指向新目录, 读者总是看到完整的一版。
+# 筛选表达式按 Python 语法解析后编译为 [代码 x 期间] 数组上的向量化运算, 例如:
+#   rising(DSO, 3)                          DSO 连续 3 期上升
+#   NETPROFIT > 0 and NETCASH_OPERATE / NETPROFIT > 1
+# python -m services.panel build --file csi800.txt [--freq A]
+# python -m services.panel query --where "rising(DSO, 3)" --rank DSO --top 50
+
+DEFAULT_PANEL_DIR = os.environ.get("DEEPINSIGHT_PANEL_DIR", os.path.join("cache", "panel"))
+WORKERS = int(os.environ.get("DEEPINSIGHT_PANEL_WORKERS", 8))
+DAY_CODES = ("DSO", "DIO", "DPO")
+
+# 科目中文名 (结果表列名用)
+LABELS = {k: name.strip() for sht in ("IS", "BS", "CF") for name, k, _, _ in FULL_SCHEMA[sht] if k}
+# 常用比率: 名称 -> 表达式 (与科目名一样可直接写在表达式里); 周转天数按口径取 360 / 90 天
+ALIASES = dict(
+    [(code, f"{num} / {den}" + (" * DAYS" if code in DAY_CODES else "")) for code, _, num, den, _, growth in DRIVERS
+     if not growth] + [
+        ("REV_GROWTH", "growth(TOTAL_OPERATE_INCOME)"),
+        ("GROSS_MARGIN", "1 - OPERATE_COST / OPERATE_INCOME"),
+        ("NET_MARGIN", "NETPROFIT / TOTAL_OPERATE_INCOME"),
+        ("ROE", "PARENT_NETPROFIT / TOTAL_EQUITY"),
+        ("DEBT_RATIO", "TOTAL_LIABILITIES / TOTAL_ASSETS"),
+        ("CFO_TO_NP", "NETCASH_OPERATE / NETPROFIT"),
+        ("FCF", "NETCASH_OPERATE - CONSTRUCT_LONG_ASSET"),
+    ])
+ALIAS_NAMES = dict([(d[0], d[1]) for d in DRIVERS] + [
+    ("GROSS_MARGIN", "毛利率"), ("NET_MARGIN", "净利率"), ("ROE", "ROE (归母)"), ("DEBT_RATIO", "资产负债率"),
+    ("CFO_TO_NP", "经营现金流 / 净利润"), ("FCF", "自由现金流")])
+
+# 看板 / 命令行的预置筛选
+PRESETS = {
+    "DSO 连续 3 年上升": {"where": "rising(DSO, 3)", "rank": "DSO"},
+    "经营现金流 / 净利润 前 100": {"where": "NETPROFIT > 0", "rank": "CFO_TO_NP", "top": 100},
+    "高增长高毛利": {"where": "REV_GROWTH > 0.2 and GROSS_MARGIN > 0.3", "rank": "REV_GROWTH"},
+    "低负债现金牛": {"where": "DEBT_RATIO < 0.4 and FCF > 0", "rank": "FCF"},
+}
+
+
+class QueryError(ValueError):
+    """表达式无法解析 / 引用了不存在的科目。"""
+
+
+# ---------- 表达式编译 ----------
+
+def _shift(x, n):
+    """沿期间轴后移 n 期 (前 n 期为 NaN)。"""
+    out = np.full(np.shape(x), np.nan)
+    if n < np.shape(x)[-1]: out[..., n:] = x[..., :x.shape[-1] - n]
+    return out
+
+
+def _div(a, b):
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64))
+    return np.divide(a, b, out=np.full(a.shape, np.nan), where=(b != 0) & np.isfinite(b))
+
+
+def _run(x, n, op):
+    # 截至每一期连续 n 期满足 op(本期, 上期); NaN 比较为 False
+    ok, cur = np.ones(np.shape(x), dtype=bool), x
+    for _ in range(int(n)):
+        prev = _shift(cur, 1)
+        ok &= op(cur, prev)
+        cur = prev
+    return ok
+
+
+def _rolling_mean(x, n):
+    # 最近 n 期均值; 窗口内任一期缺失 (NaN) 时结果为 NaN, 不把缺失按 0 计入
+    n = int(n)
+    pad = np.zeros(x.shape[:-1] + (1,))
+    c = np.nancumsum(np.concatenate([pad, x], axis=-1), axis=-1)
+    k = np.cumsum(np.concatenate([pad, ~np.isnan(x)], axis=-1), axis=-1)
+    out = np.where(k[..., n:] - k[..., :-n] == n, (c[..., n:] - c[..., :-n]) / n, np.nan)
+    return np.concatenate([np.full(x.shape[:-1] + (n - 1,), np.nan), out], axis=-1)
+
+
+FUNCS = {
+    "lag": lambda x, n=1: _shift(x, int(n)),
+    "diff": lambda x, n=1: x - _shift(x, int(n)),
+    "growth": lambda x, n=1: _div(x, _shift(x, int(n))) - 1,
+    "rising": lambda x, n=1: _run(x, n, np.greater),
+    "falling": lambda x, n=1: _run(x, n, np.less),
+    "mean": _rolling_mean,
+    "abs": np.abs,
+    "min": np.fmin,
+    "max": np.fmax,
+}
+_BIN = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: _div, ast.Pow: np.power}
+_CMP = {ast.Gt: np.greater, ast.GtE: np.greater_equal, ast.Lt: np.less, ast.LtE: np.less_equal,
+        ast.Eq: np.equal, ast.NotEq: np.not_equal}
+
+
+def _compile(node):
+    # 返回 fn(resolve), resolve(名称) -> 数组
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        v = float(node.value)
+        return lambda resolve: v
+    if isinstance(node, ast.Name):
+        name = node.id
+        return lambda resolve: resolve(name)
+    if isinstance(node, ast.BinOp) and type(node.op) in _BIN:
+        op, a, b = _BIN[type(node.op)], _compile(node.left), _compile(node.right)
+        return lambda resolve: op(a(resolve), b(resolve))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.Not)):
+        op, a = (np.negative if isinstance(node.op, ast.USub) else np.logical_not), _compile(node.operand)
+        return lambda resolve: op(a(resolve))
+    if isinstance(node, ast.BoolOp):
+        op, parts = (np.logical_and if isinstance(node.op, ast.And) else np.logical_or), [_compile(v) for v in node.values]
+
+        def bool_op(resolve):
+            out = parts[0](resolve)
+            for p in parts[1:]: out = op(out, p(resolve))
+            return out
+        return bool_op
+    if isinstance(node, ast.Compare) and all(type(o) in _CMP for o in node.ops):
+        # 链式比较 a < b < c 展开为 (a < b) & (b < c)
+        terms = [_compile(node.left)] + [_compile(c) for c in node.comparators]
+        ops = [_CMP[type(o)] for o in node.ops]
+
+        def compare(resolve):
+            vals = [t(resolve) for t in terms]
+            out = ops[0](vals[0], vals[1])
+            for i in range(1, len(ops)): out = np.logical_and(out, ops[i](vals[i], vals[i + 1]))
+            return out
+        return compare
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        if node.func.id not in FUNCS: raise QueryError(f"未知函数: {node.func.id} (可用: {', '.join(FUNCS)})")
+        fn, args = FUNCS[node.func.id], [_compile(a) for a in node.args]
+        return lambda resolve: fn(*[a(resolve) for a in args])
+    raise QueryError(f"不支持的表达式: {ast.dump(node)[:60]}")
+
+
+@lru_cache(maxsize=256)
+def compile_expr(expr):
+    """表达式字符串 -> fn(resolve); 同一表达式只解析一次。"""
+    try: tree = ast.parse(expr.strip(), mode="eval")
+    except SyntaxError as e: raise QueryError(f"表达式语法错误: {expr} ({e.msg})")
+    return _compile(tree.body)
+
+
+# ---------- 面板 ----------
+
+class Panel(object):
+    def __init__(self, root=None):
+        self.root = root or DEFAULT_PANEL_DIR
+        # 先解析符号链接, meta.json 与 values.npy 取自同一次构建
+        path = os.path.realpath(self.root)
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f: self.meta = json.load(f)
+        self.values = np.load(os.path.join(path, "values.npy"), mmap_mode="r")
+        self.symbols = self.meta["symbols"]
+        self.periods = self.meta["periods"]
+        self.keys = self.meta["keys"]
+        self.freq = self.meta["freq"]
+        self.stamp = None
+        self._key_idx = {k: i for i, k in enumerate(self.keys)}
+        self._sym_idx = {s: i for i, s in enumerate(self.symbols)}
+        # 各代码有数据的期间 (任一科目非 NaN) 与最新一期的位置; 逐科目累计, 不生成整块布尔数组
+        self.present = np.zeros(self.values.shape[1:], dtype=bool)
+        for block in self.values: self.present |= ~np.isnan(block)
+        has = self.present.any(axis=1)
+        self.latest = np.where(has, len(self.periods) - 1 - np.argmax(self.present[:, ::-1], axis=1), -1)
+
+    def __len__(self): return len(self.symbols)
+
+    def item(self, key):
+        """单个科目的 代码 x 期间 矩阵 (只读视图)。"""
+        if key not in self._key_idx: raise QueryError(f"未知科目或指标: {key}")
+        return self.values[self._key_idx[key]]
+
+    def frame(self, symbol):
+        """单个代码的 期间 x 科目 表 (缺失期间已去掉)。"""
+        i = self._sym_idx[symbol]
+        df = pd.DataFrame(self.values[:, i, :].T, index=self.periods, columns=self.keys)
+        return df[self.present[i]]
+
+    def eval(self, expr):
+        """表达式 -> 代码 x 期间 数组; 比率别名在同一次求值中只算一次。"""
+        memo = {}
+
+        def resolve(name):
+            if name not in memo:
+                if name == "DAYS": memo[name] = self._days()
+                elif name in self._key_idx: memo[name] = self.item(name)
+                elif name in ALIASES: memo[name] = compile_expr(ALIASES[name])(resolve)
+                else: raise QueryError(f"未知科目或指标: {name}")
+            return memo[name]
+        with np.errstate(all="ignore"):
+            out = compile_expr(expr)(resolve)
+        return np.broadcast_to(out, self.present.shape)
+
+    def _days(self):
+        # 周转天数的期间天数: TTM 为滚动一年, 与年报同为 DAYS
+        if self.freq == "TTM": return float(DAYS)
+        try: return float(period_days(self.periods))
+        except (ValueError, IndexError) as e: raise QueryError(f"无法确定期间天数: {e}")
+
+    def _at(self, arr, period):
+        # period=None: 各代码自己的最新一期; 否则取指定期间
+        if period is None:
+            idx = np.maximum(self.latest, 0)
+            return arr[np.arange(len(self.symbols)), idx], np.array(self.periods, dtype=object)[idx]
+        j = self.periods.index(str(period))
+        return arr[:, j], np.full(len(self.symbols), str(period), dtype=object)
+
+    def screen(self, where=None, rank=None, top=None, ascending=False, period=None, columns=()):
+        """where 为条件表达式, rank 为排序表达式; 返回满足条件的代码及各表达式在所选期间的取值。"""
+        ok = self.latest >= 0
+        if period is not None: ok = ok & self.present[:, self.periods.index(str(period))]
+        if where:
+            mask = self.eval(where)
+            if mask.dtype != bool: raise QueryError(f"筛选条件须为比较表达式: {where}")
+            ok = ok & self._at(mask, period)[0]
+        out = {}
+        _, labels = self._at(self.present, period)
+        out["期间"] = labels
+        for expr in ([rank] if rank else []) + [c for c in columns if c and c != rank]:
+            out[expr] = self._at(self.eval(expr), period)[0]
+        df = pd.DataFrame(out, index=pd.Index(self.symbols, name="代码"))[ok]
+        if rank:
+            df = df[np.isfinite(df[rank].to_numpy(dtype=np.float64))].sort_values(rank, ascending=ascending)
+        return df.head(top) if top else df
+
+
+_panel = None
+_panel_lock = threading.Lock()
+
+
+def get_panel(root=None):
+    """进程内共享的面板; 重新构建 (meta.json 被替换) 后自动重新打开。无面板时返回 None。"""
+    global _panel
+    root = root or DEFAULT_PANEL_DIR
+    meta = os.path.join(root, "meta.json")
+    if not os.path.exists(meta): return None
+    stamp = os.stat(meta).st_mtime_ns
+    with _panel_lock:
+        if _panel is None or _panel.root != root or _panel.stamp != stamp:
+            _panel = Panel(root)
+            _panel.stamp = stamp
+    return _panel
+
+
+# ---------- 构建 ----------
+
+def _load(code, freq, periods, use_cache, client):
+    from services.fetcher import fetch_statements
+    from services.scheduler import BATCH
+    report = fetch_statements(code, use_cache=use_cache, client=client, priority=BATCH)
+    mat = normalize_statements(report.frames, periods, freq=freq) if report.frames else None
+    return mat, [f"{k}: {report.results[k].error}" for k in report.failed]
+
+
+def build_panel(symbols, root=None, freq="A", n_periods=None, use_cache=True, client=None, workers=None):
+    """逐代码标准化后写入面板; 返回 meta 字典。抓取 (多为缓存读取) 并发进行, 数组写入在当前线程。"""
+    from services.fetcher import to_code
+    root = root or DEFAULT_PANEL_DIR
+    codes = list(dict.fromkeys(to_code(s) for s in symbols))
+    periods = target_periods(freq, n_periods)
+    keys = list(USED_KEYS) + [k for k in DERIVED_KEYS if k not in USED_KEYS]
+    k_idx = {k: i for i, k in enumerate(keys)}
+    # 每次构建写入独立的新目录 <root>.build-<时间>-<随机>, 完成后把 root 符号链接原子地指向它
+    parent = os.path.dirname(os.path.abspath(root))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=f"{os.path.basename(root)}.build-{time.strftime('%Y%m%d%H%M%S')}-", dir=parent)
+    os.chmod(tmp, 0o755)
+    values = np.lib.format.open_memmap(os.path.join(tmp, "values.npy"), mode="w+", dtype=np.float64,
+                                       shape=(len(keys), len(codes), len(periods)))
+    values[:] = np.nan
+    missing, failures, t0 = [], {}, time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers or WORKERS) as pool:
+        futures = [pool.submit(_load, c, freq, periods, use_cache, client) for c in codes]
+        for i, (code, fut) in enumerate(zip(codes, futures)):
+            try: mat, failed = fut.result()
+            except Exception as e: mat, failed = None, [f"{type(e).__name__}: {e}"]
+            if failed: failures[code] = failed
+            if mat is None or mat.empty:
+                missing.append(code)
+            else:
+                cols = [k_idx[k] for k in mat.columns if k in k_idx]
+                rows = [periods.index(p) for p in mat.index]
+                values[np.ix_(cols, [i], rows)] = mat[[k for k in mat.columns if k in k_idx]].to_numpy().T[:, None, :]
+            if (i + 1) % 200 == 0: print(f"⏳ 面板构建 {i + 1}/{len(codes)} ({time.perf_counter() - t0:.1f}s)")
+    values.flush()
+    del values
+    meta = {"symbols": codes, "periods": periods, "keys": keys, "freq": freq, "missing": missing, "failed": failures,
+            "built_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "elapsed": round(time.perf_counter() - t0, 2)}
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f: json.dump(meta, f, ensure_ascii=False)
+    _publish(root, tmp)
+    print(f"✅ 面板已生成: {root} ({len(codes) - len(missing)}/{len(codes)} 个代码, {len(periods)} 期, {meta['elapsed']}s)")
+    return meta
+
+
+def _publish(root, build):
+    """root -> build 的符号链接原子替换 (rename 覆盖旧链接), 读者任何时候打开 root 都能看到完整的面板;
+    之后删除更早的构建目录, 保留上一版 (刚解析到旧链接、正在打开的读者不受影响; 已打开的 mmap 也不受影响)。"""
+    previous = os.path.realpath(root) if os.path.islink(root) else None
+    link = f"{root}.{os.getpid()}.link"
+    if os.path.lexists(link): os.remove(link)
+    os.symlink(os.path.basename(build), link)  # 相对链接: 缓存目录整体搬动后仍有效
+    if os.path.isdir(root) and not os.path.islink(root):
+        # 旧版本构建的真实目录: 只在首次迁移时有一次短暂的空窗
+        old = f"{root}.{os.getpid()}.old"
+        os.replace(root, old)
+        os.replace(link, root)
+        shutil.rmtree(old, ignore_errors=True)
+    else:
+        os.replace(link, root)
+    for d in glob.glob(f"{glob.escape(root)}.build-*"):
+        # 只删已完成的旧构建 (有 meta.json); 并发进行中的构建留给它自己发布
+        if os.path.realpath(d) in (os.path.realpath(build), previous): continue
+        if os.path.exists(os.path.join(d, "meta.json")):
+            shutil.rmtree(d, ignore_errors=True)
+
+
+def main(argv=None):
+    from services.batch import read_symbols
+    p = argparse.ArgumentParser(description="DeepInsight 全市场截面面板")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="从报表缓存构建面板")
+    b.add_argument("symbols", nargs="*")
+    b.add_argument("--file", help="代码列表文件")
+    b.add_argument("--freq", default="A", choices=("A", "Q", "TTM"))
+    b.add_argument("--periods", type=int, default=None, help="期数 (默认年报 7 / 季度 12)")
+    b.add_argument("--root", default=None)
+    q = sub.add_parser("query", help="按表达式筛选")
+    q.add_argument("--where", default=None)
+    q.add_argument("--rank", default=None)
+    q.add_argument("--top", type=int, default=None, help="返回条数 (默认 50)")
+    q.add_argument("--asc", action="store_true", help="升序排列")
+    q.add_argument("--period", default=None, help="期间 (默认各代码最新一期)")
+    q.add_argument("--preset", choices=list(PRESETS), default=None)
+    q.add_argument("--root", default=None)
+    args = p.parse_args(argv)
+    if args.cmd == "build":
+        symbols = read_symbols(args.symbols, args.file)
+        if not symbols: p.error("请提供股票代码或 --file")
+        meta = build_panel(symbols, args.root, args.freq, args.periods)
+        for code, reasons in list(meta["failed"].items())[:20]: print(f"⚠️  {code}: {'; '.join(reasons)}")
+        if len(meta["failed"]) > 20: print(f"⚠️  ... 共 {len(meta['failed'])} 个代码有报表抓取失败, 详见 meta.json")
+        return 0 if len(meta["missing"]) < len(meta["symbols"]) else 1
+    panel = get_panel(args.root)
+    if panel is None: p.error(f"面板不存在, 请先运行 build ({args.root or DEFAULT_PANEL_DIR})")
+    spec = dict(PRESETS.get(args.preset, {}))
+    spec.update({k: v for k, v in (("where", args.where), ("rank", args.rank)) if v})
+    t0 = time.perf_counter()
+    try: df = panel.screen(spec.get("where"), spec.get("rank"), args.top or spec.get("top", 50), args.asc, args.period)
+    except QueryError as e: p.error(str(e))
+    print(df.to_string())
+    print(f"\n{len(df)} 条 / 共 {len(panel)} 个代码, 耗时 {(time.perf_counter() - t0) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
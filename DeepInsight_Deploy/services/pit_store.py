@@ -0,0 +1,289 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import datetime
+import threading
+
+import numpy as np
+
+from services.datapool import DataPool, ITEMS, INDEX
+from services.normalize import target_periods
+
+# ==========================================
+# 时点 (point-in-time) 报表库: 只追加, 按观测日期记录标准化数值的变动
+# ==========================================
+# 东方财富会回溯调整 (重述) 以前报告期的数字, 报表缓存 / data_pool 只保留当前值;
+# 本库以 (代码, 口径, 报告期, 观测日) 为键, 只存与上一次观测相比变化了的科目 (首次观测存非零科目),
+# 用于复现 "某天生成的模型" 以及回测 2.基本假设 中的驱动因子。
+#   observations  唯一索引 (代码, 口径, 报告期, 观测日): as-of 查询是该索引上的一次范围扫描
+#                 items = int16 科目编号数组, vals = float64 数值数组 (小端字节串);
+#                 行较大 (首次观测约 1.5 KB), 用普通 rowid 表而非 WITHOUT ROWID, 后者溢出页使文件大 3 倍
+#                 数据未变的观测不写入任何行, 每天回源也不增加体积
+#   items         科目编号 <-> 科目名; 科目表增删科目后旧编号仍然有效
+# 观测日按天计: 同一天内多次写入合并为一条。as_of(d) 叠加 observed <= d 的全部增量。
+# 写入: fetch_data 回源后自动记录 (DEEPINSIGHT_PIT=1); 已有报表缓存可用 ingest 一次性导入
+#       (观测日取缓存的抓取日期)。
+# python -m services.pit_store ingest | stats | show 600519 --as-of 2024-06-30
+
+DEFAULT_PIT_PATH = os.environ.get("DEEPINSIGHT_PIT_PATH", os.path.join("cache", "pit.sqlite"))
+# 变动判定: 数值为原始单位 (元), 约 1e10 量级; 相对误差 RTOL 吸收浮点噪声, ATOL (半分钱) 处理接近 0 的值
+RTOL = 1e-12
+ATOL = 0.005
+IN_BATCH = 500   # as_of_many 每条查询的代码数 (SQLite 参数个数上限 999)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id  INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS observations (
+    symbol   TEXT NOT NULL,
+    freq     TEXT NOT NULL,
+    period   TEXT NOT NULL,
+    observed INTEGER NOT NULL,
+    items    BLOB NOT NULL,
+    vals     BLOB NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS observations_key ON observations (symbol, freq, period, observed);
+"""
+
+
+def pit_enabled():
+    return os.environ.get("DEEPINSIGHT_PIT", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def day_key(d):
+    """日期 / datetime / 'YYYY-MM-DD' / 时间戳 -> 整数 YYYYMMDD。"""
+    if d is None: d = datetime.date.today()
+    if isinstance(d, (int, float)) and d > 1e8: d = datetime.date.fromtimestamp(d)
+    if isinstance(d, str): d = datetime.date.fromisoformat(d[:10])
+    if isinstance(d, datetime.datetime): d = d.date()
+    if isinstance(d, datetime.date): return d.year * 10000 + d.month * 100 + d.day
+    return int(d)
+
+
+def _date(key):
+    return datetime.date(key // 10000, key // 100 % 100, key % 100)
+
+
+class PitStore(object):
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_PIT_PATH
+        self._lock = threading.Lock()
+        self._conn = None
+        self._ids = None     # 科目名 -> 编号
+        self._to_col = None  # 编号 -> 当前 ITEMS 中的列 (不在当前科目表中的为 -1)
+
+    def _db(self):
+        if self._conn is None:
+            d = os.path.dirname(self.path)
+            if d and not os.path.exists(d): os.makedirs(d, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            conn.commit()
+            self._conn = conn
+            self._load_items()
+        return self._conn
+
+    def _load_items(self):
+        db = self._conn
+        rows = dict(db.execute("SELECT key, id FROM items").fetchall())
+        new = [k for k in ITEMS if k not in rows]
+        if new:
+            start = max(rows.values(), default=-1) + 1
+            db.executemany("INSERT INTO items VALUES (?, ?)", [(start + i, k) for i, k in enumerate(new)])
+            db.commit()
+            rows.update((k, start + i) for i, k in enumerate(new))
+        self._ids = np.array([rows[k] for k in ITEMS], dtype=np.int16)
+        self._to_col = np.full(max(rows.values()) + 1, -1, dtype=np.int64)
+        for k, i in rows.items(): self._to_col[i] = INDEX.get(k, -1)
+
+    # --- 读 ---
+    def _fold(self, rows):
+        """[(代码, 报告期, items, vals)] (按代码 / 报告期 / 观测日排序) -> {代码: {报告期: 数值行}}。"""
+        out = {}
+        for symbol, period, items, vals in rows:
+            state = out.setdefault(symbol, {}).get(period)
+            if state is None: state = out[symbol][period] = np.zeros(len(ITEMS))
+            cols = self._to_col[np.frombuffer(items, dtype="<i2")]
+            v = np.frombuffer(vals, dtype="<f8")
+            keep = cols >= 0
+            state[cols[keep]] = v[keep]
+        return out
+
+    def _pool(self, state, periods):
+        have = [p for p in periods if p in state]
+        if not have: return None, None
+        pool = DataPool(have, np.ascontiguousarray(np.stack([state[p] for p in have])))
+        return pool, pool.keys()
+
+    def as_of(self, symbol, as_of=None, freq="A", n_periods=None):
+        """截至 as_of 当天已观测到的数值 -> (DataPool, 期间列表); 期间窗口按 as_of 当天计 (同 target_periods)。
+        窗口内尚未披露的报告期不出现; 一期都没有时返回 (None, None)。"""
+        day = day_key(as_of)
+        periods = target_periods(freq, n_periods, today=_date(day))
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT symbol, period, items, vals FROM observations "
+                "WHERE symbol=? AND freq=? AND period BETWEEN ? AND ? AND observed<=? ORDER BY period, observed",
+                (symbol, freq, periods[0], periods[-1], day)).fetchall()
+        return self._pool(self._fold(rows).get(symbol, {}), periods)
+
+    def as_of_many(self, symbols, as_of=None, freq="A", n_periods=None):
+        """多个代码同一时点: {代码: (DataPool, 期间列表)}; 无数据的代码不出现在结果中。
+        代码条件放进 SQL (symbol IN (...), 走 (代码, 口径, 报告期, 观测日) 索引), 每批 IN_BATCH 个代码。"""
+        day = day_key(as_of)
+        periods = target_periods(freq, n_periods, today=_date(day))
+        want = list(dict.fromkeys(symbols))
+        state = {}
+        with self._lock:
+            db = self._db()
+            for i in range(0, len(want), IN_BATCH):
+                chunk = want[i:i + IN_BATCH]
+                cur = db.execute(
+                    "SELECT symbol, period, items, vals FROM observations "
+                    f"WHERE symbol IN ({','.join('?' * len(chunk))}) AND freq=? AND period BETWEEN ? AND ? AND observed<=? "
+                    "ORDER BY symbol, period, observed",
+                    (*chunk, freq, periods[0], periods[-1], day))
+                state.update(self._fold(cur))
+        out = {}
+        for s in symbols:
+            if s in state:
+                pool, years = self._pool(state[s], periods)
+                if pool is not None: out[s] = (pool, years)
+        return out
+
+    def latest(self, symbol, freq="A"):
+        """该代码全部报告期的当前值: {报告期: 数值行}。"""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT symbol, period, items, vals FROM observations WHERE symbol=? AND freq=? ORDER BY period, observed",
+                (symbol, freq)).fetchall()
+        return self._fold(rows).get(symbol, {})
+
+    def revisions(self, symbol, key, freq="A"):
+        """某科目的修订记录: [(报告期, 观测日, 数值)], 首次观测在前。"""
+        col = INDEX[key]
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT period, observed, items, vals FROM observations WHERE symbol=? AND freq=? ORDER BY period, observed",
+                (symbol, freq)).fetchall()
+        out = []
+        for period, observed, items, vals in rows:
+            hit = np.flatnonzero(self._to_col[np.frombuffer(items, dtype="<i2")] == col)
+            if len(hit): out.append((period, _date(observed).isoformat(), float(np.frombuffer(vals, dtype="<f8")[hit[0]])))
+        return out
+
+    # --- 写 (只追加) ---
+    def record(self, symbol, data_pool, freq="A", observed=None):
+        """把 data_pool 作为 observed 当天的观测写入, 只存相对已有记录变化的科目; 返回写入的报告期数。"""
+        if not data_pool: return 0
+        day = day_key(observed)
+        with self._lock:
+            db = self._db()
+            # 对比基准是 observed 当天之前的状态 (当天已有的记录会被合并替换)
+            prev = self._fold(db.execute(
+                "SELECT symbol, period, items, vals FROM observations WHERE symbol=? AND freq=? AND observed<? "
+                "ORDER BY period, observed", (symbol, freq, day)))
+            prev = prev.get(symbol, {})
+            rows = []
+            for i, period in enumerate(data_pool.periods):
+                new = np.asarray(data_pool.values[i], dtype=np.float64)
+                old = prev.get(period)
+                if old is None: changed = (new != 0) & ~np.isnan(new)
+                else: changed = ~np.isclose(new, old, rtol=RTOL, atol=ATOL, equal_nan=True)
+                if not changed.any():
+                    # 与此前一致: 当天若已有 (不同的) 记录则删除, 保持 "当天最后一次观测" 语义
+                    db.execute("DELETE FROM observations WHERE symbol=? AND freq=? AND period=? AND observed=?",
+                               (symbol, freq, period, day))
+                    continue
+                idx = np.flatnonzero(changed)
+                rows.append((symbol, freq, period, day, self._ids[idx].astype("<i2").tobytes(), new[idx].astype("<f8").tobytes()))
+            db.executemany("INSERT OR REPLACE INTO observations VALUES (?, ?, ?, ?, ?, ?)", rows)
+            db.commit()
+        return len(rows)
+
+    def symbols(self, freq="A"):
+        with self._lock:
+            return [r[0] for r in self._db().execute("SELECT DISTINCT symbol FROM observations WHERE freq=?", (freq,))]
+
+    def stats(self):
+        with self._lock:
+            db = self._db()
+            n, syms, first, last, nbytes = db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT symbol), MIN(observed), MAX(observed), "
+                "COALESCE(SUM(LENGTH(items) + LENGTH(vals)), 0) FROM observations").fetchone()
+        return {"path": self.path, "observations": n, "symbols": syms, "payload_bytes": nbytes,
+                "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+                "first": _date(first).isoformat() if first else None, "last": _date(last).isoformat() if last else None}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_pit_store(path=None):
+    path = os.path.abspath(path or DEFAULT_PIT_PATH)
+    with _stores_lock:
+        if path not in _stores: _stores[path] = PitStore(path)
+        return _stores[path]
+
+
+def ingest_cache(store, cache=None, freq="A", n_periods=None):
+    """把报表缓存中已有的代码按缓存抓取日期写入; 返回 (代码数, 写入的报告期数)。不回源。"""
+    from services.statement_cache import get_cache
+    from services.model_engine import build_pool
+    cache = cache or get_cache()
+    n_sym = n_rows = 0
+    for symbol in sorted(cache.latest_reports()):
+        entries = {s: cache.get(symbol, s) for s in ("IS", "BS", "CF")}
+        if any(e is None for e in entries.values()): continue
+        data_pool, _ = build_pool({s: e.frame for s, e in entries.items()}, freq, n_periods)
+        n_rows += store.record(symbol, data_pool, freq, observed=max(e.fetched_at for e in entries.values()))
+        n_sym += 1
+    return n_sym, n_rows
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="DeepInsight 时点报表库")
+    p.add_argument("--path", default=None)
+    sub = p.add_subparsers(dest="cmd", required=True)
+    g = sub.add_parser("ingest", help="从报表缓存导入 (观测日取缓存抓取日期)")
+    g.add_argument("--freq", default="A", choices=("A", "Q", "TTM"))
+    g.add_argument("--periods", type=int, default=None)
+    sub.add_parser("stats")
+    s = sub.add_parser("show", help="某代码截至某日的数值")
+    s.add_argument("symbol")
+    s.add_argument("--as-of", default=None, help="YYYY-MM-DD (默认今天)")
+    s.add_argument("--freq", default="A", choices=("A", "Q", "TTM"))
+    s.add_argument("--keys", nargs="*", default=["TOTAL_OPERATE_INCOME", "NETPROFIT", "TOTAL_ASSETS"])
+    args = p.parse_args(argv)
+    store = get_pit_store(args.path)
+    if args.cmd == "ingest":
+        t0 = time.perf_counter()
+        n_sym, n_rows = ingest_cache(store, freq=args.freq, n_periods=args.periods)
+        print(f"📥 已导入 {n_sym} 个代码, 新增 / 更新 {n_rows} 条观测 ({time.perf_counter() - t0:.1f}s)")
+    elif args.cmd == "stats":
+        print(store.stats())
+    else:
+        from services.fetcher import to_code
+        data_pool, years = store.as_of(to_code(args.symbol), args.as_of, args.freq)
+        if data_pool is None:
+            print(f"截至 {args.as_of or '今天'} 无 {args.symbol} 的记录")
+            return 1
+        print(data_pool.to_frame()[args.keys].to_string())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
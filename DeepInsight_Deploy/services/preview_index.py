@@ -0,0 +1,314 @@
+import os
+import sys
+import time
+import argparse
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from services.fetcher import to_code
+from services.statement_cache import get_cache, disclosure_deadline
+from services.telemetry import span, inc
+
+# ==========================================
+# 核心指标预览索引 + 按披露日历排序的预热任务
+# ==========================================
+# 看板的三张指标卡 (最近一个年度的 营业总收入 / 归母净利润 / 经营性现金流) 只需要三个数,
+# 预先为全部代码算好存成一个小文件 (每代码约 60 字节), 启动时整体读入, 查询是一次字典查找 (微秒级),
+# 点击建模后立即可以展示, 不必等抓取和建模完成。
+#   <path> (npz)  symbols / names / periods / versions (报表缓存的数据版本) / values float64 [代码 x 3]
+# 预热 (run_warmup): 按优先级逐个代码抓取 (批量通道, 缓存未过期则不回源) 并标准化, 更新索引中的对应行:
+#   0 刚披露: 披露日历 (东方财富预约披露时间) 中实际披露日在近 RECENT_DAYS 天内、且晚于本地抓取时间的代码,
+#            最近披露的在前, 强制回源 (缓存即使未过期也重新验证)
+#   1 报表缓存中没有的代码
+#   2 报表缓存显示可能已有新报告期的代码 (statement_cache 的披露截止日规则)
+#   3 缓存未变但索引中没有 / 版本落后的代码 (只读缓存)
+#   其余跳过。预热完成后这些代码的首次点击只剩标准化 + 建模 (几十毫秒), 不再等待网络。
+# 定时: DEEPINSIGHT_WARMUP_INTERVAL (秒) 大于 0 时, 看板进程启动后台线程周期性预热 (jobs.get_queue 中启动);
+#       也可由 cron 调用命令行。代码范围取 DEEPINSIGHT_UNIVERSE_FILE, 未设置时为报表缓存中已有的代码。
+# python -m services.preview_index warm [--file csi800.txt | --all] [--no-calendar]
+# python -m services.preview_index get 600519 | stats
+
+DEFAULT_PREVIEW_PATH = os.environ.get("DEEPINSIGHT_PREVIEW_PATH", os.path.join("cache", "preview.npz"))
+WORKERS = int(os.environ.get("DEEPINSIGHT_WARMUP_WORKERS", 8))
+WARMUP_INTERVAL = float(os.environ.get("DEEPINSIGHT_WARMUP_INTERVAL", 0))
+UNIVERSE_FILE = os.environ.get("DEEPINSIGHT_UNIVERSE_FILE")
+RECENT_DAYS = 14
+SAVE_EVERY = 500   # 预热过程中每处理这么多个代码落盘一次, 中途的结果即可被看板读到
+
+METRICS = ("TOTAL_OPERATE_INCOME", "PARENT_NETPROFIT", "NETCASH_OPERATE")
+TIERS = ("刚披露", "未缓存", "可能有新报告期", "仅更新索引")
+
+
+class Preview(object):
+    __slots__ = ("symbol", "name", "period", "values")
+
+    def __init__(self, symbol, name, period, values):
+        self.symbol = symbol
+        self.name = name
+        self.period = period
+        self.values = values
+
+    def get(self, key, default=0.0):
+        return float(self.values[METRICS.index(key)]) if key in METRICS else default
+
+
+class PreviewIndex(object):
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_PREVIEW_PATH
+        self.stamp = None
+        cols = {"symbols": [], "names": [], "periods": [], "versions": []}
+        values = np.zeros((0, len(METRICS)))
+        if os.path.exists(self.path):
+            with np.load(self.path) as z:
+                cols = {k: z[k].tolist() for k in cols}
+                values = z["values"]
+        self.symbols, self.names, self.periods, self.versions = (cols[k] for k in ("symbols", "names", "periods", "versions"))
+        self.values = values
+        self._idx = {s: i for i, s in enumerate(self.symbols)}
+
+    def __len__(self): return len(self.symbols)
+
+    def __contains__(self, symbol): return to_code(symbol) in self._idx
+
+    def get(self, symbol):
+        i = self._idx.get(to_code(symbol))
+        if i is None: return None
+        return Preview(self.symbols[i], self.names[i], self.periods[i], self.values[i])
+
+    def version(self, code):
+        i = self._idx.get(code)
+        return None if i is None else self.versions[i]
+
+    def merge(self, rows):
+        """rows: {代码: (简称, 期间, 数据版本, [三个数值])} -> 合并后的新索引 (不修改自身)。"""
+        out = PreviewIndex.__new__(PreviewIndex)
+        out.path, out.stamp = self.path, None
+        out.symbols, out.names, out.periods, out.versions = list(self.symbols), list(self.names), list(self.periods), list(self.versions)
+        out._idx = dict(self._idx)
+        new = [c for c in rows if c not in out._idx]
+        values = np.vstack([self.values, np.zeros((len(new), len(METRICS)))])
+        for c in new:
+            out._idx[c] = len(out.symbols)
+            out.symbols.append(c); out.names.append(""); out.periods.append(""); out.versions.append("")
+        for c, (name, period, version, vals) in rows.items():
+            i = out._idx[c]
+            out.names[i], out.periods[i], out.versions[i] = name or out.names[i], period, version or ""
+            values[i] = vals
+        out.values = values
+        return out
+
+    def save(self, path=None):
+        path = path or self.path
+        d = os.path.dirname(path)
+        if d: os.makedirs(d, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, symbols=np.array(self.symbols, dtype=str), names=np.array(self.names, dtype=str),
+                     periods=np.array(self.periods, dtype=str), versions=np.array(self.versions, dtype=str),
+                     values=self.values)
+        os.replace(tmp, path)
+        return path
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_preview_index(path=None):
+    """进程内共享的索引; 文件被预热任务替换后自动重新读入。"""
+    global _index
+    path = path or DEFAULT_PREVIEW_PATH
+    try: stamp = os.stat(path).st_mtime_ns
+    except OSError: stamp = None
+    with _index_lock:
+        if _index is None or _index.path != path or _index.stamp != stamp:
+            _index = PreviewIndex(path)
+            _index.stamp = stamp
+    return _index
+
+
+def get_preview(symbol, path=None):
+    """看板用: 代码 -> Preview; 索引中没有时为 None。"""
+    try: return get_preview_index(path).get(symbol)
+    except (OSError, ValueError, KeyError): return None
+
+
+# ---------- 披露日历 ----------
+
+def reporting_periods(today=None):
+    """当前披露窗口内的报告期: 已结束、且披露截止日不早于 RECENT_DAYS 天前 (年报与一季报的窗口重叠)。"""
+    today = today or datetime.date.today()
+    out = []
+    for y in (today.year - 1, today.year):
+        for m, d in ((3, 31), (6, 30), (9, 30), (12, 31)):
+            p = datetime.date(y, m, d)
+            if p < today and disclosure_deadline(p) >= today - datetime.timedelta(days=RECENT_DAYS): out.append(p)
+    return out
+
+
+def disclosure_calendar(client=None, today=None):
+    """{代码: 最近的实际披露日} (akshare stock_yysj_em); 接口不可用或失败时返回空字典, 预热退回缓存规则。"""
+    import pandas as pd
+    from services.fetcher import default_client, call_with_retry
+    from services.scheduler import BATCH
+    try: api = getattr(client or default_client(), "stock_yysj_em", None)
+    except ImportError: api = None
+    if api is None: return {}
+    out = {}
+    for p in reporting_periods(today):
+        try: df, _ = call_with_retry(lambda: api(symbol="沪深A股", date=p.strftime("%Y%m%d")), priority=BATCH)
+        except Exception as e:
+            print(f"⚠️ 披露日历获取失败 ({p}): {e}")
+            continue
+        if df is None or df.empty or "实际披露时间" not in df.columns: continue
+        dates = pd.to_datetime(df["实际披露时间"], errors="coerce")
+        for code, d in zip(df["股票代码"].astype(str), dates):
+            if pd.isna(d): continue
+            code = to_code(code.zfill(6))
+            out[code] = max(out.get(code, d.date()), d.date())
+    return out
+
+
+def plan(symbols, index, calendar, cache=None, today=None):
+    """-> [(代码, 档位)], 按档位、档位内按披露日 (新的在前) 排序; 不需要处理的代码不出现。"""
+    cache = cache or get_cache()
+    today = today or datetime.date.today()
+    fetched = cache.fetched_times()
+    versions = cache.latest_reports()
+    recent = today - datetime.timedelta(days=RECENT_DAYS)
+    out = []
+    for code in dict.fromkeys(to_code(s) for s in symbols):
+        disclosed = calendar.get(code)
+        at = fetched.get(code)
+        if disclosed is not None and disclosed >= recent and (at is None or datetime.date.fromtimestamp(at) <= disclosed):
+            out.append((code, 0, -disclosed.toordinal()))
+        elif at is None: out.append((code, 1, 0))
+        elif cache.due(code): out.append((code, 2, 0))
+        elif index.version(code) != versions.get(code): out.append((code, 3, 0))
+    out.sort(key=lambda x: (x[1], x[2]))
+    return [(c, t) for c, t, _ in out]
+
+
+# ---------- 预热 ----------
+
+def preview_row(code, frames):
+    """原始报表 -> (简称, 最近年度, 数据版本, 三个数值); 无年度数据时为 None。"""
+    from services.model_engine import build_pool
+    data_pool, years = build_pool(frames, "A")
+    if not data_pool: return None
+    latest = data_pool[years[-1]]
+    name = ""
+    for df in frames.values():
+        if df is not None and "SECURITY_NAME_ABBR" in df.columns and len(df):
+            name = str(df["SECURITY_NAME_ABBR"].iloc[0]); break
+    return name, years[-1], get_cache().version(code), [latest.get(k, 0.0) for k in METRICS]
+
+
+def warm_one(code, tier, client=None):
+    from services.fetcher import fetch_statements
+    from services.scheduler import BATCH
+    report = fetch_statements(code, client=client, priority=BATCH, revalidate=(tier == 0))
+    return preview_row(code, report.frames) if report.frames else None
+
+
+def universe(path=None):
+    from services.batch import read_symbols
+    path = path or UNIVERSE_FILE
+    return read_symbols([], path) if path else sorted(get_cache().latest_reports())
+
+
+def run_warmup(symbols=None, client=None, path=None, workers=None, calendar=True, today=None, limit=None):
+    """预热一轮; 返回各档位数量 / 更新 / 失败 / 耗时。"""
+    t0 = time.perf_counter()
+    symbols = universe() if symbols is None else symbols
+    index = get_preview_index(path)
+    cal = disclosure_calendar(client, today) if calendar else {}
+    todo = plan(symbols, index, cal, today=today)[:limit]
+    summary = {"symbols": len(symbols), "calendar": len(cal), "tiers": {TIERS[t]: 0 for t in range(len(TIERS))},
+               "updated": 0, "failed": 0}
+    for _, t in todo: summary["tiers"][TIERS[t]] += 1
+    rows = {}
+    with span("warmup", symbols=len(symbols), todo=len(todo)), ThreadPoolExecutor(max_workers=workers or WORKERS) as pool:
+        # map 按提交顺序返回结果; 调度器的批量通道保证看板的交互请求仍然优先
+        for (code, tier), row in zip(todo, pool.map(lambda x: _safe_warm(x[0], x[1], client), todo)):
+            if row is None: summary["failed"] += 1; continue
+            rows[code] = row
+            summary["updated"] += 1
+            if len(rows) >= SAVE_EVERY:
+                index = index.merge(rows); index.save(); rows = {}
+    if rows: index = index.merge(rows); index.save()
+    inc("warmup_symbols_total", summary["updated"], result="ok")
+    inc("warmup_symbols_total", summary["failed"], result="failed")
+    summary["elapsed"] = round(time.perf_counter() - t0, 2)
+    return summary
+
+
+def _safe_warm(code, tier, client):
+    try: return warm_one(code, tier, client)
+    except Exception as e:
+        print(f"⚠️ 预热失败 {code}: {type(e).__name__}: {e}")
+        return None
+
+
+_warmer = None
+_warmer_lock = threading.Lock()
+
+
+def start_warmup_from_env():
+    """DEEPINSIGHT_WARMUP_INTERVAL > 0 时启动后台预热线程 (每进程一个, 多次调用无副作用)。"""
+    global _warmer
+    if WARMUP_INTERVAL <= 0: return None
+    with _warmer_lock:
+        if _warmer is None:
+            def loop():
+                while True:
+                    try: print(f"🔥 预热完成: {run_warmup()}")
+                    except Exception as e: print(f"⚠️ 预热出错: {type(e).__name__}: {e}")
+                    time.sleep(WARMUP_INTERVAL)
+            _warmer = threading.Thread(target=loop, name="deepinsight-warmup", daemon=True)
+            _warmer.start()
+    return _warmer
+
+
+def main(argv=None):
+    from services.batch import read_symbols
+    p = argparse.ArgumentParser(description="DeepInsight 核心指标预览索引 / 预热")
+    p.add_argument("--path", default=None)
+    sub = p.add_subparsers(dest="cmd", required=True)
+    w = sub.add_parser("warm", help="按披露日历优先级预热一轮")
+    w.add_argument("symbols", nargs="*")
+    w.add_argument("--file", help="代码列表文件 (默认 DEEPINSIGHT_UNIVERSE_FILE 或报表缓存中的代码)")
+    w.add_argument("--all", action="store_true", help="全部 A 股 (akshare stock_info_a_code_name)")
+    w.add_argument("--no-calendar", action="store_true", help="不取披露日历, 只按缓存规则排序")
+    w.add_argument("--workers", type=int, default=None)
+    w.add_argument("--limit", type=int, default=None, help="本轮最多处理的代码数 (按优先级截取)")
+    g = sub.add_parser("get", help="查询预览")
+    g.add_argument("symbols", nargs="+")
+    sub.add_parser("stats")
+    args = p.parse_args(argv)
+    if args.cmd == "warm":
+        symbols = read_symbols(args.symbols, args.file) or None
+        if args.all:
+            from services.fetcher import default_client
+            symbols = default_client().stock_info_a_code_name()["code"].astype(str).tolist()
+        print(f"🔥 预热完成: {run_warmup(symbols, path=args.path, workers=args.workers, calendar=not args.no_calendar, limit=args.limit)}")
+        return 0
+    index = get_preview_index(args.path)
+    if args.cmd == "stats":
+        t0 = time.perf_counter()
+        for s in index.symbols[:1000]: index.get(s)
+        per = (time.perf_counter() - t0) / max(1, min(1000, len(index))) * 1e6
+        print({"path": index.path, "symbols": len(index), "lookup_us": round(per, 2)})
+        return 0
+    for s in args.symbols:
+        pv = index.get(s)
+        if pv is None: print(f"{s}: 索引中没有"); continue
+        print(f"{pv.symbol} {pv.name} ({pv.period}): " + ", ".join(f"{k} {pv.get(k) / 1e8:,.2f} 亿" for k in METRICS))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,398 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from services.normalize import parse_label, period_label
+from services.schema import FULL_SCHEMA, DRIVERS
+from services.datapool import DataPool
+
+# ==========================================
+# 三表预测计算引擎 (NumPy)
+# ==========================================
+# 与工作簿 "2.基本假设" ~ "9.现金流量表预测" 中的公式逐行对应, 在 Python 内直接算出数值:
+#   - 所有行都是 (B, T) 数组: B 为情景数 (默认 1), T = 历史期数 + 预测期数;
+#   - 期间可以是年度 ("2024") 或单季 ("2024Q3"): 周转天数按期间天数换算, 固定年化利率/折旧率按期间折算;
+#   - 单位与工作簿一致 (百万元, 即原始数据 / 1e6);
+#   - Excel 中会报 #DIV/0! 的单元格记为 NaN 并向下游传播;
+#   - 利息 (按期初期末平均债务 / 现金计) 与现金、循环贷款互为因果, 由 solve_financing 逐期迭代到不动点,
+#     收敛后的利息作为数值写入工作簿, 其余单元格仍为公式, 工作簿中没有循环引用;
+#   - H 的各行可以是 (n_hist,) 或 (S, n_hist): 后者为 S 家公司同时计算 (project_batch)。
+# create_model 用这里的结果作为公式的缓存值写入 xlsx, 打开即为已计算状态。
+#
+# 模型口径变更 (与情景网格同批引入, 所有生成的工作簿数值随之变化):
+#   - 折旧率 DEPR_RATE / 债务利率 DEBT_RATE 成为 2.基本假设 中的假设行, 投资 / 筹资页引用该行而非写死的常数;
+#   - 营运资本: 应收 / 存货按 DSO / DIO, 新增应付账款行按 DPO, 营运资本变动含应付, 资产负债表应付科目取自该行;
+#   - 利润表预测由收入、成本、按收入比例的费用、利息、所得税与少数股东损益逐项累加得到 (原先各项平推),
+#     SELL_RATE / MANAGE_RATE / RD_RATE / TAX_RATE_REV / INCOME_TAX_RATE 因此会影响净利润。
+# 情景网格 (services/scenarios.py) 依赖上述改动才能让每个驱动因子都作用于结果。
+
+N_PROJ = 5
+UNIT = 1e6
+SEGMENTS = (("核心业务A", 0.6), ("核心业务B", 0.2), ("其他业务", 0.2))
+SEG_COST_RATIO = 0.75
+# 不从历史推算、直接给定默认值的驱动因子
+FIXED_DRIVERS = (("DEPR_RATE", "综合折旧率 (%期初固定资产)", 0.10), ("DEBT_RATE", "平均债务利率", 0.04),
+                 ("CASH_RATE", "平均现金收益率", 0.015))
+# 资金安排: 不按期间长度折算 (天数本身已按期间成本换算, 比例与期间无关)
+FIN_DRIVERS = (("MIN_CASH_DAYS", "最低现金 (营业成本天数)", 30.0), ("SWEEP_RATE", "超额现金提前还债比例", 0.0))
+DAYS = 360
+DRIVER_CODES = tuple(d[0] for d in DRIVERS)
+ALL_DRIVER_CODES = DRIVER_CODES + tuple(d[0] for d in FIXED_DRIVERS) + tuple(d[0] for d in FIN_DRIVERS)
+# 利息循环的收敛容差 (百万元, 利息支出与利息收入的两次迭代之差) 与迭代上限
+SOLVER_TOL = float(os.environ.get("DEEPINSIGHT_SOLVER_TOL", 1e-9))
+SOLVER_MAX_ITER = int(os.environ.get("DEEPINSIGHT_SOLVER_MAX_ITER", 50))
+
+# 利润表预测页中不单独成行的科目 (由业务拆分页给出)
+IS_SKIP = ("TOTAL_OPERATE_INCOME", "OPERATE_COST", "OPERATE_INCOME", "TOTAL_OPERATE_COST")
+IS_KEYS = tuple(k for _, k, _, _ in FULL_SCHEMA["IS"] if k and k not in IS_SKIP)
+BS_KEYS = tuple(k for _, k, _, _ in FULL_SCHEMA["BS"]
+                if k and k not in ("MONETARYFUNDS", "TOTAL_ASSETS", "BALANCE_CHECK") and not k.startswith("TOTAL_"))
+
+# 利润表预测口径: 费用按收入比例, 利息来自筹资页, 其余损益项不做预测 (记 0)
+IS_RATE_KEYS = {"TAX_BUSINESSSURCHARGE": "TAX_RATE_REV", "SALE_EXPENSE": "SELL_RATE",
+                "MANAGE_EXPENSE": "MANAGE_RATE", "RESEARCH_EXPENSE": "RD_RATE"}
+IS_EXPENSE_KEYS = ("TAX_BUSINESSSURCHARGE", "SALE_EXPENSE", "MANAGE_EXPENSE", "RESEARCH_EXPENSE", "FINANCE_EXPENSE")
+IS_GAIN_KEYS = ("OTHER_INCOME", "INVEST_INCOME", "FAIRVALUE_CHANGE_INCOME", "CREDIT_IMPAIRMENT_LOSS",
+                "ASSET_IMPAIRMENT_LOSS", "ASSET_DISPOSAL_INCOME")
+
+
+def bs_side(key):
+    # 资产负债表预测页的归类口径 (资产 / 权益 / 负债)
+    if "ASSET" in key or "RECE" in key or "INVENTORY" in key or "INVEST" in key: return "A"
+    if "CAPITAL" in key or "PROFIT" in key or "EQUITY" in key or "RESERVE" in key: return "E"
+    return "L"
+
+
+def period_freq(years):
+    freq = parse_label(years[-1])[2]
+    if freq == "TTM": raise ValueError("TTM 口径仅用于历史视图, 建模请使用年度或季度口径")
+    return freq
+
+
+def period_days(years):
+    return DAYS if period_freq(years) == "A" else DAYS // 4
+
+
+def proj_labels(years, n_proj=N_PROJ):
+    y, q, freq = parse_label(years[-1])
+    if freq == "A": return [str(y + i) for i in range(1, n_proj + 1)]
+    out = []
+    for _ in range(n_proj):
+        y, q = (y + 1, 1) if q == 4 else (y, q + 1)
+        out.append(period_label(y, q, freq))
+    return out
+
+
+def hist_matrix(data_pool, years, keys):
+    if isinstance(data_pool, DataPool):
+        M = data_pool.matrix(keys, years) / UNIT
+        return dict(zip(keys, M))
+    return {k: np.array([data_pool[y].get(k, 0) / UNIT for y in years], dtype=np.float64) for k in keys}
+
+
+def _div(num, den):
+    # Excel 的 a/b: 分母为 0 时为 #DIV/0!
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.true_divide(num, den)
+    return np.where(den == 0, np.nan, out)
+
+
+def _iferror_div(num, den):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.true_divide(num, den)
+    return np.where((den == 0) | ~np.isfinite(out), 0.0, out)
+
+
+def historical_drivers(H, n_hist, days=DAYS):
+    """基本假设页的历史列: 增长率 / 比率 / 周转天数 (days 为期间天数)。返回 {code: (n_hist,)}。"""
+    out = {}
+    for code, name, num_key, den_key, default, is_growth in DRIVERS:
+        if is_growth:
+            v = H[num_key]
+            out[code] = np.concatenate([np.zeros(v.shape[:-1] + (1,)), _div(v[..., 1:], v[..., :-1]) - 1], axis=-1) \
+                if n_hist > 1 else np.zeros(v.shape)
+        else:
+            r = _iferror_div(H[num_key], H[den_key])
+            out[code] = r * days if "周转天数" in name else r
+    return out
+
+
+def fixed_default(default, days=DAYS): return default * days / DAYS  # 年化比率折算到期间
+
+
+def default_drivers(hist_drv, n_hist, n_proj=N_PROJ, days=DAYS):
+    """预测期默认值: 最近 3 个历史期的 AVERAGE (含错误值时结果为 NaN); 固定驱动取给定默认值。"""
+    start = max(0, n_hist - 3)
+    out = {code: np.repeat(np.mean(v[..., start:n_hist], axis=-1)[..., None], n_proj, axis=-1) for code, v in hist_drv.items()}
+    for code, _, default in FIXED_DRIVERS: out[code] = np.full(n_proj, fixed_default(default, days))
+    for code, _, default in FIN_DRIVERS: out[code] = np.full(n_proj, default)
+    return out
+
+
+def minority_share(H):
+    # 少数股东损益占净利润比例: 取最近一个历史年; 多家公司时为 (S,)
+    np_last = H["NETPROFIT"][..., -1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(np_last != 0, H["MINORITY_INTEREST"][..., -1] / np.where(np_last != 0, np_last, 1.0), 0.0)
+
+
+def solve_financing(pre_financing, min_cash, sweep, debt_rate, cash_rate, term0, cash0, tol=None, max_iter=None):
+    """利息 <-> 净利润 <-> 现金 <-> 循环贷款 的逐期不动点迭代, B 个情景 / 公司整批计算。
+    pre_financing(j, 利息支出, 利息收入) -> 第 j 个预测期的融资前现金变动 (经营 + 投资 + 股利);
+    其余参数为 (B, P) 的期间数组或 (B,) 的期初余额。每期:
+      融资前现金 = 期初现金 + 融资前现金变动; 超额 = 融资前现金 - 最低现金
+      循环贷款变动 = MAX(-超额, -期初循环贷款)            (不足时提用, 有余时先还)
+      提前还债 = -MIN(MAX(超额 - 期初循环贷款, 0) x sweep, 期初定期债务)
+      利息支出 = 债务利率 x (期初 + 期末债务) / 2; 利息收入 = 现金收益率 x (期初 + 期末现金) / 2
+    以期初余额计的利息为初值, 每轮的变化约为上一轮的 利率/2 倍, 一般 3~6 轮收敛到 tol;
+    max_iter 轮仍不收敛的行按期初余额计息。
+    返回 ({行名: (B, P)}, 每期迭代次数)。"""
+    tol = SOLVER_TOL if tol is None else tol
+    max_iter = max_iter or SOLVER_MAX_ITER
+    B, P = debt_rate.shape
+    term_prev = np.broadcast_to(np.asarray(term0, dtype=np.float64), (B,)).copy()
+    cash_prev = np.broadcast_to(np.asarray(cash0, dtype=np.float64), (B,)).copy()
+    rev_prev = np.zeros(B)
+    out = {k: np.zeros((B, P)) for k in ("TERM", "REVOLVER", "INT", "INT_INC", "CASH_AVAIL", "REV_CHG", "SWEEP")}
+    iters = np.zeros(P, dtype=np.int64)
+
+    def step(j, int_exp, int_inc):
+        avail = cash_prev + pre_financing(j, int_exp, int_inc)
+        surplus = avail - min_cash[:, j]
+        rev_chg = np.maximum(-surplus, -rev_prev)
+        swept = -np.minimum(np.maximum(surplus - rev_prev, 0.0) * sweep[:, j], term_prev)
+        term, rev = term_prev + swept, rev_prev + rev_chg
+        cash = avail + rev_chg + swept
+        new_exp = debt_rate[:, j] * ((term_prev + rev_prev) + (term + rev)) / 2
+        new_inc = cash_rate[:, j] * (cash_prev + cash) / 2
+        return (avail, rev_chg, swept, term, rev, cash), new_exp, new_inc
+
+    for j in range(P):
+        int_exp0, int_inc0 = debt_rate[:, j] * (term_prev + rev_prev), cash_rate[:, j] * cash_prev
+        int_exp, int_inc = int_exp0, int_inc0
+        for it in range(1, max_iter + 1):
+            state, new_exp, new_inc = step(j, int_exp, int_inc)
+            # NaN (上游假设为 #DIV/0!) 不参与判断, 直接随结果传播
+            open_ = (np.abs(new_exp - int_exp) > tol) | (np.abs(new_inc - int_inc) > tol)
+            if it == max_iter or not open_.any(): break
+            int_exp, int_inc = new_exp, new_inc
+        iters[j] = it
+        if open_.any():
+            # 不收敛 (税率 / 分红率等异常使反馈系数 >= 1) 的行退回按期初余额计息, 不让发散的值传到后续年度
+            int_exp, int_inc = np.where(open_, int_exp0, int_exp), np.where(open_, int_inc0, int_inc)
+            state = step(j, int_exp, int_inc)[0]
+        # 记录的是本轮输入的利息及其对应的余额, 工作簿中用这组利息重算各公式可得到完全相同的结果
+        avail, rev_chg, swept, term, rev, cash = state
+        for k, v in zip(("CASH_AVAIL", "REV_CHG", "SWEEP", "TERM", "REVOLVER", "INT", "INT_INC"),
+                        (avail, rev_chg, swept, term, rev, int_exp, int_inc)):
+            out[k][:, j] = v
+        term_prev, rev_prev, cash_prev = term, rev, cash
+    return out, iters
+
+
+class Projection(object):
+    __slots__ = ("years", "hist_years", "proj_years", "rows")
+
+    def __init__(self, hist_years, proj_years, rows):
+        self.hist_years = list(hist_years)
+        self.proj_years = list(proj_years)
+        self.years = self.hist_years + self.proj_years
+        self.rows = rows
+
+    @property
+    def batch(self): return next(iter(self.rows.values())).shape[0]
+
+    def row(self, name, b=0): return self.rows[name][b]
+
+    def value(self, name, i, b=0):
+        v = float(self.rows[name][b, i])
+        return v if np.isfinite(v) else "#DIV/0!"
+
+    def statement(self, sht, b=0, proj_only=False):
+        """单个情景的 IS/BS/CF 预测表 (行 = 科目, 列 = 年份)。"""
+        names = [n for n in self.rows if n.startswith(sht + ".")]
+        df = pd.DataFrame([self.rows[n][b] for n in names], index=[n[len(sht) + 1:] for n in names], columns=self.years)
+        return df[self.proj_years] if proj_only else df
+
+
+def _cat(hist, proj, B):
+    hist = np.broadcast_to(np.asarray(hist, dtype=np.float64), (B, np.shape(hist)[-1]))
+    proj = np.broadcast_to(np.asarray(proj, dtype=np.float64), (B, np.shape(proj)[-1]))
+    return np.concatenate([hist, proj], axis=1)
+
+
+def evaluate(H, n_hist, drivers, n_proj=N_PROJ, balance_sheet=True, days=DAYS, tol=None):
+    """批量计算核心。H: {科目: (n_hist,) 或 (B, n_hist)}; drivers: {代码: (B, n_proj) 或可广播的形状}; days: 期间天数。
+    balance_sheet=False 时跳过资产负债表 (情景分析只需要利润与现金); tol: 利息循环的收敛容差。"""
+    n, P = n_hist, n_proj
+    T = n + P
+    B = max([np.shape(v)[0] for v in drivers.values() if np.ndim(v) == 2] or [1])
+    D = {k: np.broadcast_to(np.asarray(v, dtype=np.float64), (B, P)) for k, v in drivers.items()}
+    hist_drv = historical_drivers(H, n, days)
+    rows = {}
+    zeros_p = np.zeros((B, P))
+
+    # --- 2. 基本假设 ---
+    for code in DRIVER_CODES: rows["ASSUMP." + code] = _cat(hist_drv[code], D[code], B)
+    for code, _, default in FIXED_DRIVERS: rows["ASSUMP." + code] = _cat(np.full(n, fixed_default(default, days)), D[code], B)
+    for code, _, default in FIN_DRIVERS: rows["ASSUMP." + code] = _cat(np.full(n, default), D[code], B)
+    growth = D["REV_GROWTH"]
+
+    # --- 3. 业务拆分 ---
+    rev_total = np.zeros((B, T)); cost_total = np.zeros((B, T))
+    for k, (seg, ratio) in enumerate(SEGMENTS):
+        rev = _cat(H["TOTAL_OPERATE_INCOME"] * ratio, zeros_p, B).copy()
+        for j in range(P): rev[:, n + j] = rev[:, n + j - 1] * (1 + growth[:, j])
+        cost = _cat(H["OPERATE_COST"] * ratio, rev[:, n:] * SEG_COST_RATIO, B)
+        rows[f"REV.SEG{k}"] = rev; rows[f"REV.SEG{k}_COST"] = cost
+        rev_total = rev_total + rev; cost_total = cost_total + cost
+    rows["REV.TOTAL"] = rev_total; rows["REV.COST"] = cost_total
+    rev_p, cost_p = rev_total[:, n:], cost_total[:, n:]
+
+    # --- 4. 投资 (PPE 滚动, 折旧 = 期初 PPE x 折旧率) ---
+    depr_rate = rows["ASSUMP.DEPR_RATE"]
+    capex = _cat(H["CONSTRUCT_LONG_ASSET"], rev_p * D["CAPEX_RATE"], B)
+    beg = np.zeros((B, T)); da = np.zeros((B, T)); end = np.zeros((B, T))
+    for i in range(T):
+        if i > 0: beg[:, i] = end[:, i - 1]
+        da[:, i] = beg[:, i] * depr_rate[:, i]
+        end[:, i] = beg[:, i] + capex[:, i] - da[:, i]
+    rows["INV.BEG"] = beg; rows["INV.CAPEX"] = capex; rows["INV.DA"] = da; rows["INV.PPE"] = end
+
+    # --- 6. 营运资金 (DSO / DIO / DPO) ---
+    ar = _cat(H["ACCOUNTS_RECE"], rev_p / days * D["DSO"], B)
+    inv = _cat(H["INVENTORY"], cost_p / days * D["DIO"], B)
+    ap = _cat(H["ACCOUNTS_PAYABLE"], cost_p / days * D["DPO"], B)
+    chg = np.zeros((B, T))
+    chg[:, 1:] = -((ar[:, 1:] - ar[:, :-1]) + (inv[:, 1:] - inv[:, :-1]) - (ap[:, 1:] - ap[:, :-1]))
+    rows["WC.AR"] = ar; rows["WC.INV"] = inv; rows["WC.AP"] = ap; rows["WC.CHG"] = chg
+
+    # --- 7. 利润表 (利息之外的各项; 利息由下方求解器给出) ---
+    rows["IS.REV"] = rev_total; rows["IS.COST"] = cost_total
+    p = {}
+    for key in IS_KEYS: p[key] = zeros_p
+    for key, code in IS_RATE_KEYS.items(): p[key] = rev_p * D[code]
+
+    def income(j, int_exp, int_inc):
+        # 与 7.利润表预测 的公式同序; j 为预测期下标或切片
+        q = {k: v[:, j] for k, v in p.items()}
+        q["INTEREST_EXPENSE"], q["INTEREST_INCOME"] = int_exp, int_inc
+        q["FINANCE_EXPENSE"] = q["INTEREST_EXPENSE"] - q["INTEREST_INCOME"]
+        q["OPERATE_PROFIT"] = rev_p[:, j] - cost_p[:, j] - sum(q[k] for k in IS_EXPENSE_KEYS) + sum(q[k] for k in IS_GAIN_KEYS)
+        q["TOTAL_PROFIT"] = q["OPERATE_PROFIT"] + q["NONBUSINESS_INCOME"] - q["NONBUSINESS_EXPENSE"]
+        q["INCOME_TAX"] = q["TOTAL_PROFIT"] * D["INCOME_TAX_RATE"][:, j]
+        q["NETPROFIT"] = q["TOTAL_PROFIT"] - q["INCOME_TAX"]
+        return q
+
+    # --- 5. 筹资: 利息 / 现金 / 循环贷款 / 提前还债 逐期求不动点 ---
+    capex_p, da_p, chg_p = capex[:, n:], da[:, n:], chg[:, n:]
+
+    def pre_financing(j, int_exp, int_inc):
+        # 9.现金流量表预测 的 期初现金 之外、债务变动之前的部分: 经营 + CAPEX + 股利
+        ni = income(j, int_exp, int_inc)["NETPROFIT"]
+        return (ni + da_p[:, j] + chg_p[:, j]) + (-capex_p[:, j]) + (-ni * D["DIV_PAYOUT"][:, j])
+    min_cash = cost_p / days * D["MIN_CASH_DAYS"]
+    fin, _ = solve_financing(pre_financing, min_cash, D["SWEEP_RATE"], rows["ASSUMP.DEBT_RATE"][:, n:],
+                             rows["ASSUMP.CASH_RATE"][:, n:], H["SHORT_LOAN"][..., -1], H["MONETARYFUNDS"][..., -1], tol)
+    rows["FIN.TERM"] = _cat(H["SHORT_LOAN"], fin["TERM"], B)
+    rows["FIN.REVOLVER"] = _cat(np.zeros(n), fin["REVOLVER"], B)
+    debt = rows["FIN.DEBT"] = rows["FIN.TERM"] + rows["FIN.REVOLVER"]
+    rows["FIN.INT"] = _cat((debt * rows["ASSUMP.DEBT_RATE"])[:, :n], fin["INT"], B)
+    rows["FIN.INT_INC"] = _cat(H["INTEREST_INCOME"], fin["INT_INC"], B)
+    rows["FIN.MIN_CASH"] = _cat(np.zeros(n), min_cash, B)
+    for k in ("CASH_AVAIL", "REV_CHG", "SWEEP"): rows["FIN." + k] = _cat(np.zeros(n), fin[k], B)
+
+    # --- 7. 利润表 (代入收敛后的利息) ---
+    p.update(income(slice(None), fin["INT"], fin["INT_INC"]))
+    p["MINORITY_INTEREST"] = p["NETPROFIT"] * np.asarray(minority_share(H))[..., None]
+    p["PARENT_NETPROFIT"] = p["NETPROFIT"] - p["MINORITY_INTEREST"]
+    p["EBITDA_CALC"] = p["TOTAL_PROFIT"] + p["FINANCE_EXPENSE"]
+    for key in IS_KEYS: rows["IS." + key] = _cat(H[key], p[key], B)
+    ni = rows["IS.NETPROFIT"]
+
+    # --- 9. 现金流量表 (期末现金回填资产负债表, 先算) ---
+    cf_ni = _cat(H["NETPROFIT"], ni[:, n:], B)
+    cf_da = _cat(H["NETCASH_OPERATE"] - H["NETPROFIT"], da[:, n:], B)
+    cf_wc = _cat(np.zeros(n), chg[:, n:], B)
+    cfo = _cat(H["NETCASH_OPERATE"], cf_ni[:, n:] + cf_da[:, n:] + cf_wc[:, n:], B)
+    cf_capex = _cat(-H["CONSTRUCT_LONG_ASSET"], -capex[:, n:], B)
+    cf_debt = _cat(np.zeros(n), fin["REV_CHG"] + fin["SWEEP"], B)
+    div = _cat(-H["ASSIGN_DIVIDEND_PORFIT"], -ni[:, n:] * D["DIV_PAYOUT"], B)
+    net = _cat(H["CASH_NETINCREASE"], cfo[:, n:] + cf_capex[:, n:] + cf_debt[:, n:] + div[:, n:], B)
+    c_beg = np.zeros((B, T)); c_end = np.zeros((B, T))
+    for i in range(T):
+        # 首个预测期从最近一期资产负债表的货币资金起算 (历史现金流累计与报表货币资金口径不一致)
+        if i == 0: c_beg[:, i] = H["MONETARYFUNDS"][..., 0]
+        elif i == n: c_beg[:, i] = H["MONETARYFUNDS"][..., n - 1]
+        else: c_beg[:, i] = c_end[:, i - 1]
+        c_end[:, i] = c_beg[:, i] + net[:, i]
+    cf_rows = {"CF.NI": cf_ni, "CF.DA": cf_da, "CF.WC": cf_wc, "CF.CFO": cfo, "CF.CAPEX": cf_capex,
+               "CF.DEBT": cf_debt, "CF.DIV": div, "CF.NET": net, "CF.BEG": c_beg, "CF.END": c_end}
+
+    # --- 8. 资产负债表 ---
+    if balance_sheet:
+        rows["BS.MONETARYFUNDS"] = _cat(H["MONETARYFUNDS"], c_end[:, n:], B)
+        linked = {"ACCOUNTS_RECE": ar, "INVENTORY": inv, "ACCOUNTS_PAYABLE": ap, "FIXED_ASSET": end, "SHORT_LOAN": debt}
+        sides = {"A": [rows["BS.MONETARYFUNDS"]], "L": [], "E": []}
+        for key in BS_KEYS:
+            if key == "BS_PLUG": continue
+            if key in linked: v = linked[key]
+            else:
+                v = _cat(H[key], zeros_p, B).copy()
+                for j in range(P):
+                    v[:, n + j] = v[:, n + j - 1]
+                    if key == "UNDISTRIBUTED_PROFIT": v[:, n + j] += ni[:, n + j] * (1 - D["DIV_PAYOUT"][:, j])
+            rows["BS." + key] = v
+            sides[bs_side(key)].append(v)
+        asset_total = np.sum(sides["A"], axis=0)
+        rows["BS.LIAB_TOTAL"] = np.sum(sides["L"], axis=0)
+        rows["BS.EQUITY_TOTAL"] = np.sum(sides["E"], axis=0)
+        # 历史报表中未建模科目的净额 (最近一期的配平项) 在预测期原样结转, 预测期配平项只反映模型本身的勾稽误差
+        gap = asset_total[:, n - 1] - (rows["BS.LIAB_TOTAL"][:, n - 1] + rows["BS.EQUITY_TOTAL"][:, n - 1])
+        rows["BS.CARRY"] = _cat(np.zeros(n), np.repeat(gap[:, None], P, axis=1), B)
+        le = rows["BS.LIAB_TOTAL"] + rows["BS.EQUITY_TOTAL"] + rows["BS.CARRY"]
+        rows["BS.BS_PLUG"] = asset_total - le
+        rows["BS.ASSET_TOTAL"] = asset_total
+        rows["BS.LE_TOTAL"] = le + rows["BS.BS_PLUG"]
+
+    rows.update(cf_rows)
+    return rows
+
+
+HIST_KEYS = tuple(sorted(set(IS_KEYS) | set(BS_KEYS) | {d[2] for d in DRIVERS} | {d[3] for d in DRIVERS} | {
+    "TOTAL_OPERATE_INCOME", "OPERATE_COST", "MONETARYFUNDS", "NETCASH_OPERATE", "CASH_NETINCREASE",
+    "CONSTRUCT_LONG_ASSET", "ASSIGN_DIVIDEND_PORFIT"}))
+
+
+def prepare(data_pool, years, n_proj=N_PROJ):
+    """data_pool -> (历史矩阵 H, 历史期数, 默认驱动)。情景分析可复用, 避免重复整理历史数据。"""
+    H = hist_matrix(data_pool, years, HIST_KEYS)
+    n, days = len(years), period_days(years)
+    return H, n, default_drivers(historical_drivers(H, n, days), n, n_proj, days)
+
+
+def _override(D, drivers, n_proj):
+    for k, v in (drivers or {}).items():
+        v = np.asarray(v, dtype=np.float64)
+        D[k] = v if v.ndim == 2 else np.broadcast_to(v, (n_proj,))
+    return D
+
+
+def project(data_pool, years, drivers=None, n_proj=N_PROJ, tol=None):
+    """单个公司的三表预测。drivers 可覆盖任意驱动因子 (标量 / 每年一值 / (B, n_proj) 批量)。"""
+    H, n, D = prepare(data_pool, years, n_proj)
+    rows = evaluate(H, n, _override(D, drivers, n_proj), n_proj, days=period_days(years), tol=tol)
+    return Projection(years, proj_labels(years, n_proj), rows)
+
+
+def project_batch(data_pools, years, drivers=None, n_proj=N_PROJ, tol=None):
+    """期间相同的多家公司一次算完: 历史矩阵叠成 (S, n_hist) 整批送入 evaluate (利息循环同样整批迭代)。
+    drivers 对所有公司生效 (标量 / 每年一值 / (S, n_proj) 逐公司); 返回与 data_pools 同序的 Projection 列表。"""
+    mats = [hist_matrix(dp, years, HIST_KEYS) for dp in data_pools]
+    H = {k: np.stack([m[k] for m in mats]) for k in HIST_KEYS}
+    n, days = len(years), period_days(years)
+    D = _override(default_drivers(historical_drivers(H, n, days), n, n_proj, days), drivers, n_proj)
+    rows = evaluate(H, n, D, n_proj, days=days, tol=tol)
+    labels = proj_labels(years, n_proj)
+    return [Projection(years, labels, {k: v[s:s + 1] for k, v in rows.items()}) for s in range(len(data_pools))]
@@ -0,0 +1,108 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from services.projection import prepare, evaluate, proj_labels, period_days, N_PROJ, ALL_DRIVER_CODES, FIXED_DRIVERS, FIN_DRIVERS
+from services.schema import DRIVERS
+
+# ==========================================
+# 情景 / 敏感性网格 (批量数组计算)
+# ==========================================
+# 每个驱动因子给一组取值 (预测期各年相同), 取笛卡尔积后展平为 B 个情景,
+# 整批送入 projection.evaluate 一次算完; 无需为每个情景生成工作簿。
+# 情景只需要利润与现金, 跳过资产负债表。单位与工作簿一致: 百万元。
+
+METRICS = {"NETPROFIT": "净利润", "FCF": "自由现金流 (经营现金流 - CAPEX)", "END_CASH": "期末现金"}
+# 分块大小: 控制一次 evaluate 的中间数组体积 (约 B x 年数 x 行数 x 8 字节)
+CHUNK = int(os.environ.get("DEEPINSIGHT_SCENARIO_CHUNK", 4096))
+DRIVER_NAMES = dict([(d[0], d[1]) for d in DRIVERS] + [(d[0], d[1]) for d in FIXED_DRIVERS + FIN_DRIVERS])
+DAY_CODES = ("DSO", "DIO", "DPO")
+
+
+def axis_around(base, span, num=11, floor=None):
+    """以 base 为中心、±span 的等距取值; 下界低于 floor 时整体上移。base 为 NaN (历史均值不可得) 时以 0 为中心。"""
+    base = 0.0 if not np.isfinite(base) else float(base)
+    lo = base - span if floor is None else max(floor, base - span)
+    return np.linspace(lo, lo + 2 * span, num)
+
+
+def default_axis(code, base, num=11):
+    if code == "REV_GROWTH": return axis_around(base, 0.10, num)
+    if code in DAY_CODES: return axis_around(base, 30.0, num, floor=0.0)
+    if code == "DIV_PAYOUT": return axis_around(base, 0.20, num, floor=0.0)
+    return axis_around(base, 0.05, num, floor=0.0)
+
+
+class ScenarioGrid(object):
+    __slots__ = ("axes", "proj_years", "metrics", "base")
+
+    def __init__(self, axes, proj_years, metrics, base):
+        self.axes = axes              # {code: (n_k,)} 按维度顺序
+        self.proj_years = proj_years
+        self.metrics = metrics        # {指标: (B, n_proj)}, B = prod(n_k)
+        self.base = base              # {code: 基准驱动值 (首个预测年)}
+
+    @property
+    def shape(self): return tuple(len(v) for v in self.axes.values())
+
+    @property
+    def size(self): return int(np.prod(self.shape))
+
+    def _year(self, year):
+        return self.proj_years.index(str(year)) if isinstance(year, str) or year >= len(self.proj_years) else year
+
+    def cube(self, metric, year=-1):
+        """某一预测年的指标, 形状为各轴长度 (可直接按驱动取值索引)。"""
+        return self.metrics[metric][:, self._year(year)].reshape(self.shape)
+
+    def table(self, metric=None, year=-1):
+        """长表: 每个情景一行, 列为各驱动取值 + 指标。"""
+        grids = np.meshgrid(*self.axes.values(), indexing="ij")
+        df = pd.DataFrame({code: g.ravel() for code, g in zip(self.axes, grids)})
+        for m in ([metric] if metric else self.metrics):
+            df[m] = self.metrics[m][:, self._year(year)]
+        return df
+
+    def pivot(self, metric, index, columns, year=-1, **at):
+        """二维透视 (行 = index 驱动, 列 = columns 驱动); 其余维度固定在 at 指定值 (默认最接近基准值)。"""
+        cube = self.cube(metric, year)
+        sel = []
+        for code, vals in self.axes.items():
+            if code in (index, columns): sel.append(slice(None))
+            else:
+                target = at.get(code, self.base.get(code, vals[len(vals) // 2]))
+                sel.append(int(np.nanargmin(np.abs(vals - target))))
+        mat = cube[tuple(sel)]
+        if list(self.axes).index(index) > list(self.axes).index(columns): mat = mat.T
+        return pd.DataFrame(mat, index=pd.Index(self.axes[index], name=index), columns=pd.Index(self.axes[columns], name=columns))
+
+
+def run_grid(data_pool, years, axes, drivers=None, n_proj=N_PROJ, chunk=CHUNK):
+    """axes: {驱动代码: 取值序列}; drivers: 其余驱动的覆盖值 (同 project)。返回 ScenarioGrid。"""
+    unknown = [c for c in axes if c not in ALL_DRIVER_CODES]
+    if unknown: raise ValueError(f"未知驱动因子: {unknown}")
+    H, n, D = prepare(data_pool, years, n_proj)
+    for k, v in (drivers or {}).items(): D[k] = np.broadcast_to(np.asarray(v, dtype=np.float64), (n_proj,))
+    base = {code: float(D[code][0]) for code in axes}
+    axes = {code: np.asarray(vals, dtype=np.float64).ravel() for code, vals in axes.items()}
+    flat = [g.ravel() for g in np.meshgrid(*axes.values(), indexing="ij")]
+    B = flat[0].size if flat else 1
+    out = {m: np.empty((B, n_proj)) for m in METRICS}
+    for s in range(0, B, chunk):
+        e = min(B, s + chunk)
+        d = dict(D)
+        for code, f in zip(axes, flat): d[code] = np.broadcast_to(f[s:e, None], (e - s, n_proj))
+        rows = evaluate(H, n, d, n_proj, balance_sheet=False, days=period_days(years))
+        out["NETPROFIT"][s:e] = rows["IS.NETPROFIT"][:, n:]
+        out["FCF"][s:e] = rows["CF.CFO"][:, n:] + rows["CF.CAPEX"][:, n:]
+        out["END_CASH"][s:e] = rows["CF.END"][:, n:]
+    return ScenarioGrid(axes, proj_labels(years, n_proj), out, base)
+
+
+def sensitivity_grid(data_pool, years, codes=("REV_GROWTH", "SELL_RATE"), num=11, drivers=None, n_proj=N_PROJ):
+    """围绕基准驱动值的二维敏感性网格 (工作簿敏感性页 / 看板默认视图)。"""
+    _, n, D = prepare(data_pool, years, n_proj)
+    D.update({k: np.broadcast_to(np.asarray(v, dtype=np.float64), (n_proj,)) for k, v in (drivers or {}).items()})
+    axes = {code: default_axis(code, D[code][0], num) for code in codes}
+    return run_grid(data_pool, years, axes, drivers, n_proj)
@@ -0,0 +1,276 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+
+from services.telemetry import inc
+
+# ==========================================
+# 全局回源调度 (按上游主机令牌桶限速 + 有界并发 + 优先级通道 + 长连接复用)
+# ==========================================
+# 所有接口调用经 Scheduler.submit 进入同一个优先级队列, 由固定数量的工作线程执行 (并发上限);
+# 看板交互请求 (INTERACTIVE) 总是先于批量刷新 (BATCH) 出队, 在令牌桶前排队时同样排在前面。
+# install_transport() 接管 requests 的模块级 request/get/post (akshare 用的就是这些):
+#   每个线程复用一个 keep-alive Session, 不再每次新建 TCP/TLS 连接;
+#   每个 HTTP 请求先向所属主机的令牌桶取令牌 (一次报表调用会分页发多个请求, 按实际请求计);
+#   收到 429/503 时该主机速率减半并按 Retry-After 暂停, 之后每次成功加性恢复到上限 (AIMD),
+#   速率稳定在上游能承受的最大值附近。
+# 证书校验保持开启 (不再全局关闭 ssl 校验); 公司代理可用 DEEPINSIGHT_CA_BUNDLE 指定证书,
+# 确有需要时 DEEPINSIGHT_SSL_VERIFY=0 只对本模块的会话关闭校验。
+# DEEPINSIGHT_RATE_LIMITS="emweb.securities.eastmoney.com=4,datacenter.eastmoney.com=8" (次/秒)
+
+INTERACTIVE, NORMAL, BATCH = 0, 1, 2
+LANES = {INTERACTIVE: "interactive", NORMAL: "normal", BATCH: "batch"}
+
+WORKERS = int(os.environ.get("DEEPINSIGHT_FETCH_CONCURRENCY", 8))
+DEFAULT_RATE = float(os.environ.get("DEEPINSIGHT_RATE_DEFAULT", 5))
+THROTTLE_STATUS = (429, 503)
+THROTTLE_RETRIES = 3         # 单个 HTTP 请求被限流后在传输层重试的次数 (之后交给 call_with_retry)
+MIN_RATE = 0.2               # 限流降速的下限 (次/秒)
+RECOVER_STEP = 0.05          # 每次成功恢复的速率 = 上限 x RECOVER_STEP
+CA_BUNDLE = os.environ.get("DEEPINSIGHT_CA_BUNDLE") or None
+SSL_VERIFY = os.environ.get("DEEPINSIGHT_SSL_VERIFY", "1") != "0"
+
+
+def parse_limits(text):
+    """"host=4,host2=8" -> {host: 4.0, host2: 8.0}。"""
+    out = {}
+    for part in (text or "").split(","):
+        if "=" in part:
+            host, rate = part.split("=", 1)
+            out[host.strip().lower()] = float(rate)
+    return out
+
+
+_local = threading.local()
+_default_priority = NORMAL
+
+
+def current_priority():
+    return getattr(_local, "priority", _default_priority)
+
+
+def set_default_priority(priority):
+    """进程级默认通道 (批量进程设为 BATCH)。"""
+    global _default_priority
+    _default_priority = priority
+
+
+class lane(object):
+    """with lane(INTERACTIVE): 其中发起的抓取走对应优先级通道。"""
+    __slots__ = ("priority", "_prev")
+
+    def __init__(self, priority):
+        self.priority = priority
+
+    def __enter__(self):
+        self._prev = getattr(_local, "priority", None)
+        _local.priority = self.priority
+        return self
+
+    def __exit__(self, *exc):
+        if self._prev is None: del _local.priority
+        else: _local.priority = self._prev
+        return False
+
+
+class TokenBucket(object):
+    """带优先级排队的令牌桶: 只有队首的等待者可以取令牌, 队首按 (优先级, 先后) 排序。
+    默认 burst=1 即匀速放行: 上游多按自然秒计数, 积攒的突发量会让某一秒超额。"""
+
+    def __init__(self, rate, burst=1.0):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+        self.paused_until = 0.0
+        self.throttled = 0
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._seq = itertools.count()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def acquire(self, priority=NORMAL):
+        """取一个令牌, 返回等待秒数。"""
+        me = (priority, next(self._seq))
+        t0 = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiters, me)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiters[0] != me:
+                        self._cond.wait()
+                    elif now < self.paused_until:
+                        self._cond.wait(self.paused_until - now)
+                    elif self.tokens < 1:
+                        self._cond.wait((1 - self.tokens) / self.rate)
+                    else:
+                        self.tokens -= 1
+                        return now - t0
+            finally:
+                self._waiters.remove(me)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def penalize(self, retry_after=None):
+        """被限流: 速率减半, 清空令牌并暂停 retry_after 秒 (缺省为一个令牌间隔)。
+        暂停期间陆续返回的 429 属于同一次限流 (在途请求), 不重复降速。"""
+        with self._cond:
+            self.throttled += 1
+            if time.monotonic() < self.paused_until: return
+            self.rate = max(MIN_RATE, self.rate / 2)
+            self.tokens = 0.0
+            self.paused_until = max(self.paused_until, time.monotonic() + (retry_after or 1.0 / self.rate))
+            self._cond.notify_all()
+
+    def reward(self):
+        if self.rate < self.max_rate:
+            with self._cond: self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVER_STEP)
+
+    def scale(self, factor):
+        with self._cond:
+            self.max_rate *= factor
+            self.rate = min(self.rate * factor, self.max_rate)
+            self.tokens = min(self.tokens, self.burst)
+
+
+def _retry_after(resp):
+    try: return float(resp.headers.get("Retry-After"))
+    except (TypeError, ValueError): return None
+
+
+class Scheduler(object):
+    def __init__(self, workers=None, limits=None, default_rate=None):
+        self.workers = workers or WORKERS
+        self.limits = dict(parse_limits(os.environ.get("DEEPINSIGHT_RATE_LIMITS")) if limits is None else limits)
+        self.default_rate = DEFAULT_RATE if default_rate is None else default_rate
+        self.buckets = {}
+        self._share = 1.0
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._sessions = threading.local()
+        self._original = None
+
+    # ---------- 任务 ----------
+
+    def submit(self, fn, priority=None):
+        """按优先级排队执行 fn, 返回 Future。工作线程按需启动。"""
+        priority = current_priority() if priority is None else priority
+        fut = Future()
+        with self._cond:
+            if len(self._threads) < self.workers:
+                t = threading.Thread(target=self._work, name=f"di-fetch-{len(self._threads)}", daemon=True)
+                self._threads.append(t)
+                t.start()
+            heapq.heappush(self._queue, (priority, next(self._seq), fn, fut))
+            self._cond.notify()
+        inc("scheduler_submitted_total", lane=LANES.get(priority, priority))
+        return fut
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue: self._cond.wait()
+                priority, _, fn, fut = heapq.heappop(self._queue)
+            if not fut.set_running_or_notify_cancel(): continue
+            _local.priority = priority
+            try: fut.set_result(fn())
+            except BaseException as e: fut.set_exception(e)
+            finally: del _local.priority
+
+    def pending(self):
+        with self._cond: return len(self._queue)
+
+    # ---------- 限速 ----------
+
+    def bucket(self, host):
+        host = (host or "").lower()
+        b = self.buckets.get(host)
+        if b is None:
+            with self._cond:
+                b = self.buckets.get(host)
+                if b is None:
+                    b = self.buckets[host] = TokenBucket(self.limits.get(host, self.default_rate))
+                    if self._share != 1.0: b.scale(self._share)
+        return b
+
+    def share(self, n):
+        """n 个进程共同访问上游时, 每个进程只用 1/n 的速率。"""
+        factor = 1.0 / max(1, n)
+        with self._cond:
+            self._share *= factor
+            buckets = list(self.buckets.values())
+        for b in buckets: b.scale(factor)
+
+    # ---------- HTTP 传输 ----------
+
+    def session(self):
+        s = getattr(self._sessions, "session", None)
+        if s is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=0)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            s.verify = CA_BUNDLE or SSL_VERIFY
+            self._sessions.session = s
+        return s
+
+    def request(self, method, url, **kwargs):
+        """requests.request 的替代: 复用本线程的长连接, 按主机限速, 被限流时降速重试。"""
+        host = urlsplit(url).hostname
+        bucket, priority = self.bucket(host), current_priority()
+        for attempt in range(THROTTLE_RETRIES + 1):
+            waited = bucket.acquire(priority)
+            if waited > 0.001: inc("upstream_wait_seconds_total", waited, host=host)
+            resp = self.session().request(method=method, url=url, **kwargs)
+            inc("upstream_requests_total", host=host, status=resp.status_code)
+            if resp.status_code not in THROTTLE_STATUS:
+                bucket.reward()
+                return resp
+            bucket.penalize(_retry_after(resp))
+            inc("upstream_throttled_total", host=host)
+        return resp
+
+    def install_transport(self):
+        """让 requests 的模块级接口 (requests.get 等) 经过本调度器; 重复调用无副作用。"""
+        import requests
+        import requests.api
+        if self._original is not None: return
+        self._original = requests.api.request
+        requests.api.request = requests.request = self.request
+
+    def uninstall_transport(self):
+        import requests
+        import requests.api
+        if self._original is None: return
+        requests.api.request = requests.request = self._original
+        self._original = None
+
+    def stats(self):
+        return {"workers": len(self._threads), "pending": self.pending(),
+                "hosts": {h: {"rate": round(b.rate, 3), "max_rate": b.max_rate, "throttled": b.throttled}
+                          for h, b in self.buckets.items()}}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None: _scheduler = Scheduler()
+    return _scheduler
@@ -0,0 +1,162 @@
+# ==========================================
+# 1. 审计级全量科目库 (不再进行删减)
+# ==========================================
+FULL_SCHEMA = {
+    "IS": [ # 利润表
+        ("一、营业总收入", "TOTAL_OPERATE_INCOME", 0, True),
+        ("    其中：营业收入", "OPERATE_INCOME", 1, False),
+        ("二、营业总成本", "TOTAL_OPERATE_COST", 0, True),
+        ("    其中：营业成本", "OPERATE_COST", 1, False),
+        ("        税金及附加", "TAX_BUSINESSSURCHARGE", 1, False),
+        ("        销售费用", "SALE_EXPENSE", 1, False),
+        ("        管理费用", "MANAGE_EXPENSE", 1, False),
+        ("        研发费用", "RESEARCH_EXPENSE", 1, False),
+        ("        财务费用", "FINANCE_EXPENSE", 1, False),
+        ("            其中：利息费用", "INTEREST_EXPENSE", 2, False),
+        ("            利息收入", "INTEREST_INCOME", 2, False),
+        ("    加：其他收益", "OTHER_INCOME", 1, False),
+        ("        投资收益", "INVEST_INCOME", 1, False),
+        ("        公允价值变动收益", "FAIRVALUE_CHANGE_INCOME", 1, False),
+        ("        信用减值损失", "CREDIT_IMPAIRMENT_LOSS", 1, False),
+        ("        资产减值损失", "ASSET_IMPAIRMENT_LOSS", 1, False),
+        ("        资产处置收益", "ASSET_DISPOSAL_INCOME", 1, False),
+        ("三、营业利润", "OPERATE_PROFIT", 0, True),
+        ("    加：营业外收入", "NONBUSINESS_INCOME", 1, False),
+        ("    减：营业外支出", "NONBUSINESS_EXPENSE", 1, False),
+        ("四、利润总额", "TOTAL_PROFIT", 0, True),
+        ("    减：所得税费用", "INCOME_TAX", 1, False),
+        ("五、净利润", "NETPROFIT", 0, True),
+        ("    归母净利润", "PARENT_NETPROFIT", 1, True),
+        ("    少数股东损益", "MINORITY_INTEREST", 1, False),
+        ("六、EBITDA (参考)", "EBITDA_CALC", 0, True)
+    ],
+    "BS": [ # 资产负债表 (强制全量显示)
+        ("流动资产：", "", 0, True),
+        ("    货币资金", "MONETARYFUNDS", 1, False),
+        ("    交易性金融资产", "TRADE_FINASSET_NOTFVTPL", 1, False),
+        ("    应收票据", "NOTES_RECE", 1, False),
+        ("    应收账款", "ACCOUNTS_RECE", 1, False),
+        ("    应收款项融资", "RECEIVABLE_FINANCING", 1, False),
+        ("    预付款项", "PREPAYMENT", 1, False),
+        ("    其他应收款", "OTHER_RECE", 1, False),
+        ("    存货", "INVENTORY", 1, False),
+        ("    合同资产", "CONTRACT_ASSET", 1, False),
+        ("    一年内到期的非流动资产", "NONCURRENT_ASSET_ONE_YEAR", 1, False),
+        ("    其他流动资产", "OTHER_CURRENT_ASSET", 1, False),
+        ("  流动资产合计", "TOTAL_CURRENT_ASSETS", 0, True),
+        ("非流动资产：", "", 0, True),
+        ("    长期股权投资", "LONG_EQUITY_INVEST", 1, False),
+        ("    其他权益工具投资", "OTHER_EQUITY_INVEST", 1, False),
+        ("    投资性房地产", "INVEST_REALESTATE", 1, False),
+        ("    固定资产", "FIXED_ASSET", 1, False),
+        ("    在建工程", "CONSTRUCTION_IN_PROCESS", 1, False),
+        ("    使用权资产", "RIGHT_USE_ASSETS", 1, False),
+        ("    无形资产", "INTANGIBLE_ASSET", 1, False),
+        ("    商誉", "GOODWILL", 1, False),
+        ("    长期待摊费用", "LONG_PREPAID_EXPENSE", 1, False),
+        ("    递延所得税资产", "DEFERRED_TAX_ASSET", 1, False),
+        ("    其他非流动资产", "OTHER_NONCURRENT_ASSET", 1, False),
+        ("  非流动资产合计", "TOTAL_NONCURRENT_ASSETS", 0, True),
+        ("资产总计", "TOTAL_ASSETS", 0, True),
+        ("流动负债：", "", 0, True),
+        ("    短期借款", "SHORT_LOAN", 1, False),
+        ("    应付票据", "NOTES_PAYABLE", 1, False),
+        ("    应付账款", "ACCOUNTS_PAYABLE", 1, False),
+        ("    预收款项", "PRECEIVE", 1, False),
+        ("    合同负债", "CONTRACT_LIABILITIES", 1, False),
+        ("    应付职工薪酬", "PAYROLL_PAYABLE", 1, False),
+        ("    应交税费", "TAX_PAYABLE", 1, False),
+        ("    其他应付款", "OTHER_PAYABLE", 1, False),
+        ("    一年内到期的非流动负债", "NONCURRENT_LIAB_ONE_YEAR", 1, False),
+        ("    其他流动负债", "OTHER_CURRENT_LIAB", 1, False),
+        ("  流动负债合计", "TOTAL_CURRENT_LIAB", 0, True),
+        ("非流动负债：", "", 0, True),
+        ("    长期借款", "LONG_LOAN", 1, False),
+        ("    应付债券", "BOND_PAYABLE", 1, False),
+        ("    租赁负债", "LEASE_LIAB", 1, False),
+        ("    长期应付款", "LONG_PAYABLE", 1, False),
+        ("    递延收益", "DEFERRED_REVENUE", 1, False),
+        ("    递延所得税负债", "DEFERRED_TAX_LIAB", 1, False),
+        ("    预计负债", "ANTICIPATE_LIAB", 1, False),
+        ("    其他非流动负债", "OTHER_NONCURRENT_LIAB", 1, False),
+        ("  非流动负债合计", "TOTAL_NONCURRENT_LIAB", 0, True),
+        ("负债合计", "TOTAL_LIABILITIES", 0, True),
+        ("股东权益：", "", 0, True),
+        ("    实收资本(或股本)", "SHARE_CAPITAL", 1, False),
+        ("    资本公积", "CAPITAL_RESERVE", 1, False),
+        ("    盈余公积", "SURPLUS_RESERVE", 1, False),
+        ("    未分配利润", "UNDISTRIBUTED_PROFIT", 1, False),
+        ("  归属于母公司股东权益合计", "TOTAL_EQUITY", 0, True),
+        ("    少数股东权益", "MINORITY_EQUITY", 1, False),
+        ("  股东权益合计", "TOTAL_LIAB_EQUITY", 0, True),
+        ("报表配平项 (Plug)", "BS_PLUG", 0, True),
+        ("负债和股东权益总计", "TOTAL_LIABILITIES_AND_EQUITY_CALC", 0, True),
+        ("CHECK (配平检查)", "BALANCE_CHECK", 0, True)
+    ],
+    "CF": [ # 现金流量表
+        ("一、经营活动产生的现金流量：", "", 0, True),
+        ("    销售商品、提供劳务收到的现金", "SALES_SERVICES", 1, False),
+        ("    收到的税费返还", "RECEIVE_TAX_REFUND", 1, False),
+        ("    收到其他与经营活动有关的现金", "RECEIVE_OTHER_OPERATE", 1, False),
+        ("  经营活动现金流入小计", "TOTAL_OPERATE_INFLOW", 0, True),
+        ("    购买商品、接受劳务支付的现金", "BUY_GOODS_SERVICES", 1, False),
+        ("    支付给职工以及为职工支付的现金", "PAY_STAFF_CASH", 1, False),
+        ("    支付的各项税费", "PAY_ALL_TAX", 1, False),
+        ("    支付其他与经营活动有关的现金", "PAY_OTHER_OPERATE", 1, False),
+        ("  经营活动现金流出小计", "TOTAL_OPERATE_OUTFLOW", 0, True),
+        ("  经营活动产生的现金流量净额", "NETCASH_OPERATE", 0, True),
+        ("二、投资活动产生的现金流量：", "", 0, True),
+        ("    收回投资收到的现金", "WITHDRAW_INVEST", 1, False),
+        ("    取得投资收益收到的现金", "INVEST_INCOME_CASH", 1, False),
+        ("    处置固定资产、无形资产和其他长期资产收回的现金净额", "DISPOSAL_LONG_ASSET", 1, False),
+        ("  投资活动现金流入小计", "TOTAL_INVEST_INFLOW", 0, True),
+        ("    购建固定资产、无形资产和其他长期资产支付的现金", "CONSTRUCT_LONG_ASSET", 1, False),
+        ("    投资支付的现金", "INVEST_PAY_CASH", 1, False),
+        ("  投资活动现金流出小计", "TOTAL_INVEST_OUTFLOW", 0, True),
+        ("  投资活动产生的现金流量净额", "NETCASH_INVEST", 0, True),
+        ("三、筹资活动产生的现金流量：", "", 0, True),
+        ("    吸收投资收到的现金", "ABSORB_INVEST_RECEIVED", 1, False),
+        ("    取得借款收到的现金", "BORROW_CASH", 1, False),
+        ("  筹资活动现金流入小计", "TOTAL_FINANCE_INFLOW", 0, True),
+        ("    偿还债务支付的现金", "PAY_DEBT_CASH", 1, False),
+        ("    分配股利、利润或偿付利息支付的现金", "ASSIGN_DIVIDEND_PORFIT", 1, False),
+        ("  筹资活动现金流出小计", "TOTAL_FINANCE_OUTFLOW", 0, True),
+        ("  筹资活动产生的现金流量净额", "NETCASH_FINANCE", 0, True),
+        ("四、现金及现金等价物净增加额", "CASH_NETINCREASE", 0, True),
+        ("五、期末现金及现金等价物余额", "YEAR_END_CASH", 0, True)
+    ]
+}
+
+# 核心驱动假设: (代码, 名称, 分子科目, 分母科目, 默认值, 是否为增长率)
+DRIVERS = [
+    ("REV_GROWTH", "营业收入增长率 (YoY)", "TOTAL_OPERATE_INCOME", "TOTAL_OPERATE_INCOME", 0.10, True),
+    ("TAX_RATE_REV", "税金及附加率 (%收入)", "TAX_BUSINESSSURCHARGE", "TOTAL_OPERATE_INCOME", 0.005, False),
+    ("SELL_RATE", "销售费用率 (%收入)", "SALE_EXPENSE", "TOTAL_OPERATE_INCOME", 0.04, False),
+    ("MANAGE_RATE", "管理费用率 (%收入)", "MANAGE_EXPENSE", "TOTAL_OPERATE_INCOME", 0.03, False),
+    ("RD_RATE", "研发费用率 (%收入)", "RESEARCH_EXPENSE", "TOTAL_OPERATE_INCOME", 0.02, False),
+    ("INCOME_TAX_RATE", "有效所得税率 (%EBT)", "INCOME_TAX", "TOTAL_PROFIT", 0.15, False),
+    ("DSO", "应收账款周转天数 (DSO)", "ACCOUNTS_RECE", "TOTAL_OPERATE_INCOME", 30, False),
+    ("DIO", "存货周转天数 (DIO)", "INVENTORY", "OPERATE_COST", 60, False),
+    ("DPO", "应付账款周转天数 (DPO)", "ACCOUNTS_PAYABLE", "OPERATE_COST", 60, False),
+    ("CAPEX_RATE", "CAPEX占收入比", "CONSTRUCT_LONG_ASSET", "TOTAL_OPERATE_INCOME", 0.05, False),
+    ("DIV_PAYOUT", "股利支付率 (%净利润)", "ASSIGN_DIVIDEND_PORFIT", "NETPROFIT", 0.30, False)
+]
+
+# 标准化后需要保留的科目 (报表科目 + 驱动因子的分子/分母 + 衍生计算的输入)
+def _used_keys():
+    keys = [k for sht in ("IS", "BS", "CF") for _, k, _, _ in FULL_SCHEMA[sht] if k]
+    for _, _, num_key, den_key, _, _ in DRIVERS: keys += [num_key, den_key]
+    keys += ["FE_INTEREST_EXPENSE", "FINANCE_EXPENSE", "TOTAL_LIABILITIES", "TOTAL_LIAB_EQUITY", "TOTAL_EQUITY", "MINORITY_EQUITY"]
+    return tuple(dict.fromkeys(keys))
+
+USED_KEYS = _used_keys()
+
+# 由引擎计算、不来自接口的衍生科目
+DERIVED_KEYS = ("EBIT_CALC", "EBITDA_CALC", "BS_PLUG", "TOTAL_LIABILITIES_AND_EQUITY_CALC", "BALANCE_CHECK")
+
+# 科目所属报表 (同名列在多张报表中出现时, 以所属报表为准)
+KEY_OWNER = {}
+for _sht in ("IS", "BS", "CF"):
+    for _, _k, _, _ in FULL_SCHEMA[_sht]:
+        if _k: KEY_OWNER.setdefault(_k, _sht)
+KEY_OWNER.setdefault("FE_INTEREST_EXPENSE", "IS")
@@ -0,0 +1,326 @@
+import os
+import sys
+import time
+import json
+import zlib
+import sqlite3
+import datetime
+import threading
+
+import pandas as pd
+
+# ==========================================
+# 财报本地持久缓存 (SQLite)
+# ==========================================
+# 以 (证券代码, 报表类型) 为键缓存 akshare 返回的原始报表 DataFrame。
+# 失效规则:
+#   1. 超过 max_age 的条目视为过期 (并在写入时被清理);
+#   2. 只有当 "可能已经出现更新的 REPORT_DATE" 时才需要重新抓取,
+#      即某个报告期已结束、且上次抓取时尚未过它的法定披露截止日;
+#      披露季内此类条目每 season_ttl 最多重新验证一次;
+#   3. 总体积超过 max_bytes 时按最近访问时间 (LRU) 淘汰。
+# 增量: 回源得到的报表与缓存中的历史按 REPORT_DATE 合并 (新数据覆盖同一报告期),
+# 接口只返回近若干年时, 更早的报告期仍保留在本地; latest_report 记录每个代码已见到的最新报告期。
+# 离线模式 (DEEPINSIGHT_OFFLINE=1) 下只读缓存, 可直接使用预置的快照文件。
+# 存储格式: 报表按列序列化为 JSON (列名 / dtype / 数值) 后 zlib 压缩, 以 PAYLOAD_MAGIC 开头;
+# 不使用 pickle, 快照可能来自其它机器, 读取时不会执行任何代码。其它格式的条目 (旧版 pickle) 一律视为未缓存。
+
+DEFAULT_CACHE_PATH = os.environ.get("DEEPINSIGHT_CACHE_PATH", os.path.join("cache", "statements.sqlite"))
+DEFAULT_MAX_AGE = float(os.environ.get("DEEPINSIGHT_CACHE_MAX_AGE", 30 * 86400))
+DEFAULT_MAX_BYTES = int(os.environ.get("DEEPINSIGHT_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+DEFAULT_SEASON_TTL = float(os.environ.get("DEEPINSIGHT_CACHE_SEASON_TTL", 6 * 3600))
+
+PAYLOAD_MAGIC = b"DIJ1"
+
+# 报告期 -> 法定披露截止日 (一季报 4/30, 半年报 8/31, 三季报 10/31, 年报次年 4/30)
+_DEADLINES = {(3, 31): (0, 4, 30), (6, 30): (0, 8, 31), (9, 30): (0, 10, 31), (12, 31): (1, 4, 30)}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS statements (
+    symbol        TEXT NOT NULL,
+    statement     TEXT NOT NULL,
+    fetched_at    REAL NOT NULL,
+    last_access   REAL NOT NULL,
+    latest_report TEXT,
+    nbytes        INTEGER NOT NULL,
+    payload       BLOB NOT NULL,
+    PRIMARY KEY (symbol, statement)
+)
+"""
+
+
+def _json_value(v):
+    # 对象列中的单元格: 缺失值 -> null, 基本类型原样, 其余 (如 Timestamp) 转为字符串
+    if v is None or (isinstance(v, float) and v != v) or v is pd.NaT: return None
+    if isinstance(v, (str, bool, int, float)): return v
+    if hasattr(v, "item"): return v.item()  # numpy 标量
+    return str(v)
+
+
+def encode_frame(df):
+    cols, dtypes, data = [], [], []
+    for name in df.columns:
+        col = df[name]
+        kind = col.dtype.kind
+        if kind == "M": values = [None if pd.isna(v) else v.isoformat() for v in col]
+        elif kind in "fiub": values = col.tolist()
+        else: values = [_json_value(v) for v in col]
+        cols.append(name)
+        dtypes.append(str(col.dtype))
+        data.append(values)
+    index = None if isinstance(df.index, pd.RangeIndex) and df.index.start == 0 and df.index.step == 1 else \
+        [_json_value(v) for v in df.index]
+    doc = {"columns": cols, "dtypes": dtypes, "data": data, "index": index}
+    return PAYLOAD_MAGIC + zlib.compress(json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode(), 1)
+
+
+def decode_frame(payload):
+    """encode_frame 的逆过程; 不是本格式的数据 (如旧版 pickle) 抛出 ValueError, 不做反序列化。"""
+    payload = bytes(payload)
+    if not payload.startswith(PAYLOAD_MAGIC): raise ValueError("不支持的缓存数据格式")
+    doc = json.loads(zlib.decompress(payload[len(PAYLOAD_MAGIC):]))
+    cols = {}
+    for i, (dtype, values) in enumerate(zip(doc["dtypes"], doc["data"])):
+        if dtype.startswith("datetime64"): cols[i] = pd.to_datetime(pd.Series(values, dtype=object)).astype(dtype)
+        elif dtype == "object": cols[i] = pd.Series(values, dtype=object)
+        else:
+            # 数值 / 字符串 / 分类等按原 dtype 还原; 当前 pandas 不认识的 dtype 退回 object
+            try: cols[i] = pd.Series(values, dtype=dtype)
+            except (TypeError, ValueError): cols[i] = pd.Series(values, dtype=object)
+    df = pd.DataFrame(cols, index=pd.RangeIndex(len(next(iter(cols.values()))) if cols else 0))
+    df.columns = doc["columns"]
+    if doc["index"] is not None: df.index = doc["index"]
+    return df
+
+
+def _env_flag(name):
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _to_date(ts):
+    return datetime.datetime.fromtimestamp(ts).date()
+
+
+def _period_ends_after(d, until):
+    """按时间顺序列出 (d, until] 之间的所有季度末。"""
+    y, out = d.year, []
+    while True:
+        for m, day in ((3, 31), (6, 30), (9, 30), (12, 31)):
+            p = datetime.date(y, m, day)
+            if p > until: return out
+            if p > d: out.append(p)
+        y += 1
+
+
+def disclosure_deadline(period):
+    dy, m, day = _DEADLINES[(period.month, period.day)]
+    return datetime.date(period.year + dy, m, day)
+
+
+def latest_report_date(df):
+    dates = report_dates(df)
+    return max(dates) if dates else None
+
+
+def _date_col(df):
+    return 'REPORT_DATE' if 'REPORT_DATE' in df.columns else ('report_date' if 'report_date' in df.columns else None)
+
+
+def report_dates(df):
+    if df is None or df.empty or _date_col(df) is None: return set()
+    return set(df[_date_col(df)].dropna().astype(str).str[:10])
+
+
+def merge_history(old, new):
+    """新抓取的报表 + 缓存中新报表没有的报告期 (按报告期倒序, 与接口一致)。"""
+    if old is None or old.empty or _date_col(old) is None or _date_col(new) is None: return new
+    col = _date_col(new)
+    keep = old[~old[_date_col(old)].astype(str).str[:10].isin(report_dates(new))]
+    if keep.empty: return new
+    merged = pd.concat([new, keep], ignore_index=True, sort=False)
+    order = merged[col].astype(str).str[:10].sort_values(ascending=False, kind="stable").index
+    return merged.loc[order].reset_index(drop=True)
+
+
+def newer_report_possible(latest_report, fetched_at, now=None):
+    """上次抓取之后, 是否可能已有更新的报告期被披露。"""
+    today = _to_date(now if now is not None else time.time())
+    fetched = _to_date(fetched_at)
+    try:
+        last = datetime.date.fromisoformat(latest_report) if latest_report else datetime.date(1990, 1, 1)
+    except ValueError:
+        return True
+    for period in _period_ends_after(last, today):
+        # 抓取时已过截止日仍未披露的报告期 (停牌、延期等) 不会阻止缓存命中
+        if fetched <= disclosure_deadline(period): return True
+    return False
+
+
+class CacheEntry(object):
+    __slots__ = ("frame", "fresh", "fetched_at", "latest_report")
+
+    def __init__(self, frame, fresh, fetched_at, latest_report):
+        self.frame = frame
+        self.fresh = fresh
+        self.fetched_at = fetched_at
+        self.latest_report = latest_report
+
+
+class StatementCache(object):
+    def __init__(self, path=None, max_age=None, max_bytes=None, season_ttl=None, offline=None):
+        self.path = path or DEFAULT_CACHE_PATH
+        self.max_age = DEFAULT_MAX_AGE if max_age is None else max_age
+        self.max_bytes = DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+        self.season_ttl = DEFAULT_SEASON_TTL if season_ttl is None else season_ttl
+        self.offline = _env_flag("DEEPINSIGHT_OFFLINE") if offline is None else offline
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _db(self):
+        if self._conn is None:
+            d = os.path.dirname(self.path)
+            if d and not os.path.exists(d): os.makedirs(d, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def is_fresh(self, fetched_at, latest_report, now=None):
+        now = time.time() if now is None else now
+        age = now - fetched_at
+        if age > self.max_age: return False
+        if age < self.season_ttl: return True
+        return not newer_report_possible(latest_report, fetched_at, now)
+
+    def get(self, symbol, statement, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            db = self._db()
+            row = db.execute(
+                "SELECT fetched_at, latest_report, payload FROM statements WHERE symbol=? AND statement=?",
+                (symbol, statement)).fetchone()
+            if row is None: return None
+            db.execute("UPDATE statements SET last_access=? WHERE symbol=? AND statement=?", (now, symbol, statement))
+            db.commit()
+        fetched_at, latest_report, payload = row
+        try: frame = decode_frame(payload)
+        except ValueError: return None  # 旧版或外来格式的条目按未缓存处理, 回源后覆盖
+        return CacheEntry(frame, self.is_fresh(fetched_at, latest_report, now), fetched_at, latest_report)
+
+    def put(self, symbol, statement, df, now=None):
+        now = time.time() if now is None else now
+        payload = encode_frame(df)
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO statements VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (symbol, statement, now, now, latest_report_date(df), len(payload), sqlite3.Binary(payload)))
+            db.commit()
+            self._evict(db, now)
+
+    def due(self, symbol, statements=("IS", "BS", "CF"), now=None):
+        """是否需要回源: 任一报表不在缓存中, 或可能已有新的报告期 (不读取报表内容)。"""
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._db().execute(
+                f"SELECT fetched_at, latest_report FROM statements WHERE symbol=? AND statement IN ({','.join('?' * len(statements))})",
+                (symbol, *statements)).fetchall()
+        return len(rows) < len(statements) or not all(self.is_fresh(f, r, now) for f, r in rows)
+
+    def version(self, symbol, statements=("IS", "BS", "CF")):
+        """缓存中该代码的数据版本 (三张报表最新报告期中最早的一个); 未缓存或不完整时为 None。"""
+        with self._lock:
+            rows = self._db().execute(
+                f"SELECT latest_report FROM statements WHERE symbol=? AND statement IN ({','.join('?' * len(statements))})",
+                (symbol, *statements)).fetchall()
+        return min(r[0] or "" for r in rows) if len(rows) == len(statements) else None
+
+    def latest_reports(self):
+        """{代码: 最新报告期}; 三张报表不一致时取最早的那张。"""
+        with self._lock:
+            rows = self._db().execute("SELECT symbol, MIN(latest_report) FROM statements GROUP BY symbol").fetchall()
+        return dict(rows)
+
+    def fetched_times(self):
+        """{代码: 抓取时间}; 三张报表不一致时取最早的那张 (预热按披露日历判断是否需要回源)。"""
+        with self._lock:
+            rows = self._db().execute("SELECT symbol, MIN(fetched_at) FROM statements GROUP BY symbol").fetchall()
+        return dict(rows)
+
+    def _evict(self, db, now):
+        db.execute("DELETE FROM statements WHERE fetched_at < ?", (now - self.max_age,))
+        total = db.execute("SELECT COALESCE(SUM(nbytes), 0) FROM statements").fetchone()[0]
+        if total > self.max_bytes:
+            rows = db.execute("SELECT symbol, statement, nbytes FROM statements ORDER BY last_access ASC").fetchall()
+            for symbol, statement, nbytes in rows:
+                if total <= self.max_bytes: break
+                db.execute("DELETE FROM statements WHERE symbol=? AND statement=?", (symbol, statement))
+                total -= nbytes
+        db.commit()
+
+    def stats(self):
+        with self._lock:
+            n, size = self._db().execute("SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM statements").fetchone()
+        return {"path": self.path, "entries": n, "bytes": size}
+
+    def clear(self):
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM statements")
+            db.commit()
+
+    # --- 快照: 导出后拷贝到无网络的机器, 用 import_snapshot 或 DEEPINSIGHT_CACHE_PATH 直接挂载 ---
+    def export_snapshot(self, dest):
+        with self._lock:
+            target = sqlite3.connect(dest)
+            self._db().backup(target)
+            target.close()
+
+    def import_snapshot(self, src):
+        with self._lock:
+            db = self._db()
+            db.execute("ATTACH DATABASE ? AS snap", (src,))
+            # 只覆盖比本地更新的条目; 只接受本格式的数据 (外来的 pickle 等一律丢弃)
+            try:
+                cur = db.execute("""
+                    INSERT OR REPLACE INTO statements
+                        (symbol, statement, fetched_at, last_access, latest_report, nbytes, payload)
+                    SELECT s.symbol, s.statement, s.fetched_at, s.last_access, s.latest_report, s.nbytes, s.payload
+                    FROM snap.statements s
+                    LEFT JOIN statements l ON l.symbol = s.symbol AND l.statement = s.statement
+                    WHERE (l.symbol IS NULL OR s.fetched_at > l.fetched_at)
+                      AND typeof(s.payload) = 'blob' AND substr(s.payload, 1, ?) = ?
+                """, (len(PAYLOAD_MAGIC), sqlite3.Binary(PAYLOAD_MAGIC)))
+                db.commit()
+                return cur.rowcount
+            finally:
+                db.execute("DETACH DATABASE snap")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_default_cache = None
+
+
+def get_cache():
+    global _default_cache
+    if _default_cache is None: _default_cache = StatementCache()
+    return _default_cache
+
+
+if __name__ == "__main__":
+    # python -m services.statement_cache [stats|clear|export <file>|import <file>]
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = get_cache()
+    if cmd == "stats": print(cache.stats())
+    elif cmd == "clear": cache.clear(); print("🧹 缓存已清空")
+    elif cmd == "export": cache.export_snapshot(sys.argv[2]); print(f"📦 快照已导出: {sys.argv[2]}")
+    elif cmd == "import": print(f"📥 快照已导入: {sys.argv[2]} ({cache.import_snapshot(sys.argv[2])} 条)")
+    else: print(f"未知命令: {cmd}")
@@ -0,0 +1,225 @@
+import os
+import sys
+import json
+import time
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==========================================
+# 分阶段计时 (span) + 指标导出
+# ==========================================
+# with span("fetch.statement", symbol=code, statement="IS") as sp: ...; sp.set(rows=len(df))
+# 每个 span 结束时依次交给已注册的钩子 (add_hook); 内置钩子把耗时计入直方图 (按 span 名 + 少量低基数标签),
+# 代码 / 大小等高基数属性只传给钩子, 不进指标标签。
+# DEEPINSIGHT_METRICS_PORT 设置时在本进程内提供 Prometheus 文本格式的 /metrics (以及 /metrics.json 摘要);
+# DEEPINSIGHT_TRACE_LOG 设置时每个 span 追加一行 JSON 到该文件。
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 作为指标标签的属性 (取值有限); 其余属性只给钩子
+LABEL_ATTRS = ("statement", "sheet", "source", "freq", "mode")
+PREFIX = "deepinsight"
+
+
+class Span(object):
+    __slots__ = ("name", "attrs", "parent", "start", "duration", "error", "_t0")
+
+    def __init__(self, name, attrs, parent):
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.start = time.time()
+        self.duration = None
+        self.error = None
+        self._t0 = time.perf_counter()
+
+    def set(self, **attrs): self.attrs.update(attrs)
+
+    def to_dict(self):
+        return {"name": self.name, "parent": self.parent.name if self.parent else None, "start": self.start,
+                "duration": self.duration, "error": self.error, **self.attrs}
+
+
+_local = threading.local()
+_hooks = []
+
+
+class span(object):
+    """计时上下文; 异常照常抛出, 同时记为该 span 的错误。"""
+    __slots__ = ("_span",)
+
+    def __init__(self, name, **attrs):
+        self._span = Span(name, attrs, getattr(_local, "current", None))
+
+    def __enter__(self):
+        _local.current = self._span
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        sp = self._span
+        sp.duration = time.perf_counter() - sp._t0
+        if exc_type is not None: sp.error = exc_type.__name__
+        _local.current = sp.parent
+        for hook in _hooks:
+            try: hook(sp)
+            except Exception as e: print(f"⚠️ telemetry 钩子出错: {e}", file=sys.stderr)
+        return False
+
+
+def add_hook(fn):
+    if fn not in _hooks: _hooks.append(fn)
+    return fn
+
+
+def remove_hook(fn):
+    if fn in _hooks: _hooks.remove(fn)
+
+
+class Histogram(object):
+    __slots__ = ("counts", "total", "n")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, v):
+        self.counts[bisect.bisect_left(BUCKETS, v)] += 1
+        self.total += v
+        self.n += 1
+
+    def quantile(self, q):
+        """按桶线性插值的近似分位数 (同 Prometheus histogram_quantile)。"""
+        if not self.n: return None
+        rank, seen = q * self.n, 0
+        for i, c in enumerate(self.counts):
+            if seen + c >= rank and c:
+                lo = BUCKETS[i - 1] if i > 0 else 0.0
+                hi = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+                return lo + (hi - lo) * (rank - seen) / c
+            seen += c
+        return BUCKETS[-1]
+
+
+class Registry(object):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}   # (span 名, 标签元组) -> Histogram
+        self.counters = {}     # (指标名, 标签元组) -> 数值
+
+    def observe_span(self, sp):
+        labels = tuple((k, str(sp.attrs[k])) for k in LABEL_ATTRS if k in sp.attrs)
+        with self._lock:
+            h = self.histograms.get((sp.name, labels))
+            if h is None: h = self.histograms[(sp.name, labels)] = Histogram()
+            h.observe(sp.duration)
+            if sp.error: self._inc("span_errors_total", (("span", sp.name), ("error", sp.error)), 1)
+
+    def _inc(self, name, labels, value):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def inc(self, name, value=1, **labels):
+        with self._lock: self._inc(name, tuple(sorted((k, str(v)) for k, v in labels.items())), value)
+
+    def snapshot(self):
+        """{span: {count, sum, p50, p99}} + 计数器 + 缓存命中率 (看板 / 调试用)。"""
+        with self._lock:
+            spans = {}
+            for (name, labels), h in self.histograms.items():
+                key = name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+                spans[key] = {"count": h.n, "sum": round(h.total, 6), "p50": h.quantile(0.5), "p99": h.quantile(0.99)}
+            counters = {name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else ""): v
+                        for (name, labels), v in self.counters.items()}
+            cache = {dict(labels).get("result"): v for (name, labels), v in self.counters.items() if name == "cache_requests_total"}
+        total = sum(cache.values())
+        return {"spans": spans, "counters": counters, "cache_hit_rate": (cache.get("hit", 0) / total) if total else None}
+
+    def render(self):
+        """Prometheus 文本格式。"""
+        lines = [f"# TYPE {PREFIX}_span_seconds histogram"]
+        with self._lock:
+            for (name, labels), h in sorted(self.histograms.items()):
+                base = ",".join([f'span="{name}"'] + [f'{k}="{v}"' for k, v in labels])
+                cum = 0
+                for b, c in zip(BUCKETS + ("+Inf",), h.counts):
+                    cum += c
+                    lines.append(f'{PREFIX}_span_seconds_bucket{{{base},le="{b}"}} {cum}')
+                lines.append(f"{PREFIX}_span_seconds_sum{{{base}}} {h.total:.6f}")
+                lines.append(f"{PREFIX}_span_seconds_count{{{base}}} {h.n}")
+            for name in sorted({n for n, _ in self.counters}):
+                lines.append(f"# TYPE {PREFIX}_{name} counter")
+                for (n, labels), v in sorted(self.counters.items()):
+                    if n != name: continue
+                    lab = ",".join(f'{k}="{val}"' for k, val in labels)
+                    lines.append(f"{PREFIX}_{name}{{{lab}}} {v}" if lab else f"{PREFIX}_{name} {v}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+registry = Registry()
+add_hook(registry.observe_span)
+
+
+def inc(name, value=1, **labels): registry.inc(name, value, **labels)
+
+
+def jsonl_hook(path):
+    """每个 span 追加一行 JSON (多线程共用一个文件句柄, 按行加锁)。"""
+    lock, fh = threading.Lock(), open(path, "a", encoding="utf-8")
+
+    def hook(sp):
+        line = json.dumps(sp.to_dict(), ensure_ascii=False, default=str)
+        with lock:
+            fh.write(line + "\n")
+            fh.flush()
+    return hook
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, ctype = json.dumps(registry.snapshot(), ensure_ascii=False).encode(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, ctype = registry.render().encode(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args): pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_server(port, host="127.0.0.1"):
+    """在后台线程中提供 /metrics; 同一进程只启动一次, 返回服务器对象。"""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, int(port)), _Handler)
+            threading.Thread(target=_server.serve_forever, name="deepinsight-metrics", daemon=True).start()
+    return _server
+
+
+def start_from_env():
+    """按环境变量开启 JSON 行日志 / 指标端点 (多次调用无副作用)。"""
+    path = os.environ.get("DEEPINSIGHT_TRACE_LOG")
+    if path and not any(getattr(h, "trace_path", None) == path for h in _hooks):
+        hook = jsonl_hook(path)
+        hook.trace_path = path
+        add_hook(hook)
+    port = os.environ.get("DEEPINSIGHT_METRICS_PORT")
+    if port:
+        try: start_server(port, os.environ.get("DEEPINSIGHT_METRICS_HOST", "127.0.0.1"))
+        except OSError as e: print(f"⚠️ 指标端点启动失败 (端口 {port}): {e}")
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# 测试从仓库任意目录运行时都能导入 services / benchmarks
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """每个测试独立的报表缓存 (替换模块级单例)。"""
+    from services import statement_cache
+    c = statement_cache.StatementCache(str(tmp_path / "statements.sqlite"), offline=False)
+    monkeypatch.setattr(statement_cache, "_default_cache", c)
+    yield c
+    c.close()
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    """重试之间不等待。"""
+    from services import fetcher
+    monkeypatch.setattr(fetcher, "backoff_delay", lambda attempt: 0.0)
@@ -0,0 +1,101 @@
+import time
+import threading
+
+from benchmarks.stand_in import StandInClient, synthetic_statement
+from services.fetcher import fetch_statement, fetch_statements
+
+CODE = "SH600519"
+
+
+class FlakyClient(StandInClient):
+    """每张报表前 n_fail 次调用失败, 之后正常返回。"""
+
+    def __init__(self, n_fail, **kw):
+        StandInClient.__init__(self, **kw)
+        self.n_fail = n_fail
+        self.attempts = {}
+        self._count_lock = threading.Lock()
+
+    def _serve(self, statement, symbol):
+        with self._count_lock:
+            n = self.attempts[statement] = self.attempts.get(statement, 0) + 1
+        if n <= self.n_fail: raise ConnectionError(f"flaky: {statement} 第 {n} 次")
+        return StandInClient._serve(self, statement, symbol)
+
+
+def test_timeout_per_call(no_backoff):
+    client = StandInClient(latency=1.0)
+    t0 = time.perf_counter()
+    res = fetch_statement(CODE, "IS", use_cache=False, client=client, timeout=0.1, retries=1)
+    elapsed = time.perf_counter() - t0
+    assert not res.ok
+    assert isinstance(res.error, TimeoutError)
+    assert res.attempts == 2
+    # 两次尝试各自在 0.1s 超时返回, 不等替身的 1s 延迟
+    assert elapsed < 0.8
+
+
+def test_retry_then_success(no_backoff):
+    client = FlakyClient(n_fail=2)
+    res = fetch_statement(CODE, "BS", use_cache=False, client=client, timeout=5, retries=2)
+    assert res.ok
+    assert res.source == "network"
+    assert res.attempts == 3
+    assert client.attempts["BS"] == 3
+
+
+def test_retries_exhausted(no_backoff):
+    client = FlakyClient(n_fail=5)
+    res = fetch_statement(CODE, "BS", use_cache=False, client=client, timeout=5, retries=2)
+    assert not res.ok
+    assert isinstance(res.error, ConnectionError)
+    assert client.attempts["BS"] == 3
+
+
+def test_partial_failure(no_backoff):
+    report = fetch_statements(CODE, use_cache=False, client=StandInClient(fail={"CF"}), timeout=5, retries=1)
+    assert report.failed == ["CF"]
+    assert not report.ok
+    assert set(report.frames) == {"IS", "BS"}
+    assert report.results["CF"].attempts == 2
+    assert report.summary()["CF"]["ok"] is False
+
+
+def test_network_failure_falls_back_to_cache(cache, no_backoff):
+    cached = synthetic_statement(CODE, "IS")
+    cache.put(CODE, "IS", cached)
+    # revalidate: 缓存未过期也回源; 回源失败时退回缓存
+    res = fetch_statement(CODE, "IS", client=StandInClient(fail={"IS"}), timeout=5, retries=1, revalidate=True)
+    assert res.ok
+    assert res.source == "stale"
+    assert res.frame.equals(cached)
+
+
+def test_cache_hit_skips_network(cache):
+    cache.put(CODE, "IS", synthetic_statement(CODE, "IS"))
+    client = StandInClient()
+    res = fetch_statement(CODE, "IS", client=client, timeout=5, retries=0)
+    assert res.source == "cache"
+    assert client.calls == []
+
+
+class EmptyClient(StandInClient):
+    def _serve(self, statement, symbol):
+        self.calls.append((statement, symbol, time.time()))
+        return None if statement == "IS" else StandInClient._serve(self, statement, symbol)
+
+
+def test_empty_frame_falls_back_to_cache(cache):
+    cached = synthetic_statement(CODE, "IS")
+    cache.put(CODE, "IS", cached)
+    res = fetch_statement(CODE, "IS", client=EmptyClient(), timeout=5, retries=0, revalidate=True)
+    assert res.ok
+    assert res.source == "stale"
+    assert res.attempts == 1
+    assert res.frame.equals(cached)
+
+
+def test_empty_frame_without_cache_fails():
+    res = fetch_statement(CODE, "IS", use_cache=False, client=EmptyClient(), timeout=5, retries=0)
+    assert not res.ok
+    assert isinstance(res.error, ValueError)
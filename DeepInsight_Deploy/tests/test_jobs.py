@@ -0,0 +1,44 @@
+from services.jobs import JobQueue
+
+
+class FakeModel(object):
+    path = None
+
+    def __init__(self, size): self.size = size
+
+
+class FixedVersion(object):
+    def version(self, code): return "2024-12-31"
+
+
+def make_queue(size, **kw):
+    return JobQueue(workers=1, runner=lambda job: {"model": FakeModel(size)}, cache=FixedVersion(), prewarm=False, **kw)
+
+
+def run_all(queue, symbols):
+    jobs = [queue.submit(s) for s in symbols]
+    for j in jobs: j.wait(5)
+    return jobs
+
+
+def test_results_bounded_by_bytes():
+    queue = make_queue(400, max_bytes=1000)
+    jobs = run_all(queue, ["600000", "600001", "600002", "600003", "600004"])
+    assert [queue.get(j.id) is not None for j in jobs] == [False, False, False, True, True]
+    assert queue.lookup("600004") is jobs[-1]
+    queue.shutdown()
+
+
+def test_newest_result_kept_when_over_budget():
+    queue = make_queue(5000, max_bytes=1000)
+    first, last = run_all(queue, ["600000", "600001"])
+    assert queue.get(first.id) is None
+    assert queue.get(last.id) is last
+    queue.shutdown()
+
+
+def test_results_bounded_by_count():
+    queue = make_queue(1, max_results=2)
+    jobs = run_all(queue, ["600000", "600001", "600002"])
+    assert [queue.get(j.id) is not None for j in jobs] == [False, True, True]
+    queue.shutdown()
@@ -0,0 +1,123 @@
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+import requests.api
+
+from services.scheduler import Scheduler, INTERACTIVE, BATCH
+
+HOST = "127.0.0.1"
+
+
+class Upstream(object):
+    """本地模拟上游: 记录每个请求的到达时刻与 tag 参数。"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = []    # [(到达时刻, tag)]
+        up = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                tag = self.path.partition("tag=")[2]
+                with up.lock: up.hits.append((time.monotonic(), tag))
+                body = b"{}"
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args): pass
+
+        self.server = ThreadingHTTPServer((HOST, 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{HOST}:{self.server.server_address[1]}/api"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def order(self):
+        with self.lock: return [tag for _, tag in self.hits]
+
+
+@pytest.fixture
+def upstream():
+    up = Upstream()
+    yield up
+    up.server.shutdown()
+    up.server.server_close()
+
+
+@pytest.fixture
+def scheduler():
+    made = []
+
+    def make(**kw):
+        s = Scheduler(**kw)
+        s.install_transport()
+        made.append(s)
+        return s
+    yield make
+    for s in made: s.uninstall_transport()
+
+
+def call(url, tag):
+    # 与 akshare 相同: 模块级 requests.get
+    return lambda: requests.get(url, params={"tag": tag}, timeout=5).status_code
+
+
+def test_token_bucket_rate(upstream, scheduler):
+    sched = scheduler(workers=8, limits={HOST: 20})
+    futs = [sched.submit(call(upstream.url, i)) for i in range(21)]
+    assert [f.result(10) for f in futs] == [200] * 21
+    stamps = sorted(t for t, _ in upstream.hits)
+    # burst=1: 首个请求立即放行, 其余 20 个按 20 次/秒匀速, 共约 1 秒
+    assert stamps[-1] - stamps[0] >= 0.9
+    # 任意半秒窗口内不超过 速率 x 0.5 + 突发 (再留一个的计时余量)
+    assert all(sum(1 for u in stamps if t <= u < t + 0.5) <= 12 for t in stamps)
+
+
+def test_interactive_jumps_queued_batch(upstream, scheduler):
+    # 单个工作线程被占住时排队的任务: 交互任务先于先提交的批量任务出队
+    sched = scheduler(workers=1, limits={HOST: 1000})
+    gate = threading.Event()
+    blocker = sched.submit(gate.wait, BATCH)
+    futs = [sched.submit(call(upstream.url, f"B{i}"), BATCH) for i in range(4)]
+    futs += [sched.submit(call(upstream.url, f"I{i}"), INTERACTIVE) for i in range(2)]
+    gate.set()
+    blocker.result(5)
+    for f in futs: f.result(5)
+    assert upstream.order() == ["I0", "I1", "B0", "B1", "B2", "B3"]
+
+
+def test_interactive_jumps_token_bucket_queue(upstream, scheduler):
+    # 工作线程充足, 批量请求都在令牌桶前等待时, 后到的交互请求排在它们前面
+    sched = scheduler(workers=8, limits={HOST: 10})
+    futs = [sched.submit(call(upstream.url, f"B{i}"), BATCH) for i in range(5)]
+    time.sleep(0.05)
+    futs += [sched.submit(call(upstream.url, f"I{i}"), INTERACTIVE) for i in range(2)]
+    for f in futs: f.result(10)
+    order = upstream.order()
+    assert order[0].startswith("B")
+    assert set(order[1:3]) == {"I0", "I1"}
+
+
+def test_transport_patch_restored(upstream):
+    original = requests.api.request
+    sched = Scheduler(workers=1, limits={HOST: 1000})
+    sched.install_transport()
+    try:
+        assert requests.api.request == sched.request
+        assert requests.request == sched.request
+        sched.install_transport()    # 重复安装无副作用
+        assert requests.get(upstream.url, params={"tag": "via"}, timeout=5).status_code == 200
+        assert HOST in sched.buckets
+    finally:
+        sched.uninstall_transport()
+    assert requests.api.request is original
+    assert requests.request is original
+    sched.uninstall_transport()       # 重复卸载无副作用
+    assert requests.api.request is original
@@ -0,0 +1,58 @@
+import time
+import zlib
+import pickle
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.stand_in import synthetic_statement
+from services.statement_cache import StatementCache, encode_frame, decode_frame
+
+CODE = "SH600519"
+
+
+class Boom(object):
+    # 反序列化时执行代码的 pickle 负载
+    def __reduce__(self): return (exec, ("raise SystemExit('pickle executed')",))
+
+
+def test_frame_round_trip():
+    df = synthetic_statement(CODE, "BS")
+    df["TS"] = pd.to_datetime(df["REPORT_DATE"])
+    df["N"] = np.arange(len(df))
+    back = decode_frame(encode_frame(df))
+    assert back.equals(df)
+    assert list(back.dtypes) == list(df.dtypes)
+
+
+def test_pickle_rows_are_ignored(tmp_path):
+    cache = StatementCache(str(tmp_path / "a.sqlite"))
+    cache.put(CODE, "IS", synthetic_statement(CODE, "IS"))
+    payload = zlib.compress(pickle.dumps(Boom()))
+    db = sqlite3.connect(cache.path)
+    db.execute("INSERT INTO statements VALUES (?, ?, ?, ?, ?, ?, ?)",
+               (CODE, "BS", time.time(), time.time(), "2024-12-31", len(payload), payload))
+    db.commit()
+    db.close()
+    assert cache.get(CODE, "BS") is None
+    assert cache.get(CODE, "IS") is not None
+    cache.close()
+
+
+def test_import_snapshot_rejects_foreign_pickles(tmp_path):
+    src = StatementCache(str(tmp_path / "src.sqlite"))
+    src.put(CODE, "IS", synthetic_statement(CODE, "IS"))
+    src.close()
+    payload = zlib.compress(pickle.dumps(Boom()))
+    db = sqlite3.connect(src.path)
+    db.execute("INSERT INTO statements VALUES (?, ?, ?, ?, ?, ?, ?)",
+               ("SZ000001", "IS", time.time(), time.time(), "2024-12-31", len(payload), payload))
+    db.commit()
+    db.close()
+
+    dst = StatementCache(str(tmp_path / "dst.sqlite"))
+    assert dst.import_snapshot(src.path) == 1
+    assert dst.get(CODE, "IS").frame.equals(synthetic_statement(CODE, "IS"))
+    assert dst.get("SZ000001", "IS") is None
+    dst.close()